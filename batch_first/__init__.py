@@ -1,14 +1,71 @@
 import numpy as np
 import numba as nb
 
-from numba import njit
-
 import chess
 import itertools
 import functools
+import inspect
+import sys
 
 from chess.polyglot import POLYGLOT_RANDOM_ARRAY, zobrist_hash
 
+# Every kernel releases the GIL when called from Python (unless changed with set_kernels_release_gil), so that the
+# search's CPU work can run at the same time as the threads preparing boards for (and waiting on) the ANNs
+KERNELS_RELEASE_GIL = True
+
+# The pair of dispatchers created for every kernel by the package's njit, the first releasing the GIL and the second
+# holding it
+KERNEL_VARIANTS = []
+
+
+def njit(*args, **kwargs):
+    """
+    Numba's njit, creating two dispatchers for the function, one which releases the GIL and one which holds it (see
+    set_kernels_release_gil).  The one returned is chosen by KERNELS_RELEASE_GIL.  It's used the same way (as a
+    decorator with or without arguments, or called with the function to compile).
+
+    NOTES:
+    1) Only the dispatcher releasing the GIL is given the signatures to compile eagerly, so the other is only compiled
+    if it's used
+    """
+    if len(args) != 0 and inspect.isfunction(args[0]):
+        return njit(*args[1:], **kwargs)(args[0])
+
+    def decorator(fn):
+        variants = (nb.njit(*args, nogil=True, **kwargs)(fn), nb.njit(nogil=False, **kwargs)(fn))
+        KERNEL_VARIANTS.append(variants)
+        return variants[0] if KERNELS_RELEASE_GIL else variants[1]
+
+    return decorator
+
+
+def set_kernels_release_gil(release_gil):
+    """
+    Sets if the kernels created with the package's njit release the GIL while they run, by binding every name given to
+    one of their dispatchers (in every module loaded) to the dispatcher with the given setting.  Only calls from Python
+    are affected, since the GIL isn't held while a kernel calls another.  This is done to compare the two (e.g. by
+    inference_overlap_benchmark in code_testing).
+    """
+    global KERNELS_RELEASE_GIL
+    KERNELS_RELEASE_GIL = release_gil
+
+    replacements = {}
+    for released, held in KERNEL_VARIANTS:
+        if release_gil:
+            replacements[id(held)] = released
+        else:
+            replacements[id(released)] = held
+
+    for module in list(sys.modules.values()):
+        module_dict = getattr(module, "__dict__", None)
+        if module_dict is None:
+            continue
+
+        for name, value in list(module_dict.items()):
+            if id(value) in replacements:
+                module_dict[name] = replacements[id(value)]
+
+
 from numba import cffi_support
 from cffi import FFI
 
@@ -135,6 +192,18 @@ NEXT_MOVE_IS_FROM_TT_VAL = np.uint8(254)
 # This value is used for indicating that the next move index of a board is actually a dummy variable, and there are no more moves left
 NO_MORE_MOVES_VALUE = np.uint8(255)
 
+# This value is used as a board's next move index to indicate that it's next child to be expanded is it's null move
+# child (used for null move pruning), and that it's next real move hasn't been set up yet
+NEXT_MOVE_IS_NULL_MOVE_VAL = np.uint8(253)
+
+# The square used as both the from and to square of a null move (a pass), which isn't a square on the board
+NULL_MOVE_SQUARE = np.uint8(64)
+NULL_MOVE = np.array([NULL_MOVE_SQUARE, NULL_MOVE_SQUARE, 0], dtype=np.uint8)
+
+# This flag is added to the promotion of a board's unexplored move (and the prev_move of the child made from it) to
+# indicate that the move is a late move, who's child is searched to a reduced depth (see late move reductions)
+REDUCED_MOVE_FLAG = np.uint8(128)
+
 # This value is used for indicating that a move in a transposition table entry is not being stored.
 NO_TT_MOVE_VALUE = np.uint8(255)
 
@@ -153,6 +222,10 @@ NO_PROMOTION_VALUE = np.uint8(0)
 
 TIE_RESULT_SCORE = np.float32(0)
 
+# The value used in place of a node's index to indicate there is no node (e.g. the parent of a root node, or the
+# end of a linked list of nodes)
+NO_NODE_INDEX = np.int32(-1)
+
 
 # This is used in times when a value should be 'None', but Numba won't let it.   To appease the compiler
 # this array is given, and it's first value checked against MIN_FLOAT32_VAL to see if it's the 'None' situation.
@@ -1,4 +1,4 @@
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 
 from . import *
 
@@ -63,140 +63,246 @@ def create_node_info_from_fen(fen, depth, separator):
 
 
 
-game_node_type = nb.deferred_type()
+# The settings used for late move reductions (see set_up_late_move_reductions).  A node's moves after it's first
+# full_depth_moves + full_depth_moves_per_depth * depth (in the order they're expanded), and those scored more than
+# score_margin below it's best move, have their children searched with their depth reduced by reduction (in addition to
+# the usual 1).  Only nodes with a depth of at least min_depth (and more than reduction) reduce their moves
+LateMoveReductions = namedtuple(
+    "LateMoveReductions",
+    ["reduction", "min_depth", "full_depth_moves", "full_depth_moves_per_depth", "score_margin"])
 
-gamenode_spec = OrderedDict()
+LateMoveReductions.__new__.__defaults__ = (1, 3, 3, 1, 4.0)
 
-gamenode_spec["board_struct"] = numba_node_info_type[:]
-gamenode_spec["parent"] = nb.optional(game_node_type)
 
 
+# The number of nodes a NodeArena is created to hold when no size is given (it grows as needed)
+DEFAULT_NODE_ARENA_CAPACITY = 2**16
 
+node_arena_spec = OrderedDict()
 
-@nb.jitclass(gamenode_spec)
-class GameNode:
-    def __init__(self, board_struct, parent):
-        self.board_struct = board_struct
+node_arena_spec["structs"] = numba_node_info_type[:]
+node_arena_spec["parents"] = nb.int32[:]
+node_arena_spec["first_child"] = nb.int32[:]
+node_arena_spec["next_sibling"] = nb.int32[:]
+node_arena_spec["dead"] = nb.boolean[:]
+node_arena_spec["free_indices"] = nb.int32[:]
+node_arena_spec["num_allocated"] = nb.int64
+node_arena_spec["num_free"] = nb.int64
 
-        # Eventually this should be some sort of list, so that updating multiple parents is possible
-        # when handling transpositions which are open at the same time.
-        self.parent = parent
 
-    @property
-    def struct(self):
-        return self.board_struct[0]
-
-
-game_node_type.define(GameNode.class_type.instance_type)
-
-
-
-game_node_holder_type = nb.deferred_type()
-
-game_node_holder_spec = OrderedDict()
-
-game_node_holder_spec["held_node"] = GameNode.class_type.instance_type
-game_node_holder_spec["next_holder"] = nb.optional(game_node_holder_type)
-
-@nb.jitclass(game_node_holder_spec)
-class GameNodeHolder:
+@nb.jitclass(node_arena_spec)
+class NodeArena:
     """
-    A jitclass used for representing a linked list of GameNode objects.  (this is mainly used for compilation purposes)
+    Stores the nodes of the search tree in preallocated arrays, with each node referred to by it's (int32) index into
+    them.  A node's board struct is stored in the structs array, and the tree is linked through the parent,
+    first child, and next sibling of each node (NO_NODE_INDEX where there is none).
+
+    The dead array marks the nodes which have terminated or have a terminated ancestor, and is what the open node
+    list uses to discard nodes.  Dead nodes keep their index until release_dead_nodes is called, at which point the
+    indices are put on a free list to be reused.
 
     NOTES:
-    1) This shouldn't be needed at all and a 'next' SOMETHING should just be added to the GameNode class, but
-    Numba won't let that happen (yet)
+    1) The work done over many of the arena's nodes (e.g. releasing the dead ones) is done by the functions below it
+    instead of by methods, since a jitclass's methods can't release the GIL when they're called from Python
     """
-    def __init__(self, held_node, next_holder):
-        self.held_node = held_node
-        self.next_holder = next_holder
+    def __init__(self, capacity):
+        self.structs = np.empty(capacity, dtype=numpy_node_info_dtype)
+        self.parents = np.empty(capacity, dtype=np.int32)
+        self.first_child = np.empty(capacity, dtype=np.int32)
+        self.next_sibling = np.empty(capacity, dtype=np.int32)
+        self.dead = np.zeros(capacity, dtype=np.bool_)
+        self.free_indices = np.empty(capacity, dtype=np.int32)
 
-    @property
-    def struct(self):
-        return self.held_node.struct
+        self.num_allocated = 0
+        self.num_free = 0
 
-game_node_holder_type.define(GameNodeHolder.class_type.instance_type)
+    @property
+    def capacity(self):
+        return len(self.structs)
 
+    @property
+    def num_in_use(self):
+        return self.num_allocated - self.num_free
+
+    def clear(self):
+        self.num_allocated = 0
+        self.num_free = 0
+
+    def has_room_for(self, num_nodes):
+        return self.capacity - self.num_in_use >= num_nodes
+
+    def add_node(self, struct, parent):
+        """
+        Stores a copy of the given struct as a new child of the given parent (or as a root if the parent is
+        NO_NODE_INDEX).  The arena must have room for the node (see has_room_for).
+
+        :return: The index of the new node
+        """
+        if self.num_free != 0:
+            self.num_free -= 1
+            node = self.free_indices[self.num_free]
+        else:
+            node = np.int32(self.num_allocated)
+            self.num_allocated += 1
 
+        self.structs[node] = struct
+        self.parents[node] = parent
+        self.first_child[node] = NO_NODE_INDEX
 
-game_node_holder_holder_type = nb.deferred_type()
+        if parent == NO_NODE_INDEX:
+            self.next_sibling[node] = NO_NODE_INDEX
+            self.dead[node] = struct['terminated']
+        else:
+            self.next_sibling[node] = self.first_child[parent]
+            self.first_child[parent] = node
+            self.dead[node] = struct['terminated'] or self.dead[parent]
 
-game_node_holder_holder_spec = OrderedDict()
+        return node
 
-game_node_holder_holder_spec["held"] = GameNodeHolder.class_type.instance_type
-game_node_holder_holder_spec["next"] = nb.optional(game_node_holder_holder_type)
 
-@nb.jitclass(game_node_holder_holder_spec)
-class GameNodeHolderHolder:
+@njit
+def mark_subtree_dead(node_arena, node):
     """
-    This is a temporary class used to avoid the time required for Numba's boxing and unboxing when using Lists of
-    JitClass objects.  It will be removed when more JIT coverage allows.
-
+    Marks the given node and all of it's descendants as dead.  Since a dead node's descendants are always dead,
+    subtrees which are already dead are skipped, so each node is only ever marked once.
     """
-    def __init__(self, held, next):
-        self.held = held
-        self.next = next
-
-game_node_holder_holder_type.define(GameNodeHolderHolder.class_type.instance_type)
-
-
+    if node_arena.dead[node]:
+        return
+
+    node_arena.dead[node] = True
+    cur_node = node_arena.first_child[node]
+    while cur_node != NO_NODE_INDEX:
+        if not node_arena.dead[cur_node]:
+            node_arena.dead[cur_node] = True
+            if node_arena.first_child[cur_node] != NO_NODE_INDEX:
+                cur_node = node_arena.first_child[cur_node]
+                continue
+
+        # Move to the next sibling, going up the tree until one is found or the subtree has been finished
+        while node_arena.next_sibling[cur_node] == NO_NODE_INDEX:
+            cur_node = node_arena.parents[cur_node]
+            if cur_node == node:
+                return
+        cur_node = node_arena.next_sibling[cur_node]
 
-@njit
-def get_list_from_holder_holder(holder):
-    to_return = []
-    while not holder is None:
-        to_return.append(holder.held)
-        holder = holder.next
-    return to_return
-
-@njit
-def get_holder_holder_from_list(lst):
-    next_holder = None
-    for sub_holder in lst[::-1]:
-        next_holder = GameNodeHolderHolder(sub_holder, next_holder)
-    return next_holder
 
 @njit
-def clear_holder_holder(holder):
-    dummy_sub_holder = create_dummy_node_holder()
-    while not holder is None:
-        holder.held = dummy_sub_holder
-        holder = holder.next
+def release_dead_nodes(node_arena):
+    """
+    Unlinks every dead node from the arena's tree and puts it's index on the free list.  This must only be done when
+    nothing else holds the index of a dead node (e.g. right after the open node list was compacted).
 
+    :return: The number of nodes released
+    """
+    is_free = np.zeros(node_arena.num_allocated, dtype=np.bool_)
+    for j in range(node_arena.num_free):
+        is_free[node_arena.free_indices[j]] = True
+
+    # The children of a dead node are all dead, so only the live nodes need their children filtered
+    for node in range(node_arena.num_allocated):
+        if not node_arena.dead[node] and not is_free[node]:
+            prev_child = NO_NODE_INDEX
+            cur_child = node_arena.first_child[node]
+            while cur_child != NO_NODE_INDEX:
+                if not node_arena.dead[cur_child]:
+                    prev_child = cur_child
+                elif prev_child == NO_NODE_INDEX:
+                    node_arena.first_child[node] = node_arena.next_sibling[cur_child]
+                else:
+                    node_arena.next_sibling[prev_child] = node_arena.next_sibling[cur_child]
+                cur_child = node_arena.next_sibling[cur_child]
+
+    num_released = 0
+    for node in range(node_arena.num_allocated):
+        if node_arena.dead[node] and not is_free[node]:
+            node_arena.free_indices[node_arena.num_free] = node
+            node_arena.num_free += 1
+            num_released += 1
+
+    return num_released
 
 
 @njit
-def len_node_holder(ll):
-    count = 0
-    while not ll is None:
-        count += 1
-        ll = ll.next_holder
-    return count
+def grow_node_arena(node_arena, min_capacity):
+    """
+    Reallocates the arena's arrays to hold at least min_capacity nodes (at least doubling their size).  This replaces the
+    dead array, so anything holding it must be given the new one.
+    """
+    new_capacity = max(2 * node_arena.capacity, min_capacity)
+
+    new_structs = np.empty(new_capacity, dtype=numpy_node_info_dtype)
+    new_parents = np.empty(new_capacity, dtype=np.int32)
+    new_first_child = np.empty(new_capacity, dtype=np.int32)
+    new_next_sibling = np.empty(new_capacity, dtype=np.int32)
+    new_dead = np.zeros(new_capacity, dtype=np.bool_)
+    new_free_indices = np.empty(new_capacity, dtype=np.int32)
+
+    for j in range(node_arena.num_allocated):
+        new_structs[j] = node_arena.structs[j]
+    new_parents[:node_arena.num_allocated] = node_arena.parents[:node_arena.num_allocated]
+    new_first_child[:node_arena.num_allocated] = node_arena.first_child[:node_arena.num_allocated]
+    new_next_sibling[:node_arena.num_allocated] = node_arena.next_sibling[:node_arena.num_allocated]
+    new_dead[:node_arena.num_allocated] = node_arena.dead[:node_arena.num_allocated]
+    new_free_indices[:node_arena.num_free] = node_arena.free_indices[:node_arena.num_free]
+
+    node_arena.structs = new_structs
+    node_arena.parents = new_parents
+    node_arena.first_child = new_first_child
+    node_arena.next_sibling = new_next_sibling
+    node_arena.dead = new_dead
+    node_arena.free_indices = new_free_indices
 
 
 @njit
-def create_dummy_node_holder():
-    return GameNodeHolder(GameNode(np.empty(1, numpy_node_info_dtype), None), None)
-
+def reroot_node_arena(node_arena, node):
+    """
+    Makes the given node the root of the arena's tree, releasing every node which isn't in it's subtree.  The
+    nodes kept are left as they were (including which are dead, e.g. the subtrees of terminated nodes, which are
+    reopened or released by the next search).  This must only be done when nothing else holds the index of a node
+    (e.g. between searches).
 
-@njit
-def filter_holders_then_append(root, holder, mask, append_to_end):
-    if holder is None:
-        root.next_holder = append_to_end
-        return 0
-
-    root.next_holder = holder
-
-    holder = root
-    mask_index = 0
-    total_kept = 0
-    while not holder.next_holder is None:
-        if mask[mask_index]:
-            holder = holder.next_holder
-            total_kept += 1
+    :return: The number of nodes kept
+    """
+    parent = node_arena.parents[node]
+    if parent != NO_NODE_INDEX:
+        if node_arena.first_child[parent] == node:
+            node_arena.first_child[parent] = node_arena.next_sibling[node]
         else:
-            holder.next_holder = holder.next_holder.next_holder
-        mask_index += 1
-
-    holder.next_holder = append_to_end
-    return total_kept
+            prev_child = node_arena.first_child[parent]
+            while node_arena.next_sibling[prev_child] != node:
+                prev_child = node_arena.next_sibling[prev_child]
+            node_arena.next_sibling[prev_child] = node_arena.next_sibling[node]
+
+    node_arena.parents[node] = NO_NODE_INDEX
+    node_arena.next_sibling[node] = NO_NODE_INDEX
+
+    is_kept = np.zeros(node_arena.num_allocated, dtype=np.bool_)
+    stack = np.empty(node_arena.num_allocated, dtype=np.int32)
+    stack[0] = node
+    stack_size = 1
+    while stack_size != 0:
+        stack_size -= 1
+        cur_node = stack[stack_size]
+        is_kept[cur_node] = True
+
+        child = node_arena.first_child[cur_node]
+        while child != NO_NODE_INDEX:
+            stack[stack_size] = child
+            stack_size += 1
+            child = node_arena.next_sibling[child]
+
+    is_free = np.zeros(node_arena.num_allocated, dtype=np.bool_)
+    for j in range(node_arena.num_free):
+        is_free[node_arena.free_indices[j]] = True
+
+    # The kept subtree has no links to the nodes outside of it, so they're released without being unlinked
+    num_kept = 0
+    for cur_node in range(node_arena.num_allocated):
+        if is_kept[cur_node]:
+            num_kept += 1
+        elif not is_free[cur_node]:
+            node_arena.dead[cur_node] = True
+            node_arena.free_indices[node_arena.num_free] = cur_node
+            node_arena.num_free += 1
+
+    return num_kept
@@ -1,92 +1,20 @@
+import os
+import time
+
 from . import *
 
 from .transposition_table import get_empty_hash_table, clear_hash_table
-from .numba_negamax_zero_window import iterative_deepening_mtd_f, start_move_scoring, start_board_evaluations
-from .global_open_priority_nodes import PriorityBins
-
-
-
-def generate_bin_ranges(filename, move_eval_fn, percentiles=None, max_batch_size=1000, output_filename=None, print_info=False):
-    """
-    Generate values representing the boundaries for the bins in the PriorityBins class based on a given
-    move evaluation function.  It also calculates the mean (zero-shift) for the move values.
-
-    :param filename: The filename for the binary file (in NumPy .npy format) containing board structs.
-     It's used for computing a sample of move scores
-    :param move_eval_fn: The move evaluation function to be used when searching the tree
-    :param percentiles: The percentiles desired from the sample of move scores computed
-    :param max_batch_size: The maximum batch size to be given to the move_eval_fn
-    :param output_filename: The filename to save the computed bins to, or None if saving the bins is not desired
-    :param print_info: A boolean value indicating if info about the computations should be printed
-    :return: An ndarray of the values at the given percentiles
-    """
-    def bin_helper_move_scoring_fn(struct_array):
-        move_thread, move_score_getter, _, _ = start_move_scoring(
-            struct_array,
-            struct_array[:1],
-            np.ones(len(struct_array), dtype=np.bool_),
-            np.zeros(1, dtype=np.bool_),
-            move_eval_fn)
-
-        to_concat_from_squares = []
-        to_concat_filters = []
-
-        for struct in struct_array:
-            relevant_moves = struct['unexplored_moves'][:struct['children_left']]
-
-            if not struct['turn']:
-                relevant_moves[:,:2] = SQUARES_180[relevant_moves[:,:2]]
-
-            to_concat_filters.append(MOVE_FILTER_LOOKUP[relevant_moves[:, 0], relevant_moves[:, 1], relevant_moves[:, 2]])
-            to_concat_from_squares.append(relevant_moves[:,0])
-
-        move_filters = np.concatenate(to_concat_filters)
-        from_squares = np.concatenate(to_concat_from_squares)
-
-
-        move_thread.join()
-
-        to_return = move_score_getter[0]([move_filters, from_squares, struct_array['children_left']])
-
-        return to_return
-
-
-    if percentiles is None:
-        percentiles = np.arange(0, 100, .02)
-
-    if print_info:
-        print("Loading data from file for bin calculations")
-
-    struct_array = np.load(filename)
-
-    if print_info:
-        print("Loaded %d BoardInfo structs"%len(struct_array))
-
-
-    increment = max_batch_size
-    struct_array = struct_array[:- (len(struct_array) % increment)]
-
-    combined_results = np.concatenate(
-        [bin_helper_move_scoring_fn(struct_array[j * increment:(j + 1) * increment]) for j in range((len(struct_array)-1)//increment)])
-
-    zero_shift = np.mean(combined_results)
-
-    combined_results -= zero_shift
-    combined_results = np.abs(combined_results)
-
-    if print_info:
-        print("Computed %d move evaluations"%len(combined_results))
-
-    bins = np.percentile(combined_results, percentiles)
+from .numba_negamax_zero_window import iterative_deepening_mtd_f, start_board_evaluations, get_previous_search_info, \
+    start_move_scoring, prepare_to_finish_move_scoring, find_grandchild, get_move_array, get_board_hash, \
+    set_up_tree_root
+from .numba_board import set_up_move_arrays
+from .global_open_priority_nodes import PriorityBins, BinBoundaryUpdater
+from .classes_and_structs import NodeArena, DEFAULT_NODE_ARENA_CAPACITY, numpy_node_info_dtype, \
+    create_node_info_from_fen, reroot_node_arena
+from .search_control import SearchController, BatchDispatcher, InferenceScheduler, allocate_move_time
+from .inference_executor import InferenceExecutor
+from .quiescence_search import QuiescenceEvaluator
 
-    if not output_filename is None:
-        np.save(output_filename, bins)
-        np.save(output_filename + "_shift", zero_shift)
-
-        if print_info:
-            print("Saved bins to file")
-
-    return bins, zero_shift
 
 
 def calculate_eval_zero_shift(filename, board_eval_fn, max_batch_size=5000, output_filename="draw_board_mean", print_info=False):
@@ -109,14 +37,10 @@ def calculate_eval_zero_shift(filename, board_eval_fn, max_batch_size=5000, outp
     :return: The mean evaluation value
     """
     def eval_helper(struct_array):
-        thread, scores = start_board_evaluations(
+        return start_board_evaluations(
             struct_array,
             np.ones(len(struct_array), dtype=np.bool_),
-            board_eval_fn)
-
-        thread.join()
-
-        return scores
+            board_eval_fn).result()
 
     if print_info:
         print("Loading data from file for zero-shift calculations")
@@ -151,6 +75,86 @@ def calculate_eval_zero_shift(filename, board_eval_fn, max_batch_size=5000, outp
     return mean
 
 
+def find_throughput_knee(batch_sizes, throughputs, knee_fraction=.9):
+    """
+    Finds the knee of a throughput curve, where increasing the batch size stops paying off.  It's taken to be the
+    smallest batch size with a throughput of at least knee_fraction of the best measured.
+    """
+    batch_sizes = np.asarray(batch_sizes)
+    throughputs = np.asarray(throughputs)
+
+    return batch_sizes[np.argmax(throughputs >= knee_fraction * np.max(throughputs))]
+
+
+def calibrate_max_batch_size(board_eval_fn, move_eval_fn, struct_array=None, batch_sizes=None, runs_per_size=3,
+                             knee_fraction=.9, output_filename=None, print_info=False):
+    """
+    Measures the throughput (boards per second) of evaluating boards and scoring their moves, for a range of batch
+    sizes, and picks the maximum batch size for the search from the knee of that curve (see find_throughput_knee).
+    Past the knee, larger batches barely improve the throughput, while making the search's best-first order less
+    exact.
+
+    The results depend on both the ANNs and the hardware, so they're meant to be saved once for each combination.
+
+    :param struct_array: The board structs given to the ANNs (repeated to fill each batch), or None if the starting
+     position should be used
+    :param batch_sizes: The batch sizes to be tested, or None to use the powers of 2 from 16 to 16384
+    :param runs_per_size: The number of times each batch size is timed (the fastest run is used)
+    :param output_filename: The filename to save the batch sizes, throughputs, and picked batch size to (in NumPy .npz
+     format), or None if they shouldn't be saved
+    :param print_info: A boolean value indicating if info about the computations should be printed
+    :return: A tuple of the batch size picked, the array of batch sizes tested, and the array of their throughputs
+    """
+    if struct_array is None:
+        struct_array = create_node_info_from_fen(chess.STARTING_FEN, 0, 0)
+
+    if batch_sizes is None:
+        batch_sizes = 2 ** np.arange(4, 15)
+
+    batch_sizes = np.asarray(batch_sizes)
+    throughputs = np.empty(len(batch_sizes))
+
+    for j, batch_size in enumerate(batch_sizes):
+        structs = np.resize(struct_array, batch_size)
+        set_up_move_arrays(structs)
+
+        to_score_mask = np.logical_not(structs['terminated'])
+        no_adults_mask = np.array([], dtype=np.bool_)
+        no_adult_indices = np.array([], dtype=np.int32)
+        no_adults = np.array([], dtype=numpy_node_info_dtype)
+
+        run_times = np.empty(runs_per_size)
+        for run in range(runs_per_size):
+            start_time = time.time()
+
+            start_board_evaluations(structs, to_score_mask, board_eval_fn).result()
+
+            move_future, num_to_score, _ = start_move_scoring(
+                structs, no_adults, no_adult_indices, to_score_mask, no_adults_mask, move_eval_fn)
+
+            size_array, from_to_squares, _ = prepare_to_finish_move_scoring(
+                structs, no_adults, no_adult_indices, to_score_mask, no_adults_mask, num_to_score, 0)
+
+            move_future.result()([from_to_squares[:, 0], from_to_squares[:, 1], size_array])
+
+            run_times[run] = time.time() - start_time
+
+        throughputs[j] = batch_size / np.min(run_times)
+
+        if print_info:
+            print("Batch size %d: %f boards per second" % (batch_size, throughputs[j]))
+
+    max_batch_size = find_throughput_knee(batch_sizes, throughputs, knee_fraction)
+
+    if print_info:
+        print("Picked a max batch size of %d" % max_batch_size)
+
+    if not output_filename is None:
+        np.savez(output_filename, batch_sizes=batch_sizes, throughputs=throughputs, max_batch_size=max_batch_size)
+
+    return max_batch_size, batch_sizes, throughputs
+
+
 def get_previous_board_map_from_py_board(board):
     """
     SPEED IMPROVEMENTS TO MAKE:
@@ -210,19 +214,75 @@ class ChessEngine(object):
 
 class BatchFirstEngine(ChessEngine):
 
-    def __init__(self, search_depth, board_eval_fn, move_eval_fn, bin_database_file=None, bin_output_filename=None,
-                 first_guess_fn=None, max_batch_size=5000, zero_valued_boards_file=None, saved_zero_shift_file=None):
+    def __init__(self, search_depth, board_eval_fn, move_eval_fn, first_guess_fn=None, max_batch_size=5000,
+                 zero_valued_boards_file=None, saved_zero_shift_file=None, num_bins=5000, bin_rebalance_interval=25,
+                 open_node_list=None, queue_telemetry=None, node_arena_capacity=DEFAULT_NODE_ARENA_CAPACITY,
+                 parallel_backprop=False, parallel_move_gen=False, num_threads=None, reuse_tree=True,
+                 reuse_previous_search=True, move_time=None, node_limit=None, pipelined_search=False,
+                 use_inference_executor=False, latency_aware_batching=False, batch_size_calibration_file=None,
+                 scheduled_inference_batch_sizes=None, quiescence_nodes_per_leaf=None, null_move_reduction=None,
+                 late_move_reductions=None):
         """
-        :param bin_database_file: If bin_output_filename is not None, then this is the NumPy database of boards to have
-        bins be created from.  If bin_output_filename is None, then this is the NumPy file containing an array of bins.
-        :param bin_output_filename: The name of the (NumPy) file which will be saved containing the bins computed, or None
-        if the bins should not be saved.
+        :param num_bins: The number of bins used by the PriorityBins.  Their boundaries are computed from the move
+         scores seen during the search (see BinBoundaryUpdater)
+        :param bin_rebalance_interval: The number of batches between recomputing the bin boundaries
+        :param open_node_list: The GlobalNodeList to hold the open nodes of the search (e.g. a DAryHeapNodeList),
+         or None if PriorityBins should be used (num_bins, bin_rebalance_interval, and queue_telemetry are only used
+         in that case)
+        :param queue_telemetry: An OpenNodeListTelemetry for the PriorityBins to record each batch in, or None
+        :param node_arena_capacity: The number of nodes the NodeArena holding the search tree is initially created
+         to hold (it grows as needed)
+        :param parallel_backprop: If the nodes of each level of backpropagation should be updated in parallel
+        :param parallel_move_gen: If the termination checks and move generation of each batch should be done in parallel
+        :param num_threads: The number of threads used by the parallel parts of the search, or None to use Numba's
+         default
+        :param reuse_tree: If the search tree should be kept in the arena and reused by each of the search's
+         zero-window searches (see mtd_f), and by the search for the next move (see reuse_previous_search).  This
+         can't be used with pipelined_search, scheduled_inference_batch_sizes, null_move_reduction, or
+         late_move_reductions
+        :param reuse_previous_search: If what was found when picking the previous move should be used to seed the
+         search for the current move.  When the current board was searched as part of the previous move's search,
+         the depths it was already searched to are skipped, and it's stored bounds are used for the first guess.  If
+         the tree is being reused, the subtree of the current board (after the engine's move and the reply to it) is
+         kept as the new tree, and everything else is released.  What was reused for each move is recorded in
+         search_reuse_log
+        :param move_time: The number of seconds to search for each move when no clock information is given to
+         pick_move, or None if the time isn't limited
+        :param node_limit: The number of nodes to process (including repeats) when searching for each move, or None
+         if it isn't limited.  The search can be stopped early (e.g. from another thread) through the engine's
+         search_controller
+        :param pipelined_search: If the search should prepare each batch while the previous one is being evaluated
+         (see pipelined_zero_window_negamax_search).  This can't be used with scheduled_inference_batch_sizes or
+         late_move_reductions
+        :param use_inference_executor: If the networks should be run by an InferenceExecutor (a long-lived worker
+         thread with a request queue), instead of a new thread being created for each batch
+        :param latency_aware_batching: If the size of each batch should be picked by a BatchDispatcher (from a model
+         of the time each inference takes, fit as the search goes on), with max_batch_size as the largest size
+        :param batch_size_calibration_file: The .npz file to load the max batch size from, as picked by
+         calibrate_max_batch_size (which is run and saved to the file if it doesn't exist yet), or None if the given
+         max_batch_size should be used.  Since the calibration depends on the ANNs and the hardware, a separate file
+         should be used for each combination
+        :param scheduled_inference_batch_sizes: A tuple of the number of leaf evaluations and the number of nodes'
+         move scorings to accumulate (across iterations) before running each ANN (see InferenceScheduler), or None
+         if they should be run once for each batch expanded
+        :param quiescence_nodes_per_leaf: The average number of capture boards searched by a capture-only
+         quiescence search for each depth zero leaf (see QuiescenceEvaluator), or None if the leaves should be
+         evaluated directly
+        :param null_move_reduction: The extra depth reduction given to the null move children searched before a
+         node's other children (see should_try_null_move), or None if null move pruning shouldn't be used
+        :param late_move_reductions: The LateMoveReductions used to search the moves with the lowest scores from the
+         move scoring ANN to a reduced depth (searching them again if they fail high), or None if every move
+         should be searched to the full depth
         """
         if saved_zero_shift_file is None and zero_valued_boards_file is None:
             raise ValueError("Either saved_zero_shift_file or zero_valued_boards_file must be specified, but both are None!")
 
-        if bin_database_file is None and bin_output_filename is None:
-            raise ValueError("Either bin_database_file or bin_output_filename must be specified but both are None!")
+        if reuse_tree and (pipelined_search or not scheduled_inference_batch_sizes is None or
+                           not null_move_reduction is None or not late_move_reductions is None):
+            raise ValueError("The tree can't be reused by the pipelined search, or with scheduled inference, null move pruning, or late move reductions (reuse_tree must be False)!")
+
+        if pipelined_search and (not scheduled_inference_batch_sizes is None or not late_move_reductions is None):
+            raise ValueError("The pipelined search can't be used with scheduled inference or late move reductions!")
 
 
         if first_guess_fn is None:
@@ -235,17 +295,20 @@ class BatchFirstEngine(ChessEngine):
         self.board_evaluator = board_eval_fn
         self.move_evaluator = move_eval_fn
 
-        if bin_output_filename is None:
-            self.bins = np.load(bin_database_file)
-            move_zero_shift = np.load(bin_database_file[:-4] + "_shift.npy")
-        else:
-            self.bins, move_zero_shift = generate_bin_ranges(
-                bin_database_file,
-                self.move_evaluator,
-                max_batch_size=int(1.25*max_batch_size),
-                output_filename=bin_output_filename,
-                print_info=True)
+        if not batch_size_calibration_file is None:
+            if not batch_size_calibration_file.endswith(".npz"):
+                batch_size_calibration_file += ".npz"
 
+            if os.path.exists(batch_size_calibration_file):
+                max_batch_size = int(np.load(batch_size_calibration_file)['max_batch_size'])
+            else:
+                max_batch_size = int(calibrate_max_batch_size(
+                    board_eval_fn,
+                    move_eval_fn,
+                    output_filename=batch_size_calibration_file,
+                    print_info=True)[0])
+
+        self.max_batch_size = max_batch_size
 
         if zero_valued_boards_file is None:
             zero_shift = np.load(saved_zero_shift_file)
@@ -259,28 +322,150 @@ class BatchFirstEngine(ChessEngine):
 
         self.board_evaluator = lambda *args : board_eval_fn(*args) - zero_shift
 
-        self.open_node_holder = PriorityBins(
-            self.bins,
-            max_batch_size,
-            zero_shift=move_zero_shift,
-            # save_info=True, #Must be set to True if printing info about the searches!
-        )
+        if use_inference_executor:
+            self.inference_executor = InferenceExecutor(self.board_evaluator, self.move_evaluator, max_batch_size)
+            self.board_evaluator = self.inference_executor
+            self.move_evaluator = self.inference_executor
+        else:
+            self.inference_executor = None
+
+        if not quiescence_nodes_per_leaf is None:
+            self.board_evaluator = QuiescenceEvaluator(self.board_evaluator, quiescence_nodes_per_leaf)
+
+        if open_node_list is None:
+            self.open_node_holder = PriorityBins(
+                None,
+                max_batch_size,
+                bin_updater=BinBoundaryUpdater(num_bins, rebalance_interval=bin_rebalance_interval),
+                telemetry=queue_telemetry,
+                # save_info=True, #Must be set to True if printing info about the searches!
+            )
+        else:
+            self.open_node_holder = open_node_list
+
+        self.node_arena = NodeArena(node_arena_capacity)
+        self.parallel_backprop = parallel_backprop
+        self.parallel_move_gen = parallel_move_gen
+        self.num_threads = num_threads
+        self.reuse_tree = reuse_tree
+        self.reuse_previous_search = reuse_previous_search
+        self.pipelined_search = pipelined_search
+        self.batch_dispatcher = BatchDispatcher(max_batch_size) if latency_aware_batching else None
+
+        if scheduled_inference_batch_sizes is None:
+            self.inference_scheduler = None
+        else:
+            self.inference_scheduler = InferenceScheduler(*scheduled_inference_batch_sizes)
+
+        self.null_move_reduction = null_move_reduction
+        self.late_move_reductions = late_move_reductions
+
+        # The root of the tree kept from the last search (or NO_NODE_INDEX), see reuse_tree
+        self.tree_root = NO_NODE_INDEX
+
+        # For each move picked (since the start of the game), a tuple of the depth the board had already been
+        # searched to, and the number of nodes kept from the previous move's tree
+        self.search_reuse_log = []
+
+        self.move_time = move_time
+        self.search_controller = SearchController(node_limit=node_limit)
 
         self.hash_table = get_empty_hash_table()
 
+    def release_resources(self):
+        if not self.inference_executor is None:
+            self.inference_executor.shutdown()
+            self.inference_executor = None
+
     def start_new_game(self):
         clear_hash_table(self.hash_table)
+        self.node_arena.clear()
+        self.tree_root = NO_NODE_INDEX
+        self.search_reuse_log = []
+
+    def pick_move(self, board, remaining_time=None, increment=0, moves_to_go=None):
+        """
+        :param remaining_time: The number of seconds left on the engine's clock, or None if the engine's move_time
+         should be used
+        :param increment: The number of seconds added to the clock after each move
+        :param moves_to_go: The number of moves until the next time control, or None if the remaining time is for the
+         rest of the game
+        """
+        if remaining_time is None:
+            self.search_controller.time_limit = self.move_time
+        else:
+            self.search_controller.time_limit = allocate_move_time(remaining_time, increment, moves_to_go)
+
+        self.search_controller.start()
+
+        fen = board.fen()
+        depths_to_search = np.arange(1, self.search_depth + 1)
+        first_guess = self.first_guess_fn(board)
+        previous_board_map = get_previous_board_map_from_py_board(board)
+
+        previous_tree_root = self.tree_root
+        self.tree_root = NO_NODE_INDEX
+
+        if self.reuse_previous_search:
+            num_nodes_reused = 0
+            board_hash = None
+            if len(board.move_stack) >= 2:
+                # The previous move's search was rooted two moves ago.  It's nodes are found from the moves made since
+                # then, because their hashes (and those of their TT entries) aren't the real boards' when black is to
+                # move in the search's root
+                previous_board = board.copy()
+                previous_board.pop()
+                previous_board.pop()
+                last_moves = get_move_array(board.move_stack[-2:], not board.turn)
+
+                if previous_tree_root != NO_NODE_INDEX:
+                    self.tree_root = find_grandchild(self.node_arena, previous_tree_root, last_moves)
+
+                if self.tree_root != NO_NODE_INDEX:
+                    num_nodes_reused = reroot_node_arena(self.node_arena, self.tree_root)
+                    board_hash = self.node_arena.structs[self.tree_root]['hash']
+                else:
+                    board_hash = get_board_hash(previous_board.fen(), last_moves)
+
+            searched_depth, lower_bound, upper_bound = get_previous_search_info(fen, self.hash_table, board_hash)
+
+            self.search_reuse_log.append((searched_depth, num_nodes_reused))
+
+            if searched_depth != 0:
+                # The final depth is always searched
+                depths_to_search = depths_to_search[min(searched_depth, self.search_depth - 1):]
+
+                if lower_bound != MIN_FLOAT32_VAL:
+                    first_guess = lower_bound
+                elif upper_bound != MAX_FLOAT32_VAL:
+                    first_guess = upper_bound
+
+        if self.reuse_tree and self.tree_root == NO_NODE_INDEX:
+            self.tree_root = set_up_tree_root(
+                self.move_evaluator, self.hash_table, previous_board_map, fen, self.node_arena)
 
-    def pick_move(self, board):
         returned_score, move_to_return, self.hash_table = iterative_deepening_mtd_f(
-            fen=board.fen(),
-            depths_to_search=np.arange(1,self.search_depth+1),
+            fen=fen,
+            depths_to_search=depths_to_search,
+            first_guess=first_guess,
             open_node_holder=self.open_node_holder,
             board_eval_fn=self.board_evaluator,
             move_eval_fn=self.move_evaluator,
             hash_table=self.hash_table,
 
-            previous_board_map=get_previous_board_map_from_py_board(board),
+            previous_board_map=previous_board_map,
+            node_arena=self.node_arena,
+            parallel_backprop=self.parallel_backprop,
+            parallel_move_gen=self.parallel_move_gen,
+            num_threads=self.num_threads,
+            reuse_tree=self.reuse_tree,
+            tree_root=self.tree_root,
+            search_controller=self.search_controller,
+            pipelined=self.pipelined_search,
+            batch_dispatcher=self.batch_dispatcher,
+            inference_scheduler=self.inference_scheduler,
+            null_move_reduction=self.null_move_reduction,
+            late_move_reductions=self.late_move_reductions,
 
             # print_info=True,       #If this is True, the save_info parameter for the PriorityBins must be True (in the __init__ function)  (better connection of these values to come)!
             )
@@ -1,53 +1,18 @@
-from .classes_and_structs import *
-
-
-@njit
-def should_not_terminate(game_node):
-    cur_node = game_node
-    while cur_node is not None:
-        if cur_node.struct.terminated:
-            return False
-        cur_node = cur_node.parent
-    return True
-
-
-@njit
-def append_non_terminating(to_check, root):
-    while not to_check is None:
-        if should_not_terminate(to_check.held_node):
-            root.next_holder = to_check
-            root = root.next_holder
-
-        to_check = to_check.next_holder
-
-    root.next_holder = None
-    return root
-
-
-@njit
-def append_non_terminating_with_counting(to_check, root, max_to_get):
-    num_found = 0
-    while not to_check is None:
-        if should_not_terminate(to_check.held_node):
-            root.next_holder = to_check
-            root = root.next_holder
-
-            num_found += 1
-            if num_found == max_to_get:
-                to_check = to_check.next_holder
-                break
-
-        to_check = to_check.next_holder
+import time
 
-    root.next_holder = None
-    return root, to_check, num_found
+from .classes_and_structs import *
 
 
 
 class GlobalNodeList(object):
+    """
+    The list of open nodes for the search.  Nodes are given to and returned from it as ndarrays of int32 node
+    indices (into the NodeArena holding the search tree).
+    """
     def is_empty(self):
         """
-        Checks if the node list is empty.
+        Checks if the node list is empty.  Nodes marked in the dead node mask which haven't been discarded yet aren't
+        counted.
 
         :return: A boolean value indicating if the list is empty.
         """
@@ -69,130 +34,415 @@ class GlobalNodeList(object):
         """
         raise NotImplementedError("This method must be implemented!")
 
+    def set_dead_node_mask(self, dead_node_mask):
+        """
+        Sets the boolean array (indexed by node) which marks the nodes that have either terminated or have a
+        terminated ancestor.  Marked nodes are never returned in a batch.
+        """
+        raise NotImplementedError("This method must be implemented!")
+
+    def compact(self):
+        """
+        Removes every node marked in the dead node mask from the list.
+
+        :return: The number of nodes removed
+        """
+        raise NotImplementedError("This method must be implemented!")
+
+    def set_max_batch_size(self, max_batch_size):
+        """
+        Sets the largest number of nodes to be returned in a batch.
+        """
+        raise NotImplementedError("This method must be implemented!")
+
+
+
+class ScoreQuantileSketch(object):
+    """
+    A streaming sketch of the distribution of the scores given to a GlobalNodeList.  It's a fixed size reservoir of
+    sampled scores.  Once it's full, each score is sampled with probability sample_probability and replaces a random
+    sample, so the samples decay exponentially and the quantiles it gives follow the distribution as it shifts
+    throughout a game (and between networks) rather than being fixed at startup.
+
+    NOTES:
+    1) A sample is expected to survive about capacity / sample_probability scores, so with the defaults the
+    reservoir spans roughly the last 2**16 scores while only holding 2**12 of them
+    2) Adding scores costs O(1) per score.  Getting the mean or percentiles costs a pass over (or sort of) the
+    reservoir, so it depends on the capacity and not on how many scores have been seen
+    """
+    def __init__(self, capacity=2**12, sample_probability=2**-4, seed=0):
+        self.samples = np.empty(capacity, dtype=np.float32)
+        self.sample_probability = sample_probability
+        self.random_state = np.random.RandomState(seed)
+        self.num_samples = 0
+
+    def __len__(self):
+        return self.num_samples
+
+    def add(self, scores):
+        # Scores for moves found in the TT are constant markers, not move scores, so they're not included
+        scores = scores[scores != TT_MOVE_SCORE_VALUE]
+
+        num_to_fill = min(len(scores), len(self.samples) - self.num_samples)
+        self.samples[self.num_samples:self.num_samples + num_to_fill] = scores[:num_to_fill]
+        self.num_samples += num_to_fill
+
+        scores = scores[num_to_fill:]
+        scores = scores[self.random_state.random_sample(len(scores)) < self.sample_probability]
+        self.samples[self.random_state.randint(len(self.samples), size=len(scores))] = scores
+
+    def mean(self):
+        return np.float32(np.mean(self.samples[:self.num_samples]))
+
+    def percentiles(self, percentiles, shift=0):
+        """
+        Gets the values at the given percentiles of the absolute difference between the stored samples and the given
+        shift.
+
+        NOTES:
+        1) This sorts the samples once and interpolates between them (as np.percentile does), since np.percentile
+        partitions the samples around every requested percentile, which is far slower when there are thousands of them
+        """
+        sorted_samples = np.sort(np.abs(self.samples[:self.num_samples] - shift))
+        return np.interp(
+            np.asarray(percentiles) * ((len(sorted_samples) - 1) / 100),
+            np.arange(len(sorted_samples)),
+            sorted_samples).astype(np.float32)
+
+
+
+class BinBoundaryUpdater(object):
+    """
+    Computes the bin boundaries (and zero-shift) for a binned GlobalNodeList from the scores it's given during the
+    search, replacing the calibration pass over a database of boards.  The boundaries are placed at evenly spaced
+    percentiles of the scores' distance from their mean, and are recomputed every rebalance_interval insertions.
+    Since the number of bins never changes, the list can use the new boundaries without being rebuilt (nodes
+    already in a bin stay there).
+    """
+    def __init__(self, num_bins=5000, rebalance_interval=25, sketch_capacity=2**12, sketch_sample_probability=2**-4,
+                 min_samples_to_rebalance=100):
+        self.percentiles = np.linspace(0, 100, num_bins, endpoint=False)
+        self.rebalance_interval = rebalance_interval
+        self.min_samples_to_rebalance = min_samples_to_rebalance
+
+        self.sketch = ScoreQuantileSketch(sketch_capacity, sketch_sample_probability)
+
+        self.updates_since_rebalance = 0
+        self.num_rebalances = 0
+
+    def initial_boundaries(self):
+        """
+        The boundaries to use before any scores have been seen (every node is put in the same bin).
+        """
+        return np.zeros(len(self.percentiles), dtype=np.float32), np.float32(0)
+
+    def update(self, scores):
+        """
+        Adds the given scores to the sketch, and if it's time to rebalance, computes new boundaries.
+
+        :return: A tuple of the new (bins, zero_shift), or None if the boundaries should not change
+        """
+        self.sketch.add(scores)
+        self.updates_since_rebalance += 1
+
+        if len(self.sketch) < self.min_samples_to_rebalance:
+            return None
+
+        if self.num_rebalances != 0 and self.updates_since_rebalance < self.rebalance_interval:
+            return None
+
+        self.updates_since_rebalance = 0
+        self.num_rebalances += 1
+
+        zero_shift = self.sketch.mean()
+        return self.sketch.percentiles(self.percentiles, zero_shift), zero_shift
+
+
+
+class OpenNodeListTelemetry(object):
+    """
+    A ring buffer of per-batch information about a GlobalNodeList, used for tuning things like the maximum batch size
+    and the granularity of the bins on real games.  For every batch it records:
+    -The number of nodes inserted, the size of the batch, and the fraction of the maximum batch size it filled
+    -The number of bins nodes were taken from, and the number of terminated nodes discarded
+    -The number of nodes stored after the batch was taken (including dead nodes which haven't been discarded yet), and
+    a histogram of how they're spread across the bins (adjacent bins are combined so the histogram has
+    num_histogram_buckets entries, or one for each bin when there are fewer bins than that, with the rest left zero)
+    -The time spent inserting nodes, and the time spent retrieving the batch (both measured with time.perf_counter)
+
+    Once full, the oldest records are written over.
+    """
+    def __init__(self, capacity=10000, num_histogram_buckets=64):
+        self.capacity = capacity
+        self.num_histogram_buckets = num_histogram_buckets
+
+        self.num_inserted = np.zeros(capacity, dtype=np.int32)
+        self.batch_sizes = np.zeros(capacity, dtype=np.int32)
+        self.fill_fractions = np.zeros(capacity, dtype=np.float32)
+        self.bins_touched = np.zeros(capacity, dtype=np.int32)
+        self.num_discarded = np.zeros(capacity, dtype=np.int32)
+        self.num_stored = np.zeros(capacity, dtype=np.int32)
+        self.occupancy = np.zeros((capacity, num_histogram_buckets), dtype=np.int32)
+        self.insert_times = np.zeros(capacity, dtype=np.float64)
+        self.retrieve_times = np.zeros(capacity, dtype=np.float64)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+
+        self.clear()
+
+    def __len__(self):
+        return self.num_records
+
+    def clear(self):
+        self.next_index = 0
+        self.num_records = 0
+
+    def record(self, num_inserted, batch_size, max_batch_size, bins_touched, num_discarded, num_stored, insert_time,
+               retrieve_time, bin_lengths=None):
+        """
+        :param bin_lengths: The number of nodes in each bin, or None if the list has no bins
+        """
+        j = self.next_index
+
+        self.num_inserted[j] = num_inserted
+        self.batch_sizes[j] = batch_size
+        self.fill_fractions[j] = batch_size / max_batch_size
+        self.bins_touched[j] = bins_touched
+        self.num_discarded[j] = num_discarded
+        self.num_stored[j] = num_stored
+        self.insert_times[j] = insert_time
+        self.retrieve_times[j] = retrieve_time
+        self.timestamps[j] = time.perf_counter()
+
+        self.occupancy[j] = 0
+        if not bin_lengths is None:
+            # np.add.reduceat gives a bin (instead of 0) for each repeated start, so there's at most one bucket per bin
+            num_buckets = min(self.num_histogram_buckets, len(bin_lengths))
+            bucket_starts = np.linspace(0, len(bin_lengths), num_buckets, endpoint=False).astype(np.int64)
+            self.occupancy[j, :num_buckets] = np.add.reduceat(bin_lengths, bucket_starts)
+
+        self.next_index = (j + 1) % self.capacity
+        self.num_records = min(self.num_records + 1, self.capacity)
+
+    def to_arrays(self):
+        """
+        :return: A dictionary mapping the name of each recorded value to an ndarray of it's values, from oldest to newest
+        """
+        order = (np.arange(self.num_records) + (self.next_index - self.num_records)) % self.capacity
+        return {
+            "num_inserted": self.num_inserted[order],
+            "batch_sizes": self.batch_sizes[order],
+            "fill_fractions": self.fill_fractions[order],
+            "bins_touched": self.bins_touched[order],
+            "num_discarded": self.num_discarded[order],
+            "num_stored": self.num_stored[order],
+            "occupancy": self.occupancy[order],
+            "insert_times": self.insert_times[order],
+            "retrieve_times": self.retrieve_times[order],
+            "timestamps": self.timestamps[order]}
+
+    def save(self, filename):
+        np.savez(filename, **self.to_arrays())
+
+
+
+# The multiplier and lookup table used to find the index of the lowest set bit of a uint64 (a De Bruijn sequence)
+DE_BRUIJN_64 = np.uint64(0x03f79d71b4cb0a89)
+DE_BRUIJN_64_INDEX_TABLE = np.array(
+    [0, 47, 1, 56, 48, 27, 2, 60, 57, 49, 41, 37, 28, 16, 3, 61,
+     54, 58, 35, 52, 50, 42, 21, 44, 38, 32, 29, 23, 17, 11, 4, 62,
+     46, 55, 26, 59, 40, 36, 15, 53, 34, 51, 20, 43, 31, 22, 10, 45,
+     25, 39, 14, 33, 19, 30, 9, 24, 13, 18, 8, 12, 7, 6, 5, 63], dtype=np.uint8)
 
 
 @njit
-def insert_nodes(bins, bin_lls, bin_lengths, non_empty_mask, to_insert, scores, zero_shift):
-    scores -= zero_shift
-    scores = np.abs(scores)
+def lowest_set_bit_index(word):
+    """
+    Finds the index of the least significant set bit of the given (non-zero) uint64.
+    """
+    return DE_BRUIJN_64_INDEX_TABLE[((word ^ (word - np.uint64(1))) * DE_BRUIJN_64) >> np.uint64(58)]
 
-    bin_indices = np.digitize(scores, bins)
-    for j in range(len(scores)):
-        temp_next = to_insert.next_holder
 
-        if non_empty_mask[bin_indices[j]]:
-            to_insert.next_holder = bin_lls[bin_indices[j]]
-        else:
-            to_insert.next_holder = None
-            non_empty_mask[bin_indices[j]] = True
+@njit
+def find_first_set(bitmap):
+    """
+    Finds the index of the first set bit in the given array of uint64 words, or -1 if no bits are set.
+    """
+    for word_index in range(len(bitmap)):
+        if bitmap[word_index]:
+            return 64 * word_index + lowest_set_bit_index(bitmap[word_index])
+    return -1
+
 
-        bin_lengths[bin_indices[j]] += 1
-        bin_lls[bin_indices[j]] = to_insert
-        to_insert = temp_next
+@njit
+def set_bin_bit(bitmap, bin_index):
+    bitmap[bin_index >> 6] |= np.uint64(1) << np.uint64(bin_index & 63)
 
 
 @njit
-def get_batch(bin_lls, bin_lengths, non_empty_mask, max_batch_size_to_accept):
-    dummy_root = create_dummy_node_holder()
-    end_node = dummy_root
-    num_found = 0
+def clear_bin_bit(bitmap, bin_index):
+    bitmap[bin_index >> 6] &= ~(np.uint64(1) << np.uint64(bin_index & 63))
 
-    temp_dummy_node = create_dummy_node_holder()
-    for bin_index in np.where(non_empty_mask)[0]:
-        end_node, bin_leftover, just_found = append_non_terminating_with_counting(
-            bin_lls[bin_index], end_node, max_batch_size_to_accept - num_found)
 
-        num_found += just_found
+@njit
+def insert_nodes(bins, bin_heads, bin_lengths, next_node, bitmap, to_insert, scores, zero_shift):
+    """
+    Pushes the given node indices onto the front of their bins.  Since a node can only be in the list once,
+    the 'next' links are stored in an array indexed by the node itself (so no other memory is needed).
+    """
+    bin_indices = np.digitize(np.abs(scores - zero_shift), bins)
+    for j in range(len(to_insert)):
+        cur_bin = bin_indices[j]
 
-        if not bin_leftover is None:
-            bin_lls[bin_index] = bin_leftover
-            non_empty_mask[bin_index] = True
-            bin_lengths[bin_index] = len_node_holder(bin_leftover)
-            break
+        next_node[to_insert[j]] = bin_heads[cur_bin]
+        bin_heads[cur_bin] = to_insert[j]
 
-        bin_lls[bin_index] = temp_dummy_node
-        non_empty_mask[bin_index] = False
-        bin_lengths[bin_index] = 0
+        if bin_lengths[cur_bin] == 0:
+            set_bin_bit(bitmap, cur_bin)
+        bin_lengths[cur_bin] += 1
 
-        if num_found == max_batch_size_to_accept:
-            break
 
-    return dummy_root.next_holder
+@njit
+def should_keep_node(dead_node_mask, node):
+    # An empty mask is given when nodes should never be discarded (Numba won't allow the mask to be None)
+    return len(dead_node_mask) == 0 or not dead_node_mask[node]
 
 
 @njit
-def pop_all_non_terminating(bin_lls, bin_lengths, non_empty_mask):
+def get_batch(bin_heads, bin_lengths, next_node, bitmap, batch_buffer, max_batch_size_to_accept, dead_node_mask):
     """
-    Set all the bin arrays to empty (by use of a mask), and return an array of all the nodes currently
-    in a bin array that should not terminate.
+    Pops nodes from the highest priority non-empty bins (found with the bitmap) until either
+    max_batch_size_to_accept nodes have been found, or the list is empty.  Nodes marked in dead_node_mask are
+    discarded as they're popped.
+
+    :return: A tuple of the number of nodes placed into batch_buffer, the number of bins nodes were taken from,
+     and the number of nodes discarded
     """
-    dummy_root = create_dummy_node_holder()
-    end_ll_node = dummy_root
+    num_found = 0
+    num_discarded = 0
+    bins_touched = 0
+    while num_found < max_batch_size_to_accept:
+        cur_bin = find_first_set(bitmap)
+        if cur_bin == -1:
+            break
+
+        bins_touched += 1
+
+        # Take as many nodes from this bin as possible before looking for the next non-empty one
+        cur_node = bin_heads[cur_bin]
+        while bin_lengths[cur_bin] != 0 and num_found < max_batch_size_to_accept:
+            if should_keep_node(dead_node_mask, cur_node):
+                batch_buffer[num_found] = cur_node
+                num_found += 1
+            else:
+                num_discarded += 1
 
-    temp_dummy_node = create_dummy_node_holder()
-    for bin_index in np.where(non_empty_mask)[0]:
-        end_ll_node = append_non_terminating(bin_lls[bin_index], end_ll_node)
-        bin_lls[bin_index] = temp_dummy_node
+            cur_node = next_node[cur_node]
+            bin_lengths[cur_bin] -= 1
 
-    bin_lengths[non_empty_mask] = 0
-    non_empty_mask[non_empty_mask] = False
+        bin_heads[cur_bin] = cur_node
 
-    return dummy_root.next_holder, end_ll_node
+        if bin_lengths[cur_bin] == 0:
+            clear_bin_bit(bitmap, cur_bin)
+
+    return num_found, bins_touched, num_discarded
 
 
 @njit
-def insert_and_get_batch(to_insert, scores, bins, bin_ll_holder, bin_lengths, non_empty_mask, max_batch_size_to_accept, zero_shift):
-    own_len = np.sum(bin_lengths)
-
-    # This should not be using self.max_batch_size_to_accept for the initial check (here), instead should probably
-    # be using a value greater than that, because even if 0 nodes are terminating, the time saved will likely
-    # be more than the time spent computing the extra nodes (though it's unlikely that 0 nodes will be terminated
-    # in actual play)
-    if len(scores) + own_len < max_batch_size_to_accept:
-        if own_len == 0:
-            dummy_root = create_dummy_node_holder()
-            append_non_terminating(to_insert, dummy_root)
-            return dummy_root.next_holder
-        elif len(scores) == 0:
-            bin_lls = get_list_from_holder_holder(bin_ll_holder)
-            to_return = pop_all_non_terminating(bin_lls, bin_lengths, non_empty_mask)[0]
-        else:
-            bin_lls = get_list_from_holder_holder(bin_ll_holder)
-            to_return, end_node = pop_all_non_terminating(bin_lls, bin_lengths, non_empty_mask)
-            end_node.next_holder = to_insert
+def bins_have_live_node(bin_heads, bin_lengths, next_node, bitmap, dead_node_mask):
+    """
+    Checks if any node in the bins isn't marked in dead_node_mask.  The bins are looked through in priority order, so
+    this usually stops at the first node.
+    """
+    for word_index in range(len(bitmap)):
+        word = bitmap[word_index]
+        while word:
+            cur_bin = 64 * word_index + lowest_set_bit_index(word)
+            cur_node = bin_heads[cur_bin]
+            for _ in range(bin_lengths[cur_bin]):
+                if should_keep_node(dead_node_mask, cur_node):
+                    return True
+                cur_node = next_node[cur_node]
+            word &= word - np.uint64(1)
+    return False
 
-        clear_holder_holder(bin_ll_holder)
-        return to_return
 
-    bin_lls = get_list_from_holder_holder(bin_ll_holder)
+@njit
+def compact_bins(bin_heads, bin_lengths, next_node, bitmap, dead_node_mask):
+    """
+    Unlinks every node marked in dead_node_mask from the bins, and sets the bin lengths to the number of nodes which
+    remain.
 
-    insert_nodes(bins, bin_lls, bin_lengths, non_empty_mask, to_insert, scores, zero_shift)
+    :return: The number of nodes removed
+    """
+    num_removed = 0
+    for cur_bin in np.nonzero(bin_lengths)[0]:
+        prev_node = NO_NODE_INDEX
+        cur_node = bin_heads[cur_bin]
+        num_kept = 0
+        for _ in range(bin_lengths[cur_bin]):
+            following_node = next_node[cur_node]
+            if should_keep_node(dead_node_mask, cur_node):
+                prev_node = cur_node
+                num_kept += 1
+            elif prev_node == NO_NODE_INDEX:
+                bin_heads[cur_bin] = following_node
+            else:
+                next_node[prev_node] = following_node
+            cur_node = following_node
 
-    batch_to_return = get_batch(bin_lls, bin_lengths, non_empty_mask, max_batch_size_to_accept)
+        num_removed += bin_lengths[cur_bin] - num_kept
+        bin_lengths[cur_bin] = num_kept
 
-    new_holder_holder = get_holder_holder_from_list(bin_lls)
-    bin_ll_holder.held = new_holder_holder.held
-    bin_ll_holder.next = new_holder_holder.next
+        if num_kept == 0:
+            clear_bin_bit(bitmap, cur_bin)
 
-    return batch_to_return
+    return num_removed
 
 
 
 class PriorityBins(GlobalNodeList):
-    def __init__(self, bins, max_batch_size_to_accept, zero_shift=0, save_info=False):
+    """
+    A GlobalNodeList which approximates a priority queue by placing nodes into bins based on the distance of their
+    score from the zero-shift.  Each bin is a LIFO linked list threaded through an array indexed by node, the length
+    of each bin is tracked as nodes are moved, and the highest priority non-empty bin is found with a find-first-set
+    over a bitmap.
+
+    The array returned from insert_nodes_and_get_next_batch is a view into a buffer which is reused, so it's only
+    valid until the next call.
+
+    Nodes are deleted lazily, using a boolean array (indexed by node) owned by whatever stores the nodes, which marks
+    the nodes that have either terminated or have a terminated ancestor.  Marked nodes are discarded as they're popped,
+    and every compaction_interval batches they're all removed from the bins.
+    """
+    def __init__(self, bins, max_batch_size_to_accept, max_nodes=2**20, zero_shift=0, save_info=False,
+                 bin_updater=None, dead_node_mask=None, compaction_interval=50, telemetry=None):
+        self.bin_updater = bin_updater
+        if bins is None:
+            bins, zero_shift = bin_updater.initial_boundaries()
+
         num_bins = (len(bins) + 1)
 
         self.bins = bins[::-1]
 
+        self.bin_heads = np.full(num_bins, NO_NODE_INDEX, dtype=np.int32)
         self.bin_lengths = np.zeros(num_bins, dtype=np.int32)
-        self.non_empty_mask = np.zeros(num_bins, dtype=np.bool_)
+        self.non_empty_bitmap = np.zeros((num_bins + 63) // 64, dtype=np.uint64)
 
-        temp_dummy_node = create_dummy_node_holder()
-        self.holder_holder = get_holder_holder_from_list([temp_dummy_node for _ in range(num_bins)])
+        self.next_node = np.full(max_nodes, NO_NODE_INDEX, dtype=np.int32)
 
         self.max_batch_size_to_accept = max_batch_size_to_accept
+        self.batch_buffer = np.empty(max_batch_size_to_accept, dtype=np.int32)
+
         self.zero_shift = zero_shift
 
+        self.set_dead_node_mask(dead_node_mask)
+
+        self.num_stored = 0
+        self.num_batches = 0
+        self.compaction_interval = compaction_interval
+
+        self.telemetry = telemetry
+
         self.save_info = save_info
 
         if save_info:
@@ -201,41 +451,363 @@ class PriorityBins(GlobalNodeList):
     def reset_logs(self):
         self.total_in = 0
         self.total_out = 0
+        self.total_compacted = 0
 
     def __len__(self):
-        return np.sum(self.bin_lengths)
+        return self.num_stored
+
+    def compact(self):
+        """
+        Removes all the nodes marked in the dead node mask from the bins.
+
+        :return: The number of nodes removed
+        """
+        num_removed = compact_bins(
+            self.bin_heads,
+            self.bin_lengths,
+            self.next_node,
+            self.non_empty_bitmap,
+            self.dead_node_mask)
+
+        self.num_stored -= num_removed
+
+        if self.save_info:
+            self.total_compacted += num_removed
+
+        return num_removed
+
+    def set_dead_node_mask(self, dead_node_mask):
+        self.dead_node_mask = np.zeros(0, dtype=np.bool_) if dead_node_mask is None else dead_node_mask
 
     def is_empty(self):
-        return not np.any(self.non_empty_mask)
+        return self.num_stored == 0 or not bins_have_live_node(
+            self.bin_heads, self.bin_lengths, self.next_node, self.non_empty_bitmap, self.dead_node_mask)
 
     def num_non_empty(self):
-        return np.sum(self.non_empty_mask)
+        return np.count_nonzero(self.bin_lengths)
 
     def largest_bin(self):
         return np.max(self.bin_lengths)
 
     def clear_list(self):
-        clear_holder_holder(self.holder_holder)
-
-        self.bin_lengths[self.non_empty_mask] = 0
-        self.non_empty_mask[self.non_empty_mask] = False
+        self.bin_heads[:] = NO_NODE_INDEX
+        self.bin_lengths[:] = 0
+        self.non_empty_bitmap[:] = 0
+        self.num_stored = 0
+
+    def _ensure_node_capacity(self, to_insert):
+        if len(to_insert) != 0 and np.max(to_insert) >= len(self.next_node):
+            new_next_node = np.full(max(2 * len(self.next_node), np.max(to_insert) + 1), NO_NODE_INDEX, dtype=np.int32)
+            new_next_node[:len(self.next_node)] = self.next_node
+            self.next_node = new_next_node
+
+    def set_max_batch_size(self, max_batch_size):
+        self.max_batch_size_to_accept = max_batch_size
+        if len(self.batch_buffer) < max_batch_size:
+            self.batch_buffer = np.empty(max_batch_size, dtype=np.int32)
+
+    def set_bin_boundaries(self, bins, zero_shift):
+        self.bins = bins[::-1]
+        self.zero_shift = zero_shift
 
     def insert_nodes_and_get_next_batch(self, to_insert, scores):
         if self.save_info:
             self.total_in += len(scores)
 
-        to_return = insert_and_get_batch(
+        if not self.bin_updater is None:
+            new_boundaries = self.bin_updater.update(scores)
+            if not new_boundaries is None:
+                self.set_bin_boundaries(*new_boundaries)
+
+        self._ensure_node_capacity(to_insert)
+
+        self.num_batches += 1
+        if not self.compaction_interval is None and self.num_batches % self.compaction_interval == 0:
+            self.compact()
+
+        start_time = time.perf_counter()
+
+        insert_nodes(
+            self.bins,
+            self.bin_heads,
+            self.bin_lengths,
+            self.next_node,
+            self.non_empty_bitmap,
             to_insert,
             scores,
-            self.bins,
-            self.holder_holder,
+            self.zero_shift)
+
+        inserted_time = time.perf_counter()
+
+        num_found, bins_touched, num_discarded = get_batch(
+            self.bin_heads,
             self.bin_lengths,
-            self.non_empty_mask,
+            self.next_node,
+            self.non_empty_bitmap,
+            self.batch_buffer,
             self.max_batch_size_to_accept,
-            self.zero_shift)
+            self.dead_node_mask)
+
+        self.num_stored += len(to_insert) - num_found - num_discarded
+
+        if self.save_info:
+            self.total_out += num_found
+
+        if not self.telemetry is None:
+            self.telemetry.record(
+                len(to_insert), num_found, self.max_batch_size_to_accept, bins_touched, num_discarded, self.num_stored,
+                inserted_time - start_time, time.perf_counter() - inserted_time, self.bin_lengths)
+
+        return self.batch_buffer[:num_found]
+
+
+
+@njit
+def heap_sift_up(heap_nodes, heap_priorities, index, arity):
+    node = heap_nodes[index]
+    priority = heap_priorities[index]
+    while index != 0:
+        parent = (index - 1) // arity
+        if heap_priorities[parent] >= priority:
+            break
+        heap_nodes[index] = heap_nodes[parent]
+        heap_priorities[index] = heap_priorities[parent]
+        index = parent
+
+    heap_nodes[index] = node
+    heap_priorities[index] = priority
+
+
+@njit
+def heap_sift_down(heap_nodes, heap_priorities, heap_size, index, arity):
+    node = heap_nodes[index]
+    priority = heap_priorities[index]
+    while True:
+        first_child = arity * index + 1
+        if first_child >= heap_size:
+            break
+
+        best_child = first_child
+        for child in range(first_child + 1, min(first_child + arity, heap_size)):
+            if heap_priorities[child] > heap_priorities[best_child]:
+                best_child = child
+
+        if heap_priorities[best_child] <= priority:
+            break
+
+        heap_nodes[index] = heap_nodes[best_child]
+        heap_priorities[index] = heap_priorities[best_child]
+        index = best_child
+
+    heap_nodes[index] = node
+    heap_priorities[index] = priority
+
+
+@njit
+def heap_insert_nodes(heap_nodes, heap_priorities, heap_size, to_insert, scores, zero_shift, arity):
+    """
+    :return: The new size of the heap
+    """
+    priorities = np.abs(scores - zero_shift)
+    for j in range(len(to_insert)):
+        heap_nodes[heap_size] = to_insert[j]
+        heap_priorities[heap_size] = priorities[j]
+        heap_sift_up(heap_nodes, heap_priorities, heap_size, arity)
+        heap_size += 1
+    return heap_size
+
+
+@njit
+def heap_get_batch(heap_nodes, heap_priorities, heap_size, batch_buffer, max_batch_size_to_accept, dead_node_mask,
+                   arity):
+    """
+    Pops nodes from the heap in priority order until max_batch_size_to_accept nodes not marked in dead_node_mask
+    have been found, or the heap is empty.
 
-        if self.save_info and to_return:
-            self.total_out += len_node_holder(to_return)
+    :return: A tuple of the new size of the heap, the number of nodes placed into batch_buffer, and the number of
+     nodes discarded
+    """
+    num_found = 0
+    num_discarded = 0
+    while heap_size != 0 and num_found < max_batch_size_to_accept:
+        popped = heap_nodes[0]
+
+        heap_size -= 1
+        heap_nodes[0] = heap_nodes[heap_size]
+        heap_priorities[0] = heap_priorities[heap_size]
+        heap_sift_down(heap_nodes, heap_priorities, heap_size, 0, arity)
+
+        if should_keep_node(dead_node_mask, popped):
+            batch_buffer[num_found] = popped
+            num_found += 1
+        else:
+            num_discarded += 1
+
+    return heap_size, num_found, num_discarded
+
+
+@njit
+def heap_has_live_node(heap_nodes, heap_size, dead_node_mask):
+    """
+    Checks if any node in the heap isn't marked in dead_node_mask.
+    """
+    for j in range(heap_size):
+        if should_keep_node(dead_node_mask, heap_nodes[j]):
+            return True
+    return False
+
+
+@njit
+def heap_compact(heap_nodes, heap_priorities, heap_size, dead_node_mask, arity):
+    """
+    Removes the nodes marked in dead_node_mask, then rebuilds the heap from the ones which remain (bottom-up).
+
+    :return: The new size of the heap
+    """
+    new_size = 0
+    for j in range(heap_size):
+        if should_keep_node(dead_node_mask, heap_nodes[j]):
+            heap_nodes[new_size] = heap_nodes[j]
+            heap_priorities[new_size] = heap_priorities[j]
+            new_size += 1
+
+    if new_size > 1:
+        for j in range((new_size - 2) // arity, -1, -1):
+            heap_sift_down(heap_nodes, heap_priorities, new_size, j, arity)
+
+    return new_size
+
+
+
+class DAryHeapNodeList(GlobalNodeList):
+    """
+    A GlobalNodeList which gives nodes in exact priority order (as opposed to the pseudo-priority order of the
+    PriorityBins), using a d-ary max-heap of node indices.  A node's priority is the same as what's used to choose
+    it's bin in PriorityBins, so this is used to measure what the binning approximation costs.
+
+    Like PriorityBins, the returned array is a view into a reused buffer, and nodes marked in the dead node mask are
+    discarded as they're popped and every compaction_interval batches.
+    """
+    def __init__(self, max_batch_size_to_accept, arity=4, initial_capacity=2**16, zero_shift=0, save_info=False,
+                 bin_updater=None, dead_node_mask=None, compaction_interval=50, telemetry=None):
+        """
+        :param arity: The number of children each node of the heap has
+        :param bin_updater: A BinBoundaryUpdater, only the zero-shift it computes is used (the priorities of nodes
+         already in the heap are not changed when it does)
+        :param telemetry: An OpenNodeListTelemetry to record information about each batch in (the heap has no bins,
+         so no occupancy is recorded), or None if nothing should be recorded
+        """
+        self.arity = arity
+
+        self.heap_nodes = np.empty(initial_capacity, dtype=np.int32)
+        self.heap_priorities = np.empty(initial_capacity, dtype=np.float32)
+        self.heap_size = 0
+
+        self.max_batch_size_to_accept = max_batch_size_to_accept
+        self.batch_buffer = np.empty(max_batch_size_to_accept, dtype=np.int32)
+
+        self.zero_shift = zero_shift
+        self.bin_updater = bin_updater
+
+        self.set_dead_node_mask(dead_node_mask)
+
+        self.num_batches = 0
+        self.compaction_interval = compaction_interval
+
+        self.telemetry = telemetry
+
+        self.save_info = save_info
+
+        if save_info:
+            self.reset_logs()
+
+    def reset_logs(self):
+        self.total_in = 0
+        self.total_out = 0
+        self.total_compacted = 0
+
+    def __len__(self):
+        return self.heap_size
+
+    def set_dead_node_mask(self, dead_node_mask):
+        self.dead_node_mask = np.zeros(0, dtype=np.bool_) if dead_node_mask is None else dead_node_mask
+
+    def is_empty(self):
+        return self.heap_size == 0 or not heap_has_live_node(self.heap_nodes, self.heap_size, self.dead_node_mask)
+
+    def clear_list(self):
+        self.heap_size = 0
+
+    def compact(self):
+        new_size = heap_compact(self.heap_nodes, self.heap_priorities, self.heap_size, self.dead_node_mask, self.arity)
+        num_removed = self.heap_size - new_size
+        self.heap_size = new_size
+
+        if self.save_info:
+            self.total_compacted += num_removed
+
+        return num_removed
+
+    def set_max_batch_size(self, max_batch_size):
+        self.max_batch_size_to_accept = max_batch_size
+        if len(self.batch_buffer) < max_batch_size:
+            self.batch_buffer = np.empty(max_batch_size, dtype=np.int32)
+
+    def _ensure_capacity(self, num_to_insert):
+        if self.heap_size + num_to_insert > len(self.heap_nodes):
+            new_capacity = max(2 * len(self.heap_nodes), self.heap_size + num_to_insert)
+
+            new_nodes = np.empty(new_capacity, dtype=np.int32)
+            new_priorities = np.empty(new_capacity, dtype=np.float32)
+            new_nodes[:self.heap_size] = self.heap_nodes[:self.heap_size]
+            new_priorities[:self.heap_size] = self.heap_priorities[:self.heap_size]
+
+            self.heap_nodes = new_nodes
+            self.heap_priorities = new_priorities
+
+    def insert_nodes_and_get_next_batch(self, to_insert, scores):
+        if self.save_info:
+            self.total_in += len(scores)
+
+        if not self.bin_updater is None:
+            new_boundaries = self.bin_updater.update(scores)
+            if not new_boundaries is None:
+                self.zero_shift = new_boundaries[1]
+
+        self.num_batches += 1
+        if not self.compaction_interval is None and self.num_batches % self.compaction_interval == 0:
+            self.compact()
+
+        self._ensure_capacity(len(to_insert))
+
+        start_time = time.perf_counter()
+
+        self.heap_size = heap_insert_nodes(
+            self.heap_nodes,
+            self.heap_priorities,
+            self.heap_size,
+            to_insert,
+            scores,
+            self.zero_shift,
+            self.arity)
+
+        inserted_time = time.perf_counter()
+
+        self.heap_size, num_found, num_discarded = heap_get_batch(
+            self.heap_nodes,
+            self.heap_priorities,
+            self.heap_size,
+            self.batch_buffer,
+            self.max_batch_size_to_accept,
+            self.dead_node_mask,
+            self.arity)
+
+        if self.save_info:
+            self.total_out += num_found
 
-        return to_return
+        if not self.telemetry is None:
+            self.telemetry.record(
+                len(to_insert), num_found, self.max_batch_size_to_accept, 0, num_discarded, self.heap_size,
+                inserted_time - start_time, time.perf_counter() - inserted_time)
 
+        return self.batch_buffer[:num_found]
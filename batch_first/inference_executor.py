@@ -0,0 +1,181 @@
+import threading
+import queue
+import time
+
+from concurrent.futures import Future
+
+from . import *
+
+from .numba_negamax_zero_window import struct_array_to_ann_inputs_in_buffers, MAX_RELEVANT_SQUARES_PER_BOARD
+from .classes_and_structs import numpy_node_info_dtype
+
+
+
+class InferenceFuture(Future):
+    """
+    A Future for the result of a request made to an InferenceExecutor, which also stores when the request was
+    submitted, started, and finished.
+    """
+
+    def __init__(self, kind, num_boards):
+        super().__init__()
+        self.kind = kind
+        self.num_boards = num_boards
+
+        self.submit_time = time.time()
+        self.start_time = None
+        self.finish_time = None
+
+    @property
+    def queue_time(self):
+        """
+        The number of seconds the request waited in the queue before being started.
+        """
+        return self.start_time - self.submit_time
+
+    @property
+    def compute_time(self):
+        """
+        The number of seconds spent creating the request's inputs and running the network on them.
+        """
+        return self.finish_time - self.start_time
+
+
+
+class InferenceExecutor(object):
+    """
+    Runs the board evaluation and move scoring functions on a single long-lived worker thread, for requests taken
+    from a queue (instead of a new thread being created for each batch).  An InferenceExecutor can be given to the
+    search in place of both the board_eval_fn and the move_eval_fn.
+
+    The network inputs are created in buffers which are reused by every request (and grown as needed), so they're
+    only allocated once.
+
+    NOTES:
+    1) For move scoring requests, the result is the function which completes the scoring (given the moves to be
+    scored), as is returned by the move_eval_fn.  That second stage is run by whoever gets the result, and isn't
+    included in the request's compute time
+    2) Requests are run in the order they're submitted
+    3) Since the input buffers are reused, the board_eval_fn and move_eval_fn must be done with their inputs once
+    they return
+    """
+
+    def __init__(self, board_eval_fn, move_eval_fn, max_batch_size=5000, closer_fn=None, record_timings=False):
+        """
+        :param board_eval_fn: The function which evaluates boards (from their network inputs)
+        :param move_eval_fn: The function which starts the scoring of boards' moves (from their network inputs)
+        :param max_batch_size: The number of boards the input buffers are initially created to hold
+        :param closer_fn: A function taking no arguments to be run when the executor is shut down (e.g. to close the
+         model's session), or None
+        :param record_timings: If a tuple of each request's kind ("eval" or "move"), number of boards, queue time,
+         and compute time should be appended to the executor's timings list
+        """
+        self.board_eval_fn = board_eval_fn
+        self.move_eval_fn = move_eval_fn
+        self.closer_fn = closer_fn
+
+        self.record_timings = record_timings
+        self.timings = []
+
+        self._allocate_buffers(max_batch_size)
+
+        self.request_queue = queue.Queue()
+
+        self.worker = threading.Thread(target=self._run_worker, daemon=True)
+        self.worker.start()
+
+    def _allocate_buffers(self, num_boards):
+        self.occupied_bbs_buffer = np.empty(num_boards, dtype=np.uint64)
+        self.squares_buffer = np.empty(MAX_RELEVANT_SQUARES_PER_BOARD * num_boards + 1, dtype=np.uint8)
+
+    def _create_inputs(self, children, not_children, not_child_indices, child_score_mask, not_child_score_mask,
+                       num_to_score):
+        if num_to_score > len(self.occupied_bbs_buffer):
+            self._allocate_buffers(max(num_to_score, 2 * len(self.occupied_bbs_buffer)))
+
+        return struct_array_to_ann_inputs_in_buffers(
+            children,
+            not_children,
+            not_child_indices,
+            child_score_mask,
+            not_child_score_mask,
+            num_to_score,
+            self.occupied_bbs_buffer,
+            self.squares_buffer)
+
+    def _run_worker(self):
+        while True:
+            request = self.request_queue.get()
+            if request is None:
+                break
+
+            future, fn, input_args = request
+
+            future.start_time = time.time()
+            try:
+                result = fn(*self._create_inputs(*input_args))
+            except BaseException as e:
+                future.finish_time = time.time()
+                future.set_exception(e)
+            else:
+                future.finish_time = time.time()
+                future.set_result(result)
+
+            if self.record_timings:
+                self.timings.append((future.kind, future.num_boards, future.queue_time, future.compute_time))
+
+    def submit_board_evaluations(self, struct_array, to_score_mask):
+        """
+        Queues the evaluation of the boards in the given struct array which are marked in the mask.
+
+        :return: An InferenceFuture for the array of evaluation scores
+        """
+        num_to_score = np.sum(to_score_mask)
+
+        future = InferenceFuture("eval", num_to_score)
+
+        self.request_queue.put((
+            future,
+            lambda *inputs: np.asarray(self.board_eval_fn(*inputs), dtype=np.float32),
+            (struct_array,
+             np.array([], dtype=numpy_node_info_dtype),
+             np.array([], dtype=np.int32),
+             to_score_mask,
+             np.array([], dtype=np.bool_),
+             num_to_score)))
+
+        return future
+
+    def submit_move_scoring(self, children, not_children, not_child_indices, child_score_mask, not_child_score_mask):
+        """
+        Queues the first stage of scoring the moves of the given boards (see start_move_scoring).
+
+        :return: A tuple of an InferenceFuture for the function which completes the move scoring, the number of
+         children being scored, and the number of non-children being scored
+        """
+        num_children_to_score = np.sum(child_score_mask)
+        num_not_child_to_score = np.sum(not_child_score_mask)
+
+        future = InferenceFuture("move", num_children_to_score + num_not_child_to_score)
+
+        self.request_queue.put((
+            future,
+            self.move_eval_fn,
+            (children,
+             not_children,
+             not_child_indices,
+             child_score_mask,
+             not_child_score_mask,
+             num_children_to_score + num_not_child_to_score)))
+
+        return future, num_children_to_score, num_not_child_to_score
+
+    def shutdown(self):
+        """
+        Stops the worker thread once the requests already submitted are finished, then runs the closer function.
+        """
+        self.request_queue.put(None)
+        self.worker.join()
+
+        if not self.closer_fn is None:
+            self.closer_fn()
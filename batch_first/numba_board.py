@@ -239,6 +239,30 @@ def _to_chess960_tuple(board_state, move):
     return move[0], move[1], move[2]
 
 
+@njit
+def _push_null_move(board_state):
+    """
+    Passes the turn of the given board (makes a null move), incrementally updating it's Zobrist hash.
+    """
+    ep_square = board_state.ep_square
+    board_state.ep_square = 0
+
+    # reset the ep square in the hash
+    if ep_square:
+        if board_state.turn:
+            ep_mask = shift_down(BB_SQUARES[ep_square])
+        else:
+            ep_mask = shift_up(BB_SQUARES[ep_square])
+
+        if (shift_left(ep_mask) | shift_right(ep_mask)) & board_state.pawns & board_state.occupied_co[board_state.turn]:
+            board_state.hash ^= RANDOM_ARRAY[772 + square_file(ep_square)]
+
+    board_state.halfmove_clock += 1
+
+    board_state.turn ^= 1
+    board_state.hash ^= RANDOM_ARRAY[780]
+
+
 @njit(parallel=True)
 def push_moves(struct_array, move_array):
     """
@@ -249,7 +273,8 @@ def push_moves(struct_array, move_array):
     :param struct_array: An ndarray with dtype numpy_node_info_dtype.
     :param move_array: The moves to be pushed, one for each of the structs in struct_array.  It is given as
     an ndarray with dtype np.uint8 and shape of [len(struct_array), 3] (dimention 2 has size 3 for
-    from_square, to_square, and promotion).
+    from_square, to_square, and promotion).  A move with NULL_MOVE_SQUARE as it's from square is a null move
+    (the turn is passed).
 
     NOTES:
     1) While this function doesn't take up very much time, speed improvements should be considered a very
@@ -264,6 +289,10 @@ def push_moves(struct_array, move_array):
     as an array so it can be indexed with turn).
     """
     for j in nb.prange(len(struct_array)):
+        if move_array[j, 0] == NULL_MOVE_SQUARE:
+            _push_null_move(struct_array[j])
+            continue
+
         move_from_square, move_to_square, move_promotion = _to_chess960_tuple(struct_array[j], move_array[j])
 
         # Reset ep square.
@@ -1082,9 +1111,13 @@ def set_up_move_array(board_struct):
 
 @njit
 def set_up_move_arrays(structs):
-    for j in range(len(structs)):
+    for j in nb.prange(len(structs)):
         set_up_move_array(structs[j])
 
+
+# The same loop compiled to set up the move arrays in parallel
+parallel_set_up_move_arrays = njit(parallel=True)(set_up_move_arrays.py_func)
+
 @njit
 def has_legal_move(board_struct):
     king = msb(board_struct['kings'] & board_struct['occupied_co'][board_struct.turn])
@@ -1,7 +1,10 @@
 import threading
 import time
 
+from concurrent.futures import Future
+
 from .numba_board import *
+from .numba_board import _attackers_mask
 from . import transposition_table as tt
 
 from .classes_and_structs import *
@@ -30,23 +33,37 @@ def square_scanner_helper(bb, mirror_squares=False):
 
 
 @njit
-def get_square_ary(struct, relevent_square_mask):
+def set_square_ary(struct, relevent_square_mask, squares):
     """
-    Creates and returns an array of the ann filters indices corresponding to the given boards 'relevant' squares.
+    Sets the given array to the ann filters indices corresponding to the given boards 'relevant' squares.
     A 'relevant' square is a square that's either occupied or an ep-capture square.
+
+    :return: The number of squares set (the popcount of the relevant square mask)
     """
-    squares = np.empty(popcount(relevent_square_mask), np.uint8)
-    for j, square in enumerate(square_scanner_helper(relevent_square_mask, not struct['turn'])):
+    num_squares = 0
+    for square in square_scanner_helper(relevent_square_mask, not struct['turn']):
         type = piece_type_at(struct, square)
 
         if type:
             bb_square = BB_SQUARES[square]
-            squares[j] = 7 if struct['occupied_co'][struct['turn']] & bb_square else 14
+            squares[num_squares] = 7 if struct['occupied_co'][struct['turn']] & bb_square else 14
             if struct['castling_rights'] & bb_square == 0:
-                squares[j] -= type
+                squares[num_squares] -= type
         else:
-            squares[j] = 0
+            squares[num_squares] = 0
+
+        num_squares += 1
+
+    return num_squares
+
 
+@njit
+def get_square_ary(struct, relevent_square_mask):
+    """
+    Creates and returns an array of the ann filters indices corresponding to the given boards 'relevant' squares.
+    """
+    squares = np.empty(popcount(relevent_square_mask), np.uint8)
+    set_square_ary(struct, relevent_square_mask, squares)
     return squares
 
 
@@ -69,22 +86,26 @@ def own_concat(lst, total_size):
 
 
 @njit
-def struct_array_to_ann_inputs(child_structs, not_child_structs, to_score_child_mask, to_score_not_child_mask, total_num_to_score):
+def struct_array_to_ann_inputs(child_structs, not_child_structs, not_child_indices, to_score_child_mask,
+                               to_score_not_child_mask, total_num_to_score):
     """
     Uses ceil((popcnt(occupied)+int(has_ep))/2)*8+64=[80, 200] bits per board transferred.
+
+    :param not_child_indices: The indices (into not_child_structs) of the non-child boards, so that they can be read
+     directly from the node arena's struct array
     """
     occupied_bbs = np.empty(total_num_to_score, dtype=np.uint64)
 
     total_squares = 0
     store_index = 0
     to_concat = []
-    for j in range(len(child_structs) + len(not_child_structs)):
+    for j in range(len(child_structs) + len(not_child_indices)):
         if j < len(child_structs):
             should_score = to_score_child_mask[j]
             struct = child_structs[j]
         else:
             should_score = to_score_not_child_mask[j - len(child_structs)]
-            struct = not_child_structs[j - len(child_structs)]
+            struct = not_child_structs[not_child_indices[j - len(child_structs)]]
 
         if should_score:
             occupied_bbs[store_index] = struct['occupied']
@@ -105,8 +126,56 @@ def struct_array_to_ann_inputs(child_structs, not_child_structs, to_score_child_
     return compressed_squares, occupied_bbs
 
 
+# Every piece plus an ep-capture square
+MAX_RELEVANT_SQUARES_PER_BOARD = 33
+
+
+@njit
+def struct_array_to_ann_inputs_in_buffers(child_structs, not_child_structs, not_child_indices, to_score_child_mask,
+                                          to_score_not_child_mask, total_num_to_score, occupied_bbs_buffer,
+                                          squares_buffer):
+    """
+    The same as struct_array_to_ann_inputs, but the inputs are created in the given buffers instead of newly
+    allocated arrays, and views into the buffers are returned.
+
+    :param occupied_bbs_buffer: A uint64 array with room for at least total_num_to_score bitboards
+    :param squares_buffer: A uint8 array with room for at least MAX_RELEVANT_SQUARES_PER_BOARD * total_num_to_score + 1
+     squares
+    """
+    occupied_bbs = occupied_bbs_buffer[:total_num_to_score]
+
+    total_squares = 0
+    store_index = 0
+    for j in range(len(child_structs) + len(not_child_indices)):
+        if j < len(child_structs):
+            should_score = to_score_child_mask[j]
+            struct = child_structs[j]
+        else:
+            should_score = to_score_not_child_mask[j - len(child_structs)]
+            struct = not_child_structs[not_child_indices[j - len(child_structs)]]
+
+        if should_score:
+            occupied_bbs[store_index] = struct['occupied']
+            if struct['ep_square']:
+                occupied_bbs[store_index] |= BB_SQUARES[struct['ep_square']]
+
+            if not struct['turn']:
+                occupied_bbs[store_index] = flip_vertically(occupied_bbs[store_index])
+
+            total_squares += set_square_ary(struct, occupied_bbs[store_index], squares_buffer[total_squares:])
+
+            store_index += 1
+
+    if total_squares % 2:
+        squares_buffer[total_squares] = 0
+
+    compressed_squares = compress_square_array(squares_buffer[:total_squares + (total_squares % 2)])
+
+    return compressed_squares, occupied_bbs
+
+
 @njit
-def can_draw_from_repetition(board_struct, parent_node, previous_board_map):
+def can_draw_from_repetition(board_struct, node_arena, parent, previous_board_map):
     """
     NOTES:
      1) Look into if hash collisions are something thing I need to be checking for (type 1 collisions)
@@ -122,26 +191,26 @@ def can_draw_from_repetition(board_struct, parent_node, previous_board_map):
         num_found_so_far = 1
 
 
-    if parent_node.parent is None:
+    if parent == NO_NODE_INDEX or node_arena.parents[parent] == NO_NODE_INDEX:
         return False
 
-    node = parent_node.parent
+    node = node_arena.parents[parent]
 
-    if board_struct['hash'] == node.struct['hash']:
+    if board_struct['hash'] == node_arena.structs[node]['hash']:
         num_found_so_far += 1
 
     if num_found_so_far >= 3:
         return True
 
-    for num in range(node.struct['halfmove_clock'], 1, -2):
+    for num in range(node_arena.structs[node]['halfmove_clock'], 1, -2):
         if num < 3 and num_found_so_far == 1:
             return False
-        elif node.parent is None or node.parent.parent is None:
+        elif node_arena.parents[node] == NO_NODE_INDEX or node_arena.parents[node_arena.parents[node]] == NO_NODE_INDEX:
             return False
 
-        node = node.parent.parent
+        node = node_arena.parents[node_arena.parents[node]]
 
-        if board_struct['hash'] == node.struct['hash']:
+        if board_struct['hash'] == node_arena.structs[node]['hash']:
             num_found_so_far += 1
 
             if num_found_so_far >= 3:
@@ -161,45 +230,96 @@ def set_up_next_best_move(board_struct):
     return best_move_score
 
 
-def start_move_scoring(children, not_children, child_score_mask, not_child_score_mask, move_eval_fn):
-    num_children_to_score = np.sum(child_score_mask)
-    num_not_child_to_score = np.sum(not_child_score_mask)
+def run_in_thread_with_future(fn):
+    """
+    Runs the given function (taking no arguments) in a new thread.
+
+    :return: A Future for the function's return value
+    """
+    future = Future()
+
+    def run_and_set():
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run_and_set).start()
+    return future
+
+
+def start_move_scoring(children, not_children, not_child_indices, child_score_mask, not_child_score_mask, move_eval_fn,
+                       batch_dispatcher=None):
+    """
+    Starts the first stage of scoring the moves of the given boards.
+
+    :param move_eval_fn: The move scoring function, or an InferenceExecutor to submit the boards to
+    :param batch_dispatcher: The BatchDispatcher to time the inference with (see BatchDispatcher.time_inference), or
+     None
+    :return: A tuple of a Future for the function which completes the move scoring (given the moves to score), the
+     number of children being scored, and the number of non-children being scored
+    """
+    submit_time = time.perf_counter()
+
+    if hasattr(move_eval_fn, "submit_move_scoring"):
+        to_return = move_eval_fn.submit_move_scoring(
+            children, not_children, not_child_indices, child_score_mask, not_child_score_mask)
+    else:
+        num_children_to_score = np.sum(child_score_mask)
+        num_not_child_to_score = np.sum(not_child_score_mask)
+
+        future = run_in_thread_with_future(
+            lambda: move_eval_fn(
+                *struct_array_to_ann_inputs(
+                    children,
+                    not_children,
+                    not_child_indices,
+                    child_score_mask,
+                    not_child_score_mask,
+                    num_children_to_score + num_not_child_to_score)))
+
+        to_return = future, num_children_to_score, num_not_child_to_score
 
-    result_getter = [None]
-    def set_move_scores():
-        result_getter[0] = move_eval_fn(
-            *struct_array_to_ann_inputs(
-                children,
-                not_children,
-                child_score_mask,
-                not_child_score_mask,
-                num_children_to_score + num_not_child_to_score))
+    if not batch_dispatcher is None:
+        batch_dispatcher.time_inference(to_return[0], to_return[1] + to_return[2], submit_time)
 
-    t = threading.Thread(target=set_move_scores)
-    t.start()
-    return t, result_getter, num_children_to_score, num_not_child_to_score
+    return to_return
 
 
-def start_board_evaluations(struct_array, to_score_mask, board_eval_fn):
+def start_board_evaluations(struct_array, to_score_mask, board_eval_fn, batch_dispatcher=None):
     """
     Start the evaluation of the depth zero nodes which were not previously terminated.
+
+    :param board_eval_fn: The board evaluation function, or an InferenceExecutor to submit the boards to
+    :param batch_dispatcher: The BatchDispatcher to time the inference with (see BatchDispatcher.time_inference), or
+     None
+    :return: A Future for the array of evaluation scores
     """
+    submit_time = time.perf_counter()
     num_to_score = np.sum(to_score_mask)
-    evaluation_scores = np.empty(num_to_score, dtype=np.float32)
 
-    def evaluate_and_set():
-        evaluation_scores[:] = board_eval_fn(
-            *struct_array_to_ann_inputs(
-                struct_array,
-                np.array([], dtype=numpy_node_info_dtype),
-                to_score_mask,
-                np.array([], dtype=np.bool_),
-                num_to_score))
+    if hasattr(board_eval_fn, "submit_board_evaluations"):
+        future = board_eval_fn.submit_board_evaluations(struct_array, to_score_mask)
+    else:
+        evaluation_scores = np.empty(num_to_score, dtype=np.float32)
+
+        def evaluate_and_set():
+            evaluation_scores[:] = board_eval_fn(
+                *struct_array_to_ann_inputs(
+                    struct_array,
+                    np.array([], dtype=numpy_node_info_dtype),
+                    np.array([], dtype=np.int32),
+                    to_score_mask,
+                    np.array([], dtype=np.bool_),
+                    num_to_score))
+            return evaluation_scores
 
-    t = threading.Thread(target=evaluate_and_set)
-    t.start()
+        future = run_in_thread_with_future(evaluate_and_set)
 
-    return t, evaluation_scores
+    if not batch_dispatcher is None:
+        batch_dispatcher.time_inference(future, num_to_score, submit_time)
+
+    return future
 
 
 @njit
@@ -225,7 +345,7 @@ def should_terminate_from_tt(board_struct, hash_table):
 
 
 @njit
-def depth_zero_should_terminate_array(struct_array, hash_table, previous_board_map, node_holder):
+def depth_zero_should_terminate_array(struct_array, hash_table, previous_board_map, node_arena, parent_indices):
     """
     This function goes through the given struct_array and looks for depth zero nodes which should terminate
     for reasons other than scoring by the evaluation function.  This is separate from
@@ -240,13 +360,17 @@ def depth_zero_should_terminate_array(struct_array, hash_table, previous_board_m
     4) Win/loss by checkmate
     5) Termination by information contained in the TT
     6) Draw by threefold repetition
+
+    NOTES:
+    1) Each iteration only writes to it's own struct, so this is also compiled with parallel=True
+    (as parallel_depth_zero_should_terminate_array)
     """
-    for j in range(len(struct_array)):
+    for j in nb.prange(len(struct_array)):
         if struct_array[j]['depth'] == 0:
             if struct_array[j]['halfmove_clock'] >= 50 or has_insufficient_material(struct_array[j]):
                 struct_array[j]['terminated'] = True
                 struct_array[j]['best_value'] = TIE_RESULT_SCORE
-            elif can_draw_from_repetition(struct_array[j], node_holder.held_node, previous_board_map):
+            elif can_draw_from_repetition(struct_array[j], node_arena, parent_indices[j], previous_board_map):
                 # This is just assigning a draw value, though it doesn't necessarily imply a draw,
                 # just that one can be claimed.   Not sure if this needs to be handled, and if yes how to handle it
                 struct_array[j]['terminated'] = True
@@ -256,7 +380,8 @@ def depth_zero_should_terminate_array(struct_array, hash_table, previous_board_m
             elif not has_legal_move(struct_array[j]):
                 struct_array[j]['terminated'] = True
 
-        node_holder = node_holder.next_holder
+
+parallel_depth_zero_should_terminate_array = njit(parallel=True)(depth_zero_should_terminate_array.py_func)
 
 
 @njit
@@ -282,7 +407,7 @@ def has_legal_tt_move(board_struct, hash_table):
 
 
 @njit
-def child_termination_check_and_move_gen(struct_array, hash_table, node_holder, previous_board_map):
+def child_termination_check_and_move_gen(struct_array, hash_table, node_arena, parent_indices, previous_board_map):
     """
     Things being checked:
     1) Draw by the 50-move rule
@@ -291,13 +416,17 @@ def child_termination_check_and_move_gen(struct_array, hash_table, node_holder,
     4) Win/loss by checkmate
     5) Termination by information contained in the TT
     6) Draw by threefold repetition
+
+    NOTES:
+    1) Like depth_zero_should_terminate_array, this is also compiled with parallel=True
+    (as parallel_child_termination_check_and_move_gen)
     """
-    for j in range(len(struct_array)):
+    for j in nb.prange(len(struct_array)):
         if struct_array[j]['depth'] != 0:
             if struct_array[j]["halfmove_clock"] >= 50 or has_insufficient_material(struct_array[j]):
                 struct_array[j]['best_value'] = TIE_RESULT_SCORE
                 struct_array[j]['terminated'] = True
-            elif can_draw_from_repetition(struct_array[j], node_holder.held_node, previous_board_map):
+            elif can_draw_from_repetition(struct_array[j], node_arena, parent_indices[j], previous_board_map):
                 # This is just assigning a draw value, though it doesn't necessarily imply a draw,
                 # just that one can be claimed.   Not sure if this needs to be handled, and if yes how to handle it
                 struct_array[j]['terminated'] = True
@@ -309,31 +438,179 @@ def child_termination_check_and_move_gen(struct_array, hash_table, node_holder,
             else:
                 set_up_move_array(struct_array[j])
 
-        node_holder = node_holder.next_holder
+
+parallel_child_termination_check_and_move_gen = njit(parallel=True)(child_termination_check_and_move_gen.py_func)
+
+
+@njit
+def copy_board_fields(to_set, to_copy):
+    """
+    Copies the fields describing the board (and the search's separator) from one struct to another, leaving the
+    move information to be set by the caller.
+    """
+    to_set['pawns'] = to_copy['pawns']
+    to_set['knights'] = to_copy['knights']
+    to_set['bishops'] = to_copy['bishops']
+    to_set['rooks'] = to_copy['rooks']
+    to_set['queens'] = to_copy['queens']
+    to_set['kings'] = to_copy['kings']
+    to_set['occupied_co'][:] = to_copy['occupied_co'][:]
+    to_set['occupied'] = to_copy['occupied']
+    to_set['turn'] = to_copy['turn']
+    to_set['castling_rights'] = to_copy['castling_rights']
+    to_set['ep_square'] = to_copy['ep_square']
+    to_set['halfmove_clock'] = to_copy['halfmove_clock']
+    to_set['hash'] = to_copy['hash']
+    to_set['terminated'] = to_copy['terminated']
+    to_set['separator'] = to_copy['separator']
+    to_set['depth'] = to_copy['depth']
+
+
+@njit
+def should_try_null_move(board_struct, null_move_reduction):
+    """
+    Checks if null move pruning should be tried for the given board.  It isn't when the board's null move child would
+    have a negative depth, when it was itself reached by a null move, when it's in check, or when the player to move
+    has only pawns (and their king), since zugzwang is likely in those positions.
+    """
+    if board_struct['depth'] <= null_move_reduction or board_struct['prev_move'][0] == NULL_MOVE_SQUARE:
+        return False
+
+    cur_turn_occupied = board_struct['occupied_co'][board_struct['turn']]
+    if not cur_turn_occupied & (board_struct['knights'] | board_struct['bishops'] | board_struct['rooks'] | board_struct['queens']):
+        return False
+
+    king = msb(board_struct['kings'] & cur_turn_occupied)
+    return not _attackers_mask(board_struct, 1 ^ board_struct['turn'], king, board_struct['occupied'])
+
+
+@njit
+def set_up_null_moves(structs, scored_mask, next_move_scores, null_move_reduction):
+    """
+    For each of the given structs (which just had their moves scored) that should try null move pruning, makes it's
+    null move the next child to be expanded, putting back the move which was set up to be next.  The scores used to
+    place the structs in the open node list are unchanged.
+    """
+    num_scored = 0
+    for j in range(len(structs)):
+        if scored_mask[j]:
+            if structs[j]['next_move_index'] != NO_MORE_MOVES_VALUE and should_try_null_move(structs[j], null_move_reduction):
+                structs[j]['unexplored_move_scores'][structs[j]['next_move_index']] = next_move_scores[num_scored]
+                structs[j]['next_move_index'] = NEXT_MOVE_IS_NULL_MOVE_VAL
+            num_scored += 1
+
+
+@njit
+def set_up_late_moves(board_struct, next_move_score, late_move_reductions):
+    """
+    Flags the given board's late moves (see LateMoveReductions) with REDUCED_MOVE_FLAG, so their children are searched
+    to a reduced depth.  The board's next move has already been set up (and removed from it's scores), it's score is
+    the one given.
+    """
+    if board_struct['next_move_index'] == NO_MORE_MOVES_VALUE:
+        return
+
+    if board_struct['depth'] < late_move_reductions.min_depth or board_struct['depth'] <= late_move_reductions.reduction:
+        return
+
+    num_full_depth_moves = (late_move_reductions.full_depth_moves +
+                            late_move_reductions.full_depth_moves_per_depth * board_struct['depth'])
+    min_full_depth_score = next_move_score - late_move_reductions.score_margin
+
+    # The next move is the first to be expanded, so the rest are ranked starting from 1
+    order = np.argsort(- board_struct['unexplored_move_scores'])
+    for rank in range(1, len(order) + 1):
+        move_index = order[rank - 1]
+        if board_struct['unexplored_move_scores'][move_index] == MIN_FLOAT32_VAL:
+            break
+
+        if rank >= num_full_depth_moves or board_struct['unexplored_move_scores'][move_index] < min_full_depth_score:
+            board_struct['unexplored_moves'][move_index, 2] += REDUCED_MOVE_FLAG
+
+
+@njit
+def set_up_late_move_reductions(structs, indices, scored_mask, next_move_scores, late_move_reductions):
+    """
+    Flags the late moves of the structs at the given indices which are marked in the mask (and just had their moves
+    scored, with the given next move scores), see set_up_late_moves.
+    """
+    num_scored = 0
+    for j in range(len(indices)):
+        if scored_mask[j]:
+            set_up_late_moves(structs[indices[j]], next_move_scores[num_scored], late_move_reductions)
+            num_scored += 1
+
+
+@njit
+def restore_reduced_move(board_struct, move):
+    """
+    Sets up the given reduced move of a board to be expanded again, this time to the full depth.  It's given the
+    score of a TT move, so it's expanded before any of the board's other moves (besides one which was already set up
+    to be next).
+
+    :return: True if the board had no moves left to expand (so it must be put back into the open node list), or False
+     if not
+    """
+    for j in range(MAX_MOVES_LOOKED_AT):
+        if np.all(board_struct['unexplored_moves'][j] == move):
+            board_struct['unexplored_moves'][j, 2] -= REDUCED_MOVE_FLAG
+            board_struct['unexplored_move_scores'][j] = TT_MOVE_SCORE_VALUE
+
+            if board_struct['next_move_index'] == NO_MORE_MOVES_VALUE:
+                set_up_next_best_move(board_struct)
+                return True
+            return False
+    return False
 
 
 @njit
-def create_child_structs(struct_array):
-    #This should not copy the entire array, instead only the fields which are not directly written over
-    #Also this should not be creating full structs for depth zero nodes, a new dtype will likely need to be created
+def create_child_structs(node_arena, batch, null_move_reduction=0, late_move_reduction=0):
+    """
+    Creates the struct of the next child to expand for each node in the batch, reading the parents directly from the
+    arena and setting up each parent's next best move in place.
+
+    A parent who's next move is it's null move (see set_up_null_moves) gets a null move child with it's depth
+    reduced by null_move_reduction (in addition to the usual 1), and then has it's next real move set up.  A child
+    made from a move flagged as reduced (see set_up_late_moves) has it's depth reduced by late_move_reduction, and
+    keeps the flag in it's prev_move.
+
+    :return: A tuple of the array of child structs, and the score of each parent's next move
+    """
+    #This should not be creating full structs for depth zero nodes, a new dtype will likely need to be created
     #which has a subset of the current ones fields.
-    child_array = struct_array.copy()
+    child_array = np.empty(len(batch), dtype=numpy_node_info_dtype)
 
-    new_next_move_values = np.empty_like(struct_array['best_value'])
+    new_next_move_values = np.empty(len(batch), dtype=np.float32)
 
     #This should be removed, and struct_array['prev_move'] should be used instead.  Numba has been very stuborn in resisting this change
-    moves_to_push = np.empty((len(struct_array), 3), dtype=np.uint8)
+    moves_to_push = np.empty((len(batch), 3), dtype=np.uint8)
 
-    for j in range(len(struct_array)):
+    for j in range(len(batch)):
+        parent_struct = node_arena.structs[batch[j]]
+
+        copy_board_fields(child_array[j], parent_struct)
         child_array[j]['unexplored_moves'][:] = 255
         child_array[j]['unexplored_move_scores'][:] = MIN_FLOAT32_VAL
-        child_array[j]['prev_move'][:] = struct_array[j]['unexplored_moves'][struct_array[j]['next_move_index']]
-        child_array[j]['depth'] = struct_array[j]['depth'] - 1
 
-        moves_to_push[j] = struct_array[j]['unexplored_moves'][struct_array[j]['next_move_index']]
+        if parent_struct['next_move_index'] == NEXT_MOVE_IS_NULL_MOVE_VAL:
+            child_array[j]['prev_move'][:] = NULL_MOVE
+            child_array[j]['depth'] = parent_struct['depth'] - 1 - null_move_reduction
+            moves_to_push[j] = NULL_MOVE
+
+            new_next_move_values[j] = set_up_next_best_move(parent_struct)
+            continue
 
-        if struct_array[j]['children_left'] != NEXT_MOVE_IS_FROM_TT_VAL:
-            new_next_move_values[j] = set_up_next_best_move(struct_array[j])
+        child_array[j]['prev_move'][:] = parent_struct['unexplored_moves'][parent_struct['next_move_index']]
+        moves_to_push[j] = parent_struct['unexplored_moves'][parent_struct['next_move_index']]
+
+        if moves_to_push[j, 2] >= REDUCED_MOVE_FLAG:
+            child_array[j]['depth'] = parent_struct['depth'] - 1 - late_move_reduction
+            moves_to_push[j, 2] -= REDUCED_MOVE_FLAG
+        else:
+            child_array[j]['depth'] = parent_struct['depth'] - 1
+
+        if parent_struct['children_left'] != NEXT_MOVE_IS_FROM_TT_VAL:
+            new_next_move_values[j] = set_up_next_best_move(parent_struct)
         else:
             new_next_move_values[j] = TT_MOVE_SCORE_VALUE
 
@@ -348,122 +625,394 @@ def create_child_structs(struct_array):
 
 
 @njit
-def generate_moves_for_tt_move_nodes(struct_array, to_check_mask):
+def generate_moves_for_tt_move_nodes(node_arena, batch, to_check_mask):
     """
     Generates the legal moves for the array of board structs when a legal move for the node was found in
     the transposition table (TT), and then was expanded in the same iteration as this function is being run.
-    It generates all of the legal moves except for the move which was already found in the TT.
+    It generates all of the legal moves except for the move which was already found in the TT, which is then put
+    after them (with no score, since it's already been expanded) so the struct still holds all of it's moves.
     It then sets each struct's children_left to the actual number of children left,
     as opposed to the indicator value NEXT_MOVE_IS_FROM_TT_VAL which it previously was.
     """
-    for j in range(len(struct_array)):
+    for j in nb.prange(len(batch)):
         if to_check_mask[j]:
-            struct_array[j]['children_left'] = 0
-            set_up_move_array_except_move(struct_array[j], struct_array[j]['unexplored_moves'][0].copy())
-            struct_array[j]['children_left'] += 1
+            struct = node_arena.structs[batch[j]]
+            tt_move = struct['unexplored_moves'][0].copy()
+            struct['children_left'] = 0
+            set_up_move_array_except_move(struct, tt_move)
+            struct['unexplored_moves'][struct['children_left']] = tt_move
+            struct['children_left'] += 1
+
+
+parallel_generate_moves_for_tt_move_nodes = njit(parallel=True)(generate_moves_for_tt_move_nodes.py_func)
 
 
 @njit
-def create_holder_for_structs(struct_array, parent_holder, to_create_mask, starting_holder=None):
-    found = 0
-    for j in range(len(struct_array)):
-        if to_create_mask[j]:
-            starting_holder = GameNodeHolder(GameNode(struct_array[j:j + 1], parent_holder.held_node), starting_holder)
-            found += 1
-        parent_holder = parent_holder.next_holder
+def add_children_to_arena(node_arena, child_structs, parent_indices, to_add_mask):
+    """
+    Adds the children in the given mask to the arena (under their parent), except for those who's parent has died.
 
-    return starting_holder, found
+    :return: A tuple of the indices of the new nodes, and a mask of the children which were added
+    """
+    was_added_mask = np.zeros(len(child_structs), dtype=np.bool_)
+    new_nodes = np.empty(len(child_structs), dtype=np.int32)
+    num_added = 0
+    for j in range(len(child_structs)):
+        if to_add_mask[j] and not node_arena.dead[parent_indices[j]]:
+            new_nodes[num_added] = node_arena.add_node(child_structs[j], parent_indices[j])
+            was_added_mask[j] = True
+            num_added += 1
+
+    return new_nodes[:num_added], was_added_mask
 
 
 @njit
-def create_new_holders_and_filter_old(root, node_linked_list, have_children_left_mask, child_struct, create_holder_mask):
+def get_group_starts(sorted_values):
     """
-    Creates new GameNodes and GameNodeHolders for the given new children, and filters the parents which don't need
-    to be given to the open node holder for re-insertion.  Their node holder are connected, and appended to the given root.
+    Gets the index where each run of equal values starts in the given sorted array, followed by the array's length.
     """
-    new_child_nodes, num_new_children = create_holder_for_structs(child_struct, node_linked_list, create_holder_mask)
-
-    num_not_filtered = filter_holders_then_append(root, node_linked_list, have_children_left_mask, new_child_nodes)
+    group_starts = np.empty(len(sorted_values) + 1, dtype=np.int64)
+    num_groups = 0
+    for j in range(len(sorted_values)):
+        if j == 0 or sorted_values[j] != sorted_values[j - 1]:
+            group_starts[num_groups] = j
+            num_groups += 1
+    group_starts[num_groups] = len(sorted_values)
+    return group_starts[:num_groups + 1]
 
-    return num_new_children, num_new_children + num_not_filtered
 
 @njit
-def get_struct_array_from_node_holder(node_holder, length):
-    to_return = np.empty(length, dtype=numpy_node_info_dtype)
-    for j in range(length):
-        to_return[j] = node_holder.struct
-        node_holder = node_holder.next_holder
-    return to_return
+def update_node_from_values(struct, is_dead, entries, values, moves, is_new_termination, to_restore):
+    """
+    Gives a node all the values it's receiving in the current level of backpropagation (from the given entries) in one
+    update.  Marking the node's subtree dead (if it terminates) and restoring it's reduced moves are left to the
+    caller (see update_level_nodes).
+
+    A value from the node's null move child isn't one of the node's values, and isn't counted as one of it's children.
+    It's only used to cut the node off (terminating it with that value) when it's at least the node's separator.
+
+    A value from a child searched to a reduced depth (see set_up_late_moves) which is at least the node's separator
+    isn't used either, instead the entry is marked in to_restore, so the child's move can be set up to be searched
+    again to the full depth (see restore_reduced_move).  If the node is dead or already terminated the value is
+    ignored, since it's not a full depth result and the node won't be expanded again.
+
+    :param struct: The node's board struct
+    :param is_dead: If the node is dead
+    :param to_restore: A boolean array (with an element for every entry) which the entries of the reduced moves to
+     restore are marked in
+    :return: A tuple of the entry who's move should be given to the TT (or -1 if the node wasn't changed in a way that
+     needs to be propagated), a boolean value indicating if the node just terminated, and a boolean value indicating
+     if the node has reduced moves to restore
+    """
+    best_entry = -1
+    null_move_cut_entry = -1
+    num_new_terminations = 0
+    has_moves_to_restore = False
+    for entry in entries:
+        if moves[entry, 0] == NULL_MOVE_SQUARE:
+            if values[entry] >= struct['separator']:
+                null_move_cut_entry = entry
+            continue
+
+        if moves[entry, 2] >= REDUCED_MOVE_FLAG and values[entry] >= struct['separator']:
+            # A dead or terminated node won't be expanded again, so it's reduced move isn't restored (and it's value is
+            # still not used)
+            if not struct['terminated'] and not is_dead:
+                to_restore[entry] = True
+                has_moves_to_restore = True
+            continue
+
+        if is_new_termination[entry]:
+            num_new_terminations += 1
+        if best_entry == -1 or values[entry] > values[best_entry]:
+            best_entry = entry
+
+    if struct['terminated']:
+        if best_entry == -1 or values[best_entry] <= struct['best_value']:
+            return -1, False, False
+
+        struct['best_value'] = values[best_entry]
+        return best_entry, False, False
+
+    struct['children_left'] -= num_new_terminations
+
+    if best_entry != -1:
+        struct['best_value'] = np.maximum(values[best_entry], struct['best_value'])
+
+    if struct['best_value'] < struct['separator'] and null_move_cut_entry != -1:
+        struct['best_value'] = values[null_move_cut_entry]
+        best_entry = null_move_cut_entry
+
+    if struct['best_value'] < struct['separator'] and struct['children_left'] != 0:
+        return -1, False, has_moves_to_restore
+
+    if best_entry == -1:
+        return -1, False, has_moves_to_restore
+
+    struct['terminated'] = True
+
+    return best_entry, True, False
+
+
+def update_level_nodes(node_arena, nodes, order, group_starts, values, moves, is_new_termination):
+    """
+    Updates each group of a level of backpropagation (all the entries given to one node) from it's values.
+
+    NOTES:
+    1) This is compiled both serially and with parallel=True.  The groups are updated in a loop which only uses the
+    arena's arrays, each group writing to only it's own node's struct.  Marking the subtrees of the nodes which
+    terminated dead and restoring reduced moves are collected there and done afterwards, in order, by one thread.
+    The results are identical either way
+
+    :return: A tuple of the best entry for each group (or -1 if the node wasn't changed), a boolean array
+     indicating which of the groups' nodes just terminated, and a boolean array indicating which of them must be put
+     back into the open node list
+    """
+    structs = node_arena.structs
+    dead = node_arena.dead
+
+    num_groups = len(group_starts) - 1
+    best_entries = np.empty(num_groups, dtype=np.int64)
+    just_terminated = np.empty(num_groups, dtype=np.bool_)
+    has_moves_to_restore = np.empty(num_groups, dtype=np.bool_)
+    to_restore = np.zeros(len(values), dtype=np.bool_)
+    for group in nb.prange(num_groups):
+        node = nodes[order[group_starts[group]]]
+        best_entry, terminated, needs_restore = update_node_from_values(
+            structs[node],
+            dead[node],
+            order[group_starts[group]:group_starts[group + 1]],
+            values,
+            moves,
+            is_new_termination,
+            to_restore)
+
+        best_entries[group] = best_entry
+        just_terminated[group] = terminated
+        has_moves_to_restore[group] = needs_restore
+
+    reopened = np.zeros(num_groups, dtype=np.bool_)
+    for group in range(num_groups):
+        node = nodes[order[group_starts[group]]]
+        if just_terminated[group]:
+            mark_subtree_dead(node_arena, node)
+        elif has_moves_to_restore[group]:
+            for entry in order[group_starts[group]:group_starts[group + 1]]:
+                if to_restore[entry] and restore_reduced_move(structs[node], moves[entry]):
+                    reopened[group] = True
+
+    return best_entries, just_terminated, reopened
+
+
+serial_update_level_nodes = njit(update_level_nodes)
+parallel_update_level_nodes = njit(parallel=True)(update_level_nodes)
 
 
 @njit
-def update_node_from_value(node, value, following_move, hash_table, new_termination=True):
-    if not node is None:
-        if node.struct['terminated']:
-            if value > node.struct['best_value']:
-                node.struct['best_value'] = value
+def backpropagate_level(node_arena, nodes, values, moves, is_new_termination, hash_table, parallel=False):
+    """
+    Does one level of backpropagation.  All the values being given to the same node are combined and applied in a
+    single update, the TT is then updated for every node which changed, and the values for the next level up
+    (the parents of those nodes) are returned.
+
+    :param nodes: The nodes being given values (which must all be the same distance from their root)
+    :param values: The values being given, from the perspective of the nodes receiving them
+    :param moves: The move from each receiving node to the child which the value came from
+    :param is_new_termination: An array of booleans indicating if the child the value came from just terminated,
+     as opposed to having already been terminated and having it's value improved
+    :param parallel: If the level's nodes should be updated in parallel (see update_level_nodes)
+    :return: A tuple of the nodes, values, moves, and new termination array for the next level, and the array of
+     nodes which must be put back into the open node list
+    """
+    order = np.argsort(nodes, kind="mergesort")
+    group_starts = get_group_starts(nodes[order])
+    num_groups = len(group_starts) - 1
 
-                tt.add_board_and_move_to_tt(node.struct, following_move, hash_table)
-                update_node_from_value(node.parent, - value, node.struct['prev_move'], hash_table, False)
-        else:
-            if new_termination:
-                node.struct['children_left'] -= 1
 
-            node.struct['best_value'] = np.maximum(value, node.struct['best_value'])
+    if parallel:
+        best_entries, just_terminated, reopened = parallel_update_level_nodes(
+            node_arena, nodes, order, group_starts, values, moves, is_new_termination)
+    else:
+        best_entries, just_terminated, reopened = serial_update_level_nodes(
+            node_arena, nodes, order, group_starts, values, moves, is_new_termination)
+
+    reopened_nodes = np.empty(np.sum(reopened), dtype=np.int32)
+    num_reopened = 0
+    for group in range(num_groups):
+        if reopened[group]:
+            reopened_nodes[num_reopened] = nodes[order[group_starts[group]]]
+            num_reopened += 1
+
+    # The changed nodes are gathered in the order of their groups, so the TT is written to in the same order
+    # regardless of how the nodes were updated
+    changed_nodes = np.empty(num_groups, dtype=np.int32)
+    changed_entries = np.empty(num_groups, dtype=np.int64)
+    changed_just_terminated = np.empty(num_groups, dtype=np.bool_)
+    num_changed = 0
+    for group in range(num_groups):
+        if best_entries[group] != -1:
+            changed_nodes[num_changed] = nodes[order[group_starts[group]]]
+            changed_entries[num_changed] = best_entries[group]
+            changed_just_terminated[num_changed] = just_terminated[group]
+            num_changed += 1
+
+    # A node cut off by it's null move child has no best move to store (so the move already in the TT for it is
+    # kept), and reduced moves are stored without their flag
+    tt_moves = moves[changed_entries[:num_changed]]
+    for j in range(num_changed):
+        if tt_moves[j, 0] == NULL_MOVE_SQUARE:
+            tt_moves[j] = NO_TT_MOVE_VALUE
+        elif tt_moves[j, 2] >= REDUCED_MOVE_FLAG:
+            tt_moves[j, 2] -= REDUCED_MOVE_FLAG
+
+    tt.add_boards_and_moves_to_tt(
+        node_arena.structs,
+        changed_nodes[:num_changed],
+        tt_moves,
+        hash_table)
+
+    next_nodes = np.empty(num_changed, dtype=np.int32)
+    next_values = np.empty(num_changed, dtype=np.float32)
+    next_moves = np.empty((num_changed, 3), dtype=np.uint8)
+    next_is_new_termination = np.empty(num_changed, dtype=np.bool_)
+    num_next = 0
+    for j in range(num_changed):
+        parent = node_arena.parents[changed_nodes[j]]
+        if parent != NO_NODE_INDEX:
+            struct = node_arena.structs[changed_nodes[j]]
+            next_nodes[num_next] = parent
+            next_values[num_next] = - struct['best_value']
+            next_moves[num_next] = struct['prev_move']
+            next_is_new_termination[num_next] = changed_just_terminated[j]
+            num_next += 1
+
+    return (next_nodes[:num_next], next_values[:num_next], next_moves[:num_next], next_is_new_termination[:num_next],
+            reopened_nodes)
+
+
+@njit
+def get_distances_from_root(node_arena, nodes):
+    """
+    :return: The number of moves between each of the given nodes and the root of it's tree
+    """
+    distances = np.zeros(len(nodes), dtype=np.int32)
+    for j in range(len(nodes)):
+        cur_node = node_arena.parents[nodes[j]]
+        while cur_node != NO_NODE_INDEX:
+            distances[j] += 1
+            cur_node = node_arena.parents[cur_node]
+    return distances
+
 
-            if node.struct['best_value'] >= node.struct['separator'] or node.struct['children_left'] == 0:
-                node.struct['terminated'] = True
+@njit
+def backpropagate_values(node_arena, nodes, values, moves, hash_table, parallel=False):
+    """
+    Gives the values of newly terminated children to their parents, then continues up the tree one level at a time,
+    starting with the nodes furthest from the root.  Since every value a node receives in an iteration is from a node
+    below it, each node is only updated once, after all of it's values are known.
 
-                tt.add_board_and_move_to_tt(node.struct, following_move, hash_table)
+    :param nodes: The parents of the newly terminated children
+    :param values: The values of the children, from the perspective of the parents
+    :param moves: The move from each parent to it's newly terminated child
+    :param parallel: If the nodes of each level should be updated in parallel
+    :return: The array of nodes which must be put back into the open node list, since a child they searched to a
+     reduced depth is being searched again (see restore_reduced_move)
 
-                update_node_from_value(node.parent, - node.struct['best_value'], node.struct['prev_move'], hash_table)
+    NOTES:
+    1) The levels are the nodes' distances from the root rather than their depths, since null move children and
+    children searched to a reduced depth are more than one depth below their parents (so a level of depths can hold
+    a node and one of it's ancestors)
+    """
+    reopened_nodes = np.empty(0, dtype=np.int32)
+
+    if len(nodes) == 0:
+        return reopened_nodes
+
+    distances = get_distances_from_root(node_arena, nodes)
+
+    # The unprocessed entries ordered from the node furthest from the root to the closest
+    order = np.argsort(-distances, kind="mergesort")
+    nodes = nodes[order]
+    values = values[order]
+    moves = moves[order]
+    distances = distances[order]
+
+    level_nodes = np.empty(0, dtype=np.int32)
+    level_values = np.empty(0, dtype=np.float32)
+    level_moves = np.empty((0, 3), dtype=np.uint8)
+    level_is_new_termination = np.empty(0, dtype=np.bool_)
+
+    cur_distance = distances[0]
+    start = 0
+    while start < len(nodes) or len(level_nodes) != 0:
+        # The nodes carried from the previous level are the parents of the nodes it updated, so they're one move
+        # closer to the root, and at least as far from it as any unprocessed entry
+        if len(level_nodes) == 0:
+            cur_distance = distances[start]
+
+        end = start
+        while end < len(nodes) and distances[end] == cur_distance:
+            end += 1
+
+        if end != start:
+            level_nodes = np.concatenate((level_nodes, nodes[start:end]))
+            level_values = np.concatenate((level_values, values[start:end]))
+            level_moves = np.concatenate((level_moves, moves[start:end]))
+            level_is_new_termination = np.concatenate(
+                (level_is_new_termination, np.ones(end - start, dtype=np.bool_)))
+            start = end
+
+        level_nodes, level_values, level_moves, level_is_new_termination, level_reopened = backpropagate_level(
+            node_arena,
+            level_nodes,
+            level_values,
+            level_moves,
+            level_is_new_termination,
+            hash_table,
+            parallel)
+
+        if len(level_reopened) != 0:
+            reopened_nodes = np.concatenate((reopened_nodes, level_reopened))
+
+        cur_distance -= 1
+
+    return reopened_nodes
 
 
 @njit
-def update_tree_from_terminating_nodes(parent_node_holder, struct_array, hash_table, was_evaluated_mask, eval_results):
+def update_tree_from_terminating_nodes(node_arena, parent_indices, struct_array, hash_table, was_evaluated_mask,
+                                       eval_results, parallel=False):
     """
     Updates the search tree from the nodes in the current batch which are terminating, this includes all nodes which
     have been marked terminated, or are depth zero.  It also updates the transposition table as needed.
+
+    :return: The array of nodes which must be put back into the open node list (see backpropagate_values)
     """
     should_update_mask = np.logical_or(struct_array['depth'] == 0, struct_array['terminated'])
 
     if eval_results[0] != MAX_FLOAT32_VAL:  #This would be a None parameter but Numba won't let it compile so this is used instead
         tt.add_evaluated_boards_to_tt(struct_array, was_evaluated_mask, eval_results, hash_table)
 
-        eval_results_for_parents = - eval_results
-
+    num_to_update = np.sum(should_update_mask)
+    nodes = np.empty(num_to_update, dtype=np.int32)
+    values = np.empty(num_to_update, dtype=np.float32)
+    moves = np.empty((num_to_update, 3), dtype=np.uint8)
 
     index_in_evaluations = 0
+    num_found = 0
     for j in range(len(struct_array)):
-        if was_evaluated_mask[j]:
-            update_node_from_value(
-                parent_node_holder.held_node,
-                eval_results_for_parents[index_in_evaluations],
-                struct_array[j]['prev_move'],
-                hash_table)
-            index_in_evaluations += 1
-
-        elif should_update_mask[j]:
-            update_node_from_value(
-                parent_node_holder.held_node,
-                - struct_array[j]['best_value'],
-                struct_array[j]['prev_move'],
-                hash_table)
-
-        parent_node_holder = parent_node_holder.next_holder
-
-
-@njit
-def set_nodes_to_altered_structs(node_holder, struct_array, to_do_mask):
-    for j in range(len(struct_array)):
-        if to_do_mask[j]:
-            node_holder.struct['unexplored_moves'][:] = struct_array[j]['unexplored_moves'][:]
-            node_holder.struct['unexplored_move_scores'][:] = struct_array[j]['unexplored_move_scores'][:]
+        if should_update_mask[j]:
+            if was_evaluated_mask[j]:
+                values[num_found] = - eval_results[index_in_evaluations]
+                index_in_evaluations += 1
+            else:
+                values[num_found] = - struct_array[j]['best_value']
 
-            node_holder.struct['children_left'] = struct_array[j]['children_left']
-            node_holder.struct['next_move_index'] = struct_array[j]['next_move_index']
+            nodes[num_found] = parent_indices[j]
+            moves[num_found] = struct_array[j]['prev_move']
+            num_found += 1
 
-        node_holder = node_holder.next_holder
+    return backpropagate_values(node_arena, nodes, values, moves, hash_table, parallel)
 
 
 @njit
@@ -483,24 +1032,31 @@ def set_child_move_scores(child_structs, scored_child_mask, scores, score_size_a
 
 
 @njit
-def get_move_from_and_filter_squares_and_sizes(child_structs, not_child_structs, child_mask, not_child_mask, num_scored, num_children):
+def get_move_from_and_filter_squares_and_sizes(child_structs, not_child_structs, not_child_indices, child_mask,
+                                               not_child_mask, num_scored, num_children):
     size_array = np.empty(num_scored, np.uint8)
     total_num_children = len(child_structs)
 
     size_array[:num_children] = child_structs['children_left'][child_mask]
-    size_array[num_children:] = not_child_structs['children_left'][not_child_mask] - 1  #subtracting 1 here to account for the TT move which doesn't need to be scored
+
+    not_child_index = num_children
+    for j in range(len(not_child_indices)):
+        if not_child_mask[j]:
+            #subtracting 1 here to account for the TT move which doesn't need to be scored
+            size_array[not_child_index] = not_child_structs[not_child_indices[j]]['children_left'] - 1
+            not_child_index += 1
 
     move_indices = np.empty((np.sum(size_array), 2), dtype=np.uint8)
 
     cur_start_index = 0
     scored_so_far = 0
-    for j in range(len(child_structs) + len(not_child_structs)):
+    for j in range(len(child_structs) + len(not_child_indices)):
         if j < len(child_structs):
             was_scored = child_mask[j]
             struct = child_structs[j]
         else:
             was_scored = not_child_mask[j - total_num_children]
-            struct = not_child_structs[j - total_num_children]
+            struct = not_child_structs[not_child_indices[j - total_num_children]]
 
         if was_scored:
             cur_size = size_array[scored_so_far]
@@ -523,11 +1079,12 @@ def get_move_from_and_filter_squares_and_sizes(child_structs, not_child_structs,
 
 
 @njit
-def prepare_to_finish_move_scoring(child_structs, adult_structs, scored_child_mask, scored_adult_mask,
+def prepare_to_finish_move_scoring(child_structs, adult_structs, adult_indices, scored_child_mask, scored_adult_mask,
                                    num_scored_children, num_scored_adults):
     size_array, from_to_squares = get_move_from_and_filter_squares_and_sizes(
         child_structs,
         adult_structs,
+        adult_indices,
         scored_child_mask,
         scored_adult_mask,
         num_scored_children + num_scored_adults,
@@ -539,7 +1096,7 @@ def prepare_to_finish_move_scoring(child_structs, adult_structs, scored_child_ma
 
 
 @njit
-def complete_move_evaluation(scores, child_structs, adult_nodes, scored_child_mask, scored_adult_mask,
+def complete_move_evaluation(scores, child_structs, node_arena, adult_indices, scored_child_mask, scored_adult_mask,
                              num_children, size_array, cum_sum_sizes):
     adult_next_move_scores = np.empty(len(size_array) - num_children, dtype=np.float32)
 
@@ -556,52 +1113,116 @@ def complete_move_evaluation(scores, child_structs, adult_nodes, scored_child_ma
             cur_index = cur_adult_index + num_children
             cur_size = size_array[cur_index]
             cur_cum_sum_size = cum_sum_sizes[cur_index]
-            cur_node = adult_nodes.held_node
+            cur_struct = node_arena.structs[adult_indices[j]]
 
-            cur_node.struct['unexplored_move_scores'][:cur_size] = scores[
-                                                                            cur_cum_sum_size - cur_size: cur_cum_sum_size]
-            adult_next_move_scores[cur_adult_index] = set_up_next_best_move(cur_node.struct)
+            cur_struct['unexplored_move_scores'][:cur_size] = scores[cur_cum_sum_size - cur_size: cur_cum_sum_size]
+            adult_next_move_scores[cur_adult_index] = set_up_next_best_move(cur_struct)
 
             cur_adult_index += 1
 
-        adult_nodes = adult_nodes.next_holder
-
     return child_next_move_scores, adult_next_move_scores
 
 
-def do_iteration(node_linked_list, hash_table, previous_board_map, board_eval_fn, move_eval_fn):
-    length_of_batch = len_node_holder(node_linked_list)  #this can and should be given to this function
-    struct_batch = get_struct_array_from_node_holder(node_linked_list, length_of_batch)
+def prepare_iteration(batch, node_arena, hash_table, previous_board_map, parallel_move_gen=False,
+                      null_move_reduction=None, late_move_reductions=None):
+    """
+    Does the work of an iteration which must be done before the new children's boards can be evaluated, creating the
+    children and checking which of the depth zero children terminate without evaluation.
+
+    :param null_move_reduction: The extra depth reduction of null move children, or None if null move pruning
+     isn't used
+    :param late_move_reductions: The LateMoveReductions used, or None if late moves aren't reduced
+
+    :return: A tuple of the array of child structs, the score of each of the batch's nodes' next move, and a mask of
+     the batch's nodes who's child was made from a move found in the TT
+    """
+    child_struct, batch_next_move_scores = create_child_structs(
+        node_arena,
+        batch,
+        0 if null_move_reduction is None else null_move_reduction,
+        0 if late_move_reductions is None else late_move_reductions.reduction)
+
+    child_was_from_tt_move_mask = node_arena.structs['children_left'][batch] == NEXT_MOVE_IS_FROM_TT_VAL
+
+    if parallel_move_gen:
+        parallel_depth_zero_should_terminate_array(child_struct, hash_table, previous_board_map, node_arena, batch)
+    else:
+        depth_zero_should_terminate_array(child_struct, hash_table, previous_board_map, node_arena, batch)
+
+    return child_struct, batch_next_move_scores, child_was_from_tt_move_mask
+
+
+def do_iteration(batch, node_arena, hash_table, previous_board_map, board_eval_fn, move_eval_fn,
+                 parallel_backprop=False, parallel_move_gen=False, prepared=None, while_waiting_fn=None,
+                 inference_scheduler=None, null_move_reduction=None, late_move_reductions=None, batch_dispatcher=None):
+    """
+    Expands the next child of each node in the given batch (an array of node indices), evaluates or scores the moves
+    of the new children, and updates the tree from the children which terminate.
+
+    :param parallel_backprop: If the nodes of each level of backpropagation should be updated in parallel
+    :param parallel_move_gen: If the termination checks and move generation for the batch's nodes (and their new
+     children) should be done in parallel
+    :param prepared: The values returned by prepare_iteration for the batch, or None if it hasn't been prepared
+    :param while_waiting_fn: A function taking no arguments to be run once all of the iteration's evaluations have
+     been started, while it's waiting for them to finish, or None.  It must not change the values, termination, or
+     structure of the tree (e.g. it can prepare another batch with prepare_iteration)
+    :param inference_scheduler: The InferenceScheduler which the new depth zero leaves and the new children needing
+     their moves scored are given to (instead of being evaluated and scored in this iteration), or None
+    :param null_move_reduction: The extra depth reduction of null move children, or None if null move pruning
+     isn't used.  The new children which should try it (see should_try_null_move) expand their null move first
+    :param late_move_reductions: The LateMoveReductions used to reduce the depth of the late moves of the nodes who's
+     moves are scored, or None if they aren't reduced.  The nodes which must be put back into the open node list
+     (since a reduced child is being searched again) are returned with the others
+    :param batch_dispatcher: The BatchDispatcher which times the iteration's inferences, or None
+    :return: A tuple of the array of node indices to be inserted into the open node list (the batch's nodes which have
+     more children to expand, followed by the new children which need expanding), and the array of their scores
+    """
+    # The batch's nodes are read and modified where they're stored in the arena, through their indices
+    node_structs = node_arena.structs
 
-    child_struct, struct_batch_next_move_scores = create_child_structs(struct_batch)
+    if prepared is None:
+        prepared = prepare_iteration(
+            batch, node_arena, hash_table, previous_board_map, parallel_move_gen, null_move_reduction,
+            late_move_reductions)
 
-    child_was_from_tt_move_mask = struct_batch['children_left'] == NEXT_MOVE_IS_FROM_TT_VAL
+    child_struct, batch_next_move_scores, child_was_from_tt_move_mask = prepared
 
     depth_zero_children_mask = child_struct['depth'] == 0
     depth_not_zero_mask = np.logical_not(depth_zero_children_mask)
 
-    depth_zero_should_terminate_array(child_struct, hash_table, previous_board_map, node_linked_list)
-
     depth_zero_not_scored_mask = np.logical_and(depth_zero_children_mask, np.logical_not(child_struct['terminated']))
 
+    if not inference_scheduler is None:
+        # The children given to the scheduler are left out of this iteration's tree update
+        inference_scheduler.add_leaves(child_struct[depth_zero_not_scored_mask], batch[depth_zero_not_scored_mask])
+        not_deferred_mask = np.logical_not(depth_zero_not_scored_mask)
+        depth_zero_not_scored_mask = np.zeros_like(depth_zero_not_scored_mask)
+
     if np.any(depth_zero_not_scored_mask):
-        evaluation_thread, evaluation_scores = start_board_evaluations(
+        evaluation_future = start_board_evaluations(
             child_struct,
             depth_zero_not_scored_mask,
-            board_eval_fn)
+            board_eval_fn,
+            batch_dispatcher)
     else:
-        evaluation_thread = None
+        evaluation_future = None
         evaluation_scores = None
 
 
-    generate_moves_for_tt_move_nodes(struct_batch, child_was_from_tt_move_mask)
+    if parallel_move_gen:
+        parallel_generate_moves_for_tt_move_nodes(node_arena, batch, child_was_from_tt_move_mask)
+    else:
+        generate_moves_for_tt_move_nodes(node_arena, batch, child_was_from_tt_move_mask)
 
-    not_one_child_left_mask = struct_batch['children_left'] != 1
+    not_one_child_left_mask = node_structs['children_left'][batch] != 1
 
     not_only_move_was_tt_move_mask = np.logical_or(not_one_child_left_mask, np.logical_not(child_was_from_tt_move_mask))
     tt_move_nodes_with_more_kids_mask = np.logical_and(not_one_child_left_mask, child_was_from_tt_move_mask)
 
-    child_termination_check_and_move_gen(child_struct, hash_table, node_linked_list, previous_board_map)
+    if parallel_move_gen:
+        parallel_child_termination_check_and_move_gen(child_struct, hash_table, node_arena, batch, previous_board_map)
+    else:
+        child_termination_check_and_move_gen(child_struct, hash_table, node_arena, batch, previous_board_map)
 
     non_zerod_child_not_term_mask = np.logical_and(
         depth_not_zero_mask,
@@ -611,56 +1232,70 @@ def do_iteration(node_linked_list, hash_table, previous_board_map, board_eval_fn
         non_zerod_child_not_term_mask,
         child_struct['children_left'] != NEXT_MOVE_IS_FROM_TT_VAL)
 
+    if not inference_scheduler is None:
+        deferred_move_scoring_mask = non_zerod_kids_for_move_scoring_mask
+        non_zerod_kids_for_move_scoring_mask = np.zeros_like(deferred_move_scoring_mask)
+
     # Now that staging has been implemented for move scoring, this must be started as soon as it knows exactly which
     # nodes have moves to be scored.  This likely involves stopping the move generation when the first move for each
     # board is discovered, and resuming after the boards which have moves to score have been given to TensorFlow
     # (or after a thread with that task has been started)
     if np.any(non_zerod_kids_for_move_scoring_mask) or np.any(tt_move_nodes_with_more_kids_mask):
-        move_thread, move_score_getter, num_children_move_scoring, num_adult_move_scoring = start_move_scoring(
+        move_future, num_children_move_scoring, num_adult_move_scoring = start_move_scoring(
             child_struct,
-            struct_batch,
+            node_structs,
+            batch,
             non_zerod_kids_for_move_scoring_mask,
             tt_move_nodes_with_more_kids_mask,
-            move_eval_fn)
+            move_eval_fn,
+            batch_dispatcher)
     else:
-        move_thread = None
+        move_future = None
         child_next_move_scores = None
         not_child_next_move_scores = None
 
     # A mask of the given batch which have more unexplored children left
     have_children_left_mask = np.logical_and(
-        struct_batch["next_move_index"] != NO_MORE_MOVES_VALUE,
+        node_structs["next_move_index"][batch] != NO_MORE_MOVES_VALUE,
         not_only_move_was_tt_move_mask)
 
+    if not while_waiting_fn is None:
+        while_waiting_fn()
 
-    set_nodes_to_altered_structs(
-        node_linked_list,
-        struct_batch,
-        have_children_left_mask)
+    if not evaluation_future is None:
+        evaluation_scores = evaluation_future.result()
 
-    if not evaluation_thread is None:
-        evaluation_thread.join()
-
-    if not move_thread is None:
+    if not move_future is None:
         move_completion_info = prepare_to_finish_move_scoring(
             child_struct,
-            struct_batch,
+            node_structs,
+            batch,
             non_zerod_kids_for_move_scoring_mask,
             tt_move_nodes_with_more_kids_mask,
             num_children_move_scoring,
             num_adult_move_scoring)
 
-    update_tree_from_terminating_nodes(
-        node_linked_list,
-        child_struct,
-        hash_table,
-        depth_zero_not_scored_mask,
-        evaluation_scores if not evaluation_scores is None else INT_ARRAY_NONE)
-
-    if not move_thread is None:
-        move_thread.join()
-
-        move_scores = move_score_getter[0](
+    if inference_scheduler is None:
+        reopened_nodes = update_tree_from_terminating_nodes(
+            node_arena,
+            batch,
+            child_struct,
+            hash_table,
+            depth_zero_not_scored_mask,
+            evaluation_scores if not evaluation_scores is None else INT_ARRAY_NONE,
+            parallel_backprop)
+    else:
+        reopened_nodes = update_tree_from_terminating_nodes(
+            node_arena,
+            batch[not_deferred_mask],
+            child_struct[not_deferred_mask],
+            hash_table,
+            depth_zero_not_scored_mask[not_deferred_mask],
+            INT_ARRAY_NONE,
+            parallel_backprop)
+
+    if not move_future is None:
+        move_scores = move_future.result()(
             [move_completion_info[1][:, 0],
              move_completion_info[1][:, 1],
              move_completion_info[0]])
@@ -668,183 +1303,1226 @@ def do_iteration(node_linked_list, hash_table, previous_board_map, board_eval_fn
         child_next_move_scores, not_child_next_move_scores = complete_move_evaluation(
             scores=move_scores,
             child_structs=child_struct,
-            adult_nodes=node_linked_list,
+            node_arena=node_arena,
+            adult_indices=batch,
             scored_child_mask=non_zerod_kids_for_move_scoring_mask,
             scored_adult_mask=tt_move_nodes_with_more_kids_mask,
             num_children=num_children_move_scoring,
             size_array=move_completion_info[0],
             cum_sum_sizes=move_completion_info[2])
 
-    dummy_root = create_dummy_node_holder()
-    num_new_children, num_returning = create_new_holders_and_filter_old(dummy_root, node_linked_list, have_children_left_mask, child_struct, non_zerod_child_not_term_mask)
-    to_return = dummy_root.next_holder
+        if not late_move_reductions is None:
+            set_up_late_move_reductions(
+                child_struct,
+                np.arange(len(child_struct)),
+                non_zerod_kids_for_move_scoring_mask,
+                child_next_move_scores,
+                late_move_reductions)
+            set_up_late_move_reductions(
+                node_structs,
+                batch,
+                tt_move_nodes_with_more_kids_mask,
+                not_child_next_move_scores,
+                late_move_reductions)
+
+        if not null_move_reduction is None:
+            set_up_null_moves(
+                child_struct, non_zerod_kids_for_move_scoring_mask, child_next_move_scores, null_move_reduction)
+
+    # Nodes which died during the tree update don't need to be returned to the open node list
+    have_children_left_mask = np.logical_and(have_children_left_mask, np.logical_not(node_arena.dead[batch]))
+
+    new_child_nodes, child_was_added_mask = add_children_to_arena(
+        node_arena, child_struct, batch, non_zerod_child_not_term_mask)
 
     #Set up the array of scores used to place the returned nodes into their proper bins
-    scores_to_return = np.full(num_returning, TT_MOVE_SCORE_VALUE, dtype=np.float32)
-    num_not_child_scores = num_returning - num_new_children
-    if num_not_child_scores != 0:
-        scores_to_return[:num_not_child_scores] = struct_batch_next_move_scores[have_children_left_mask]
-        if not not_child_next_move_scores is None and len(not_child_next_move_scores) != 0:
-            scores_to_return[:num_not_child_scores][scores_to_return[:num_not_child_scores] == TT_MOVE_SCORE_VALUE] = not_child_next_move_scores
+    if not not_child_next_move_scores is None and len(not_child_next_move_scores) != 0:
+        batch_next_move_scores[tt_move_nodes_with_more_kids_mask] = not_child_next_move_scores
+
+    child_scores = np.full(len(child_struct), TT_MOVE_SCORE_VALUE, dtype=np.float32)
     if not child_next_move_scores is None and len(child_next_move_scores) != 0:
-            scores_to_return[num_not_child_scores:][child_struct[non_zerod_child_not_term_mask]['children_left'] != NEXT_MOVE_IS_FROM_TT_VAL] = child_next_move_scores
+        child_scores[non_zerod_kids_for_move_scoring_mask] = child_next_move_scores
 
+    new_child_scores = child_scores[child_was_added_mask]
 
-    return to_return, scores_to_return
+    if not inference_scheduler is None:
+        deferred_move_scoring_mask = deferred_move_scoring_mask[child_was_added_mask]
+        inference_scheduler.add_nodes_to_score(new_child_nodes[deferred_move_scoring_mask])
 
+        new_child_nodes = new_child_nodes[np.logical_not(deferred_move_scoring_mask)]
+        new_child_scores = new_child_scores[np.logical_not(deferred_move_scoring_mask)]
 
-def zero_window_negamax_search(root_game_node, open_node_holder, board_eval_fn, move_eval_fn, hash_table,
-                               previous_board_map):
-    next_batch = GameNodeHolder(root_game_node, None)
-    while next_batch:
-        to_insert, to_insert_scores = do_iteration(
-            next_batch, hash_table, previous_board_map, board_eval_fn, move_eval_fn)
+    reopened_nodes = reopened_nodes[np.logical_not(node_arena.dead[reopened_nodes])]
 
-        if root_game_node.struct['terminated']:
-            open_node_holder.clear_list()
-            break
+    to_return = np.concatenate((batch[have_children_left_mask], new_child_nodes, reopened_nodes))
+    scores_to_return = np.concatenate((
+        batch_next_move_scores[have_children_left_mask],
+        new_child_scores,
+        np.full(len(reopened_nodes), TT_MOVE_SCORE_VALUE, dtype=np.float32)))
 
-        if not to_insert and open_node_holder.is_empty():
-            break
+    return to_return, scores_to_return
 
-        next_batch = open_node_holder.insert_nodes_and_get_next_batch(to_insert, to_insert_scores)
 
-    return root_game_node.struct['best_value']
+def make_room_in_arena(node_arena, open_node_holder, num_nodes, inference_scheduler=None):
+    """
+    Makes sure the given arena has room for num_nodes more nodes, first by releasing it's dead nodes, and if that
+    isn't enough, by growing it.  This must only be done between iterations, when the open node list (and the
+    InferenceScheduler, if one is given) are the only things which can hold the index of a dead node.
+    """
+    if not inference_scheduler is None:
+        inference_scheduler.drop_dead_nodes(node_arena.dead)
 
+    open_node_holder.compact()
+    release_dead_nodes(node_arena)
 
-def set_up_root_node_for_struct(move_eval_fn, hash_table, previous_board_map, root_struct):
-    if not root_struct['turn']:
-        root_struct = convert_board_to_whites_perspective(root_struct)
+    if not node_arena.has_room_for(num_nodes):
+        grow_node_arena(node_arena, node_arena.num_in_use + num_nodes)
 
-    root_node = GameNode(root_struct, None)
+    open_node_holder.set_dead_node_mask(node_arena.dead)
 
-    temp_game_node_holder = GameNodeHolder(root_node, None)
 
-    struct_array = root_node.board_struct
+def run_scheduled_inference(inference_scheduler, node_arena, hash_table, board_eval_fn, move_eval_fn,
+                            parallel_backprop=False, force=False, null_move_reduction=None,
+                            late_move_reductions=None, batch_dispatcher=None):
+    """
+    Runs the ANNs on the work accumulated by the given InferenceScheduler, for each of it's queues which has reached
+    it's batch size (or for every non-empty queue if force is True).  The evaluated leaves are backpropagated
+    through the tree, and the nodes who's moves were scored are returned to be inserted into the open node list.
+
+    :param batch_dispatcher: The BatchDispatcher which times the inferences, or None
+    :return: A tuple of the array of indices of the nodes who's moves were scored (and are still alive) followed by
+     the nodes which must be put back into the open node list (see backpropagate_values), and the array of the
+     scores of their next moves
+    """
+    inference_scheduler.drop_dead_nodes(node_arena.dead)
 
-    child_termination_check_and_move_gen(
-        struct_array,
-        hash_table,
-        temp_game_node_holder,
-        previous_board_map)
+    empty_indices = np.empty(0, dtype=np.int32)
+    empty_mask = np.empty(0, dtype=np.bool_)
 
-    num_moves_to_score = struct_array[0]['children_left']
-    num_moves_to_score_as_array = np.array([num_moves_to_score])
+    if inference_scheduler.evals_ready(force):
+        leaf_structs, leaf_parents = inference_scheduler.take_leaves()
+        leaf_mask = np.ones(len(leaf_structs), dtype=np.bool_)
 
-    if struct_array[0]['terminated'] or num_moves_to_score == NEXT_MOVE_IS_FROM_TT_VAL:
-        return root_node
+        evaluation_future = start_board_evaluations(leaf_structs, leaf_mask, board_eval_fn, batch_dispatcher)
+    else:
+        evaluation_future = None
+
+    if inference_scheduler.move_scoring_ready(force):
+        scored_nodes = inference_scheduler.take_nodes_to_score()
+        scored_mask = np.ones(len(scored_nodes), dtype=np.bool_)
+
+        # The nodes are scored as copies, and then written back into the arena.  Since they have no children
+        # and aren't in the open node list, nothing else changes their structs in the meantime
+        scored_structs = node_arena.structs[scored_nodes]
+
+        move_future, num_move_scoring, _ = start_move_scoring(
+            scored_structs,
+            node_arena.structs,
+            empty_indices,
+            scored_mask,
+            empty_mask,
+            move_eval_fn,
+            batch_dispatcher)
 
-    move_thread, move_score_getter, _, _ = start_move_scoring(
-        struct_array,
-        struct_array,
-        np.zeros(1, dtype=np.bool_),
-        np.ones(1, dtype=np.bool_),
-        move_eval_fn)
+        move_completion_info = prepare_to_finish_move_scoring(
+            scored_structs,
+            node_arena.structs,
+            empty_indices,
+            scored_mask,
+            empty_mask,
+            num_move_scoring,
+            0)
+    else:
+        move_future = None
+
+    if not evaluation_future is None:
+        reopened_nodes = update_tree_from_terminating_nodes(
+            node_arena,
+            leaf_parents,
+            leaf_structs,
+            hash_table,
+            leaf_mask,
+            evaluation_future.result(),
+            parallel_backprop)
+
+        reopened_nodes = reopened_nodes[np.logical_not(node_arena.dead[reopened_nodes])]
+    else:
+        reopened_nodes = empty_indices
 
+    reopened_scores = np.full(len(reopened_nodes), TT_MOVE_SCORE_VALUE, dtype=np.float32)
 
-    move_thread.join()
+    if move_future is None:
+        return reopened_nodes, reopened_scores
 
-    relevant_moves = struct_array[0]['unexplored_moves'][:num_moves_to_score]
+    move_scores = move_future.result()(
+        [move_completion_info[1][:, 0],
+         move_completion_info[1][:, 1],
+         move_completion_info[0]])
 
-    if not struct_array[0]['turn']:
-        relevant_moves[:, :2] = SQUARES_180[relevant_moves[:, :2]]
+    next_move_scores = set_child_move_scores(
+        scored_structs,
+        scored_mask,
+        move_scores,
+        move_completion_info[0],
+        move_completion_info[2])
 
-    move_filters = MOVE_FILTER_LOOKUP[relevant_moves[:, 0], relevant_moves[:, 1], relevant_moves[:, 2]]
-    move_from_squares = relevant_moves[:, 0]
+    if not late_move_reductions is None:
+        set_up_late_move_reductions(
+            scored_structs, np.arange(len(scored_structs)), scored_mask, next_move_scores, late_move_reductions)
 
-    scores = move_score_getter[0]([move_from_squares, move_filters, num_moves_to_score_as_array])
+    if not null_move_reduction is None:
+        set_up_null_moves(scored_structs, scored_mask, next_move_scores, null_move_reduction)
 
-    complete_move_evaluation(
-        scores,
-        struct_array,
-        temp_game_node_holder,
-        np.zeros(1, dtype=np.bool_),
-        np.ones(1, dtype=np.bool_),
-        0,
-        num_moves_to_score_as_array,
-        num_moves_to_score_as_array)
+    node_arena.structs[scored_nodes] = scored_structs
 
-    return root_node
+    # Nodes can die from the backpropagation of the leaves evaluated above
+    alive_mask = np.logical_not(node_arena.dead[scored_nodes])
+    return (np.concatenate((scored_nodes[alive_mask], reopened_nodes)),
+            np.concatenate((next_move_scores[alive_mask], reopened_scores)))
 
 
-def set_up_root_node_from_fen(move_eval_fn, hash_table, previous_board_map, fen, depth=255, separator=0):
-    return set_up_root_node_for_struct(
-        move_eval_fn,
-        hash_table,
-        previous_board_map,
-        create_node_info_from_fen(fen, depth, separator))
+def get_next_batch(open_node_holder, to_insert, to_insert_scores, batch_dispatcher=None):
+    """
+    Inserts the given nodes into the open node list and gets the next batch from it, with the batch's size picked by
+    the given BatchDispatcher (if one is given).
+    """
+    if not batch_dispatcher is None:
+        open_node_holder.set_max_batch_size(
+            batch_dispatcher.next_batch_size(len(open_node_holder) + len(to_insert)))
+
+    return open_node_holder.insert_nodes_and_get_next_batch(to_insert, to_insert_scores)
+
+
+def pipelined_zero_window_negamax_search(root, node_arena, open_node_holder, board_eval_fn, move_eval_fn, hash_table,
+                                         previous_board_map, parallel_backprop=False, parallel_move_gen=False,
+                                         search_controller=None, batch_dispatcher=None, null_move_reduction=None):
+    """
+    A version of zero_window_negamax_search which overlaps the work done to prepare each batch with the evaluations of
+    the previous one.  While an iteration waits on it's evaluations, the next batch is speculatively taken from the
+    open node list and prepared (see prepare_iteration).  Once the iteration is finished, the nodes of the speculative
+    batch which died from it's backpropagation are dropped (along with their prepared children), and the rest are
+    expanded.
+
+    The nodes returned by each iteration are inserted into the open node list when the batch after next is taken
+    from it, so they're one iteration later to be picked than they would be without the pipelining.  The parameters
+    and return value are the same as zero_window_negamax_search's.
+    """
+    empty_indices = np.empty(0, dtype=np.int32)
+    empty_scores = np.empty(0, dtype=np.float32)
+
+    speculative = []
+
+    # The batches are copied since an open node list can return views into a buffer it reuses, and each batch is
+    # still in use when the next one is taken
+    def prepare_next_batch():
+        if not open_node_holder.is_empty() or len(pending_nodes) != 0:
+            next_batch = get_next_batch(open_node_holder, pending_nodes, pending_scores, batch_dispatcher).copy()
+            speculative.append((
+                next_batch,
+                prepare_iteration(
+                    next_batch, node_arena, hash_table, previous_board_map, parallel_move_gen, null_move_reduction)))
+
+    open_node_holder.set_dead_node_mask(node_arena.dead)
+
+    batch = np.array([root], dtype=np.int32)
+    prepared = None
+    pending_nodes, pending_scores = empty_indices, empty_scores
+    while True:
+        # Each node in the batch creates at most one new node
+        if not node_arena.has_room_for(len(batch)):
+            make_room_in_arena(node_arena, open_node_holder, len(batch))
+
+        to_insert, to_insert_scores = do_iteration(
+            batch,
+            node_arena,
+            hash_table,
+            previous_board_map,
+            board_eval_fn,
+            move_eval_fn,
+            parallel_backprop,
+            parallel_move_gen,
+            prepared=prepared,
+            while_waiting_fn=prepare_next_batch,
+            null_move_reduction=null_move_reduction,
+            batch_dispatcher=batch_dispatcher)
+
+        if node_arena.structs[root]['terminated']:
+            open_node_holder.clear_list()
+            break
+
+        if not search_controller is None:
+            search_controller.add_nodes(len(batch))
+            if search_controller.should_stop():
+                open_node_holder.clear_list()
+                return None
+
+        if len(speculative) != 0:
+            batch, prepared = speculative.pop()
+            pending_nodes, pending_scores = to_insert, to_insert_scores
+
+            still_alive_mask = np.logical_not(node_arena.dead[batch])
+            if not np.all(still_alive_mask):
+                batch = batch[still_alive_mask]
+                prepared = tuple(prepared_array[still_alive_mask] for prepared_array in prepared)
+
+            if len(batch) != 0:
+                continue
+        else:
+            pending_nodes, pending_scores = to_insert, to_insert_scores
+
+        if len(pending_nodes) == 0 and open_node_holder.is_empty():
+            break
+
+        batch = get_next_batch(open_node_holder, pending_nodes, pending_scores, batch_dispatcher).copy()
+        prepared = None
+        pending_nodes, pending_scores = empty_indices, empty_scores
+
+    return node_arena.structs[root]['best_value']
+
+
+def zero_window_negamax_search(root, node_arena, open_node_holder, board_eval_fn, move_eval_fn, hash_table,
+                               previous_board_map, parallel_backprop=False, parallel_move_gen=False, num_threads=None,
+                               search_controller=None, pipelined=False, batch_dispatcher=None,
+                               inference_scheduler=None, null_move_reduction=None, late_move_reductions=None,
+                               open_nodes=None):
+    """
+    :param num_threads: The number of threads to be used by the parallel functions of the search, or None to use
+     Numba's default
+    :param search_controller: The SearchController checked between batches to decide if the search should stop,
+     or None if it should run until it's finished
+    :param pipelined: If the preparation of each batch should be overlapped with the previous batch's evaluations
+     (see pipelined_zero_window_negamax_search)
+    :param batch_dispatcher: The BatchDispatcher used to pick the size of each batch (which times the search's
+     inferences), or None if the open node list's maximum batch size should be used
+    :param inference_scheduler: The InferenceScheduler used to accumulate the leaf evaluations and move scoring
+     across iterations, or None if they should be done in the iteration which creates them.  It can't be used by
+     the pipelined search
+    :param null_move_reduction: The extra depth reduction given to null move children (see should_try_null_move),
+     or None if null move pruning shouldn't be used
+    :param late_move_reductions: The LateMoveReductions used to search nodes' late moves to a reduced depth (and
+     search them again to the full depth if they fail high), or None if they shouldn't be reduced.  They can't be
+     used by the pipelined search
+    :param open_nodes: A tuple of the nodes to start the search from and the scores of their next moves (e.g. the
+     nodes of a tree kept from a previous search, see reopen_tree), or None if the search should start from the root.
+     It's not used by the pipelined search
+    :return: The root's value, or None if the search was stopped before it finished
+    """
+    if not num_threads is None:
+        nb.set_num_threads(num_threads)
+
+    if pipelined and not open_nodes is None:
+        raise ValueError("The pipelined search can't be started from nodes other than the root!")
+
+    if pipelined and (not inference_scheduler is None or not late_move_reductions is None):
+        raise ValueError("The pipelined search can't be used with an InferenceScheduler or late move reductions!")
+
+    if pipelined:
+        return pipelined_zero_window_negamax_search(
+            root,
+            node_arena,
+            open_node_holder,
+            board_eval_fn,
+            move_eval_fn,
+            hash_table,
+            previous_board_map,
+            parallel_backprop,
+            parallel_move_gen,
+            search_controller,
+            batch_dispatcher,
+            null_move_reduction)
+
+    open_node_holder.set_dead_node_mask(node_arena.dead)
+
+    if not inference_scheduler is None:
+        inference_scheduler.clear()
+
+    if open_nodes is None:
+        next_batch = np.array([root], dtype=np.int32)
+    else:
+        next_batch = get_next_batch(open_node_holder, open_nodes[0], open_nodes[1], batch_dispatcher)
+
+    while len(next_batch) != 0:
+        # Each node in the batch creates at most one new node
+        if not node_arena.has_room_for(len(next_batch)):
+            make_room_in_arena(node_arena, open_node_holder, len(next_batch), inference_scheduler)
+
+        to_insert, to_insert_scores = do_iteration(
+            next_batch,
+            node_arena,
+            hash_table,
+            previous_board_map,
+            board_eval_fn,
+            move_eval_fn,
+            parallel_backprop,
+            parallel_move_gen,
+            inference_scheduler=inference_scheduler,
+            null_move_reduction=null_move_reduction,
+            late_move_reductions=late_move_reductions,
+            batch_dispatcher=batch_dispatcher)
+
+        if not inference_scheduler is None:
+            # When there's nothing left to expand, the remaining work is run regardless of it's size
+            nothing_else_to_do = len(to_insert) == 0 and open_node_holder.is_empty()
+            scored_nodes, scored_node_scores = run_scheduled_inference(
+                inference_scheduler,
+                node_arena,
+                hash_table,
+                board_eval_fn,
+                move_eval_fn,
+                parallel_backprop,
+                force=nothing_else_to_do,
+                null_move_reduction=null_move_reduction,
+                late_move_reductions=late_move_reductions,
+                batch_dispatcher=batch_dispatcher)
+
+            to_insert = np.concatenate((to_insert, scored_nodes))
+            to_insert_scores = np.concatenate((to_insert_scores, scored_node_scores))
+
+        if node_arena.structs[root]['terminated']:
+            open_node_holder.clear_list()
+            if not inference_scheduler is None:
+                inference_scheduler.clear()
+            break
+
+        if not search_controller is None:
+            search_controller.add_nodes(len(next_batch))
+            if search_controller.should_stop():
+                open_node_holder.clear_list()
+                if not inference_scheduler is None:
+                    inference_scheduler.clear()
+                return None
+
+        if len(to_insert) == 0 and open_node_holder.is_empty():
+            break
+
+        next_batch = get_next_batch(open_node_holder, to_insert, to_insert_scores, batch_dispatcher)
+
+        # The open node list can run out of live nodes while the scheduler still has work to be run
+        if len(next_batch) == 0 and not inference_scheduler is None and not inference_scheduler.is_empty():
+            scored_nodes, scored_node_scores = run_scheduled_inference(
+                inference_scheduler,
+                node_arena,
+                hash_table,
+                board_eval_fn,
+                move_eval_fn,
+                parallel_backprop,
+                force=True,
+                null_move_reduction=null_move_reduction,
+                late_move_reductions=late_move_reductions,
+                batch_dispatcher=batch_dispatcher)
+
+            if node_arena.structs[root]['terminated']:
+                open_node_holder.clear_list()
+                break
+
+            next_batch = get_next_batch(open_node_holder, scored_nodes, scored_node_scores, batch_dispatcher)
+
+    return node_arena.structs[root]['best_value']
+
+
+def set_up_root_node_for_struct(move_eval_fn, hash_table, previous_board_map, root_struct, node_arena):
+    """
+    Adds the given board to the arena as the root of a new search tree, with it's moves generated and scored.
+
+    :return: The index of the root node
+    """
+    if not root_struct['turn']:
+        root_struct = convert_board_to_whites_perspective(root_struct)
+
+    struct_array = root_struct
+    root_as_array = np.full(1, NO_NODE_INDEX, dtype=np.int32)
+
+    child_termination_check_and_move_gen(
+        struct_array,
+        hash_table,
+        node_arena,
+        root_as_array,
+        previous_board_map)
+
+    if not node_arena.has_room_for(1):
+        grow_node_arena(node_arena, node_arena.num_in_use + 1)
+
+    root_as_array[0] = node_arena.add_node(struct_array[0], NO_NODE_INDEX)
+
+    num_moves_to_score = struct_array[0]['children_left']
+    num_moves_to_score_as_array = np.array([num_moves_to_score])
+
+    if struct_array[0]['terminated'] or num_moves_to_score == NEXT_MOVE_IS_FROM_TT_VAL:
+        return root_as_array[0]
+
+    move_future, _, _ = start_move_scoring(
+        struct_array,
+        node_arena.structs,
+        root_as_array,
+        np.zeros(1, dtype=np.bool_),
+        np.ones(1, dtype=np.bool_),
+        move_eval_fn)
+
+    relevant_moves = struct_array[0]['unexplored_moves'][:num_moves_to_score]
+
+    if not struct_array[0]['turn']:
+        relevant_moves[:, :2] = SQUARES_180[relevant_moves[:, :2]]
+
+    move_filters = MOVE_FILTER_LOOKUP[relevant_moves[:, 0], relevant_moves[:, 1], relevant_moves[:, 2]]
+    move_from_squares = relevant_moves[:, 0]
+
+    scores = move_future.result()([move_from_squares, move_filters, num_moves_to_score_as_array])
+
+    complete_move_evaluation(
+        scores,
+        struct_array,
+        node_arena,
+        root_as_array,
+        np.zeros(1, dtype=np.bool_),
+        np.ones(1, dtype=np.bool_),
+        0,
+        num_moves_to_score_as_array,
+        num_moves_to_score_as_array)
+
+    return root_as_array[0]
+
+
+def set_up_root_node_from_fen(move_eval_fn, hash_table, previous_board_map, fen, node_arena, depth=255, separator=0):
+    return set_up_root_node_for_struct(
+        move_eval_fn,
+        hash_table,
+        previous_board_map,
+        create_node_info_from_fen(fen, depth, separator),
+        node_arena)
+
+
+def set_up_root_node_from_template(root_template, separator, hash_table, node_arena):
+    """
+    Adds a copy of a root node which was previously set up (with it's moves generated and scored) to the arena, giving
+    it the new separator.  The TT is checked again since whether or not it's information terminates the root
+    depends on the separator.
+
+    :param root_template: A struct array of length 1 holding the root as it was right after it was set up
+    :return: The index of the root node
+    """
+    root_struct = root_template.copy()
+    root_struct[0]['separator'] = separator
+    root_struct[0]['best_value'] = MIN_FLOAT32_VAL
+
+    if should_terminate_from_tt(root_struct[0], hash_table):
+        root_struct[0]['terminated'] = True
+
+    if not node_arena.has_room_for(1):
+        grow_node_arena(node_arena, node_arena.num_in_use + 1)
+
+    return node_arena.add_node(root_struct[0], NO_NODE_INDEX)
+
+
+@njit
+def reopen_node_moves(node_arena, node):
+    """
+    Sets up the moves of a node from a tree kept in the arena to be expanded again.  The moves with a child still in
+    the arena aren't expanded again (the children are reopened or terminated themselves).  The moves which were
+    expanded but no longer have a child (e.g. those which made depth zero children, or who's children were released)
+    are given back a score of TT_MOVE_SCORE_VALUE, so they're expanded before the moves which weren't expanded yet.
+
+    :return: The score of the node's next move
+    """
+    struct = node_arena.structs[node]
+
+    num_moves = 0
+    while num_moves < len(struct['unexplored_moves']) and struct['unexplored_moves'][num_moves, 0] != 255:
+        num_moves += 1
+
+    has_child = np.zeros(num_moves, dtype=np.bool_)
+    child = node_arena.first_child[node]
+    while child != NO_NODE_INDEX:
+        for j in range(num_moves):
+            if np.all(struct['unexplored_moves'][j] == node_arena.structs[child]['prev_move']):
+                has_child[j] = True
+                break
+        child = node_arena.next_sibling[child]
+
+    for j in range(num_moves):
+        if struct['unexplored_move_scores'][j] == MIN_FLOAT32_VAL and not has_child[j]:
+            struct['unexplored_move_scores'][j] = TT_MOVE_SCORE_VALUE
+
+    struct['children_left'] = num_moves
+    return set_up_next_best_move(struct)
+
+
+@njit
+def reopen_tree(node_arena, root, separator, hash_table):
+    """
+    Sets up a tree kept in the arena from a previous zero-window search to be searched with a new separator.  Going
+    down from the root, each node is given it's new separator and checked against the TT.  The nodes who's stored
+    bounds decide the new separator are terminated (leaving their subtrees dead), and the rest are made alive again
+    and reopened (see reopen_node_moves).
+
+    :return: A tuple of the reopened nodes which have a move to expand, the scores of those moves, and the parents,
+     values (from the parents' perspective) and moves of the nodes which were terminated
+    """
+    open_nodes = np.empty(node_arena.num_allocated, dtype=np.int32)
+    open_scores = np.empty(node_arena.num_allocated, dtype=np.float32)
+    decided_parents = np.empty(node_arena.num_allocated, dtype=np.int32)
+    decided_values = np.empty(node_arena.num_allocated, dtype=np.float32)
+    decided_moves = np.empty((node_arena.num_allocated, 3), dtype=np.uint8)
+    num_open = 0
+    num_decided = 0
+
+    node_arena.structs[root]['separator'] = separator
+
+    stack = np.empty(node_arena.num_allocated, dtype=np.int32)
+    stack[0] = root
+    stack_size = 1
+    while stack_size != 0:
+        stack_size -= 1
+        node = stack[stack_size]
+        struct = node_arena.structs[node]
+
+        struct['terminated'] = False
+        struct['best_value'] = MIN_FLOAT32_VAL
+
+        if should_terminate_from_tt(struct, hash_table):
+            struct['terminated'] = True
+            mark_subtree_dead(node_arena, node)
+            if node_arena.parents[node] != NO_NODE_INDEX:
+                decided_parents[num_decided] = node_arena.parents[node]
+                decided_values[num_decided] = - struct['best_value']
+                decided_moves[num_decided] = struct['prev_move']
+                num_decided += 1
+            continue
+
+        node_arena.dead[node] = False
+
+        # A node who's TT move hasn't been expanded yet still has it set up as it's next move
+        if struct['children_left'] == NEXT_MOVE_IS_FROM_TT_VAL:
+            next_move_score = TT_MOVE_SCORE_VALUE
+        else:
+            next_move_score = reopen_node_moves(node_arena, node)
+
+        if struct['next_move_index'] != NO_MORE_MOVES_VALUE:
+            open_nodes[num_open] = node
+            open_scores[num_open] = next_move_score
+            num_open += 1
+
+        child = node_arena.first_child[node]
+        while child != NO_NODE_INDEX:
+            node_arena.structs[child]['separator'] = - struct['separator']
+            stack[stack_size] = child
+            stack_size += 1
+            child = node_arena.next_sibling[child]
+
+    return (open_nodes[:num_open], open_scores[:num_open], decided_parents[:num_decided],
+            decided_values[:num_decided], decided_moves[:num_decided])
+
+
+@njit
+def set_tree_depth(node_arena, root, depth):
+    """
+    Shifts the depth of every node in the tree under the given root by the same amount, so that the root has the given
+    depth (e.g. so a tree kept from a shallower search can be searched again).  The nodes which would be left with no
+    depth remaining are unlinked from the tree and marked dead (with their subtrees), and their moves are expanded
+    again when their parents are reopened.
+    """
+    shift = np.int32(depth) - np.int32(node_arena.structs[root]['depth'])
+    node_arena.structs[root]['depth'] = depth
+
+    stack = np.empty(node_arena.num_allocated, dtype=np.int32)
+    stack[0] = root
+    stack_size = 1
+    while stack_size != 0:
+        stack_size -= 1
+        node = stack[stack_size]
+
+        prev_child = NO_NODE_INDEX
+        child = node_arena.first_child[node]
+        while child != NO_NODE_INDEX:
+            next_child = node_arena.next_sibling[child]
+            new_depth = np.int32(node_arena.structs[child]['depth']) + shift
+            if new_depth <= 0:
+                if prev_child == NO_NODE_INDEX:
+                    node_arena.first_child[node] = next_child
+                else:
+                    node_arena.next_sibling[prev_child] = next_child
+                mark_subtree_dead(node_arena, child)
+            else:
+                node_arena.structs[child]['depth'] = new_depth
+                stack[stack_size] = child
+                stack_size += 1
+                prev_child = child
+            child = next_child
+
+
+@njit
+def is_prev_move(board_struct, move):
+    """
+    Checks if the given move is the one made to reach the board, ignoring the flag of a reduced move (which is kept in
+    it's child's prev_move, see create_child_structs).
+    """
+    prev_move = board_struct['prev_move']
+    return prev_move[0] == move[0] and prev_move[1] == move[1] and prev_move[2] % REDUCED_MOVE_FLAG == move[2]
+
+
+@njit
+def find_grandchild(node_arena, node, moves):
+    """
+    Finds a grandchild of a node from the two moves made to reach it (e.g. a move and it's reply).  They're matched
+    by move rather than by hash, since the boards of a tree rooted at a board with black to move are converted to
+    white's perspective, and their hashes aren't those of the real boards.
+
+    :param moves: An array of the two moves, as they're stored in the tree's nodes (see get_move_array)
+    :return: The index of the grandchild, or NO_NODE_INDEX if it's not in the arena
+    """
+    child = node_arena.first_child[node]
+    while child != NO_NODE_INDEX:
+        if is_prev_move(node_arena.structs[child], moves[0]):
+            grandchild = node_arena.first_child[child]
+            while grandchild != NO_NODE_INDEX:
+                if is_prev_move(node_arena.structs[grandchild], moves[1]):
+                    return grandchild
+                grandchild = node_arena.next_sibling[grandchild]
+        child = node_arena.next_sibling[child]
+    return NO_NODE_INDEX
+
+
+def get_move_array(moves, flip_moves=False):
+    """
+    :param moves: An iterable of python-chess Moves
+    :param flip_moves: If the squares of the moves should be mirrored, as they are in a search tree rooted at a board
+     with black to move
+    :return: An array of the moves, as they're stored in the nodes of a search tree
+    """
+    move_array = np.array(
+        [[move.from_square, move.to_square, 0 if move.promotion is None else move.promotion] for move in moves],
+        dtype=np.uint8).reshape(-1, 3)
+
+    if flip_moves:
+        move_array[:, :2] = square_mirror(move_array[:, :2])
+
+    return move_array
+
+
+def set_up_tree_root(move_eval_fn, hash_table, previous_board_map, fen, node_arena):
+    """
+    Clears the arena and sets up the root of a tree to be kept and searched again (see reopen_tree).  The root is
+    given the highest depth possible so it isn't terminated from the TT (it's depth is set by set_tree_depth).
+
+    :return: The index of the root node, or NO_NODE_INDEX if the root terminated when it was set up (e.g. if the game
+     is over)
+    """
+    node_arena.clear()
+    root = set_up_root_node_from_fen(move_eval_fn, hash_table, previous_board_map, fen, node_arena)
+    if node_arena.structs[root]['terminated']:
+        return NO_NODE_INDEX
+    return root
+
+
+def get_board_hash(fen, moves=None):
+    """
+    Gets the hash of the board reached by making the given moves from the FEN's board, as it's stored in the nodes
+    (and the TT entries) of a search tree rooted at the FEN's board.  When black is to move in the FEN's board, this
+    isn't the hash of the real board reached.
+
+    :param moves: An array of the moves to make (see get_move_array), or None if none should be made
+    """
+    board_struct = create_node_info_from_fen(fen, 0, 0)
+    if not board_struct['turn']:
+        board_struct = convert_board_to_whites_perspective(board_struct)
+
+    if not moves is None:
+        for move in moves:
+            push_moves(board_struct, move.reshape(1, 3))
+
+    return board_struct[0]['hash']
+
+
+def choose_move_from_stopped_search(fen, hash_table, previous_board_map, move_eval_fn):
+    """
+    Chooses a move for a board who's search was stopped before any of it's zero-window searches found one.  The move
+    stored in the TT for the board is used if it's legal, otherwise the root child with the best value bound stored in
+    the TT (the lowest upper bound, from the child's perspective) is picked, and if none of them have one, the move
+    given the highest score by the move scoring ANN is.
+
+    :return: The python-chess Move chosen, or None if the board has no moves
+    """
+    node_arena = NodeArena(1)
+    root = set_up_root_node_from_fen(move_eval_fn, hash_table, previous_board_map, fen, node_arena)
+    root_struct = node_arena.structs[root:root + 1]
+
+    flip_move = fen.split()[1] == 'b'
+
+    if root_struct[0]['children_left'] == NEXT_MOVE_IS_FROM_TT_VAL:
+        return tt.move_array_to_python_chess_move(root_struct[0]['unexplored_moves'][0].copy(), flip_move)
+
+    if root_struct[0]['terminated'] or root_struct[0]['next_move_index'] == NO_MORE_MOVES_VALUE:
+        return None
+
+    best_move = root_struct[0]['unexplored_moves'][root_struct[0]['next_move_index']].copy()
+    best_upper_bound = MAX_FLOAT32_VAL
+    for move in root_struct[0]['unexplored_moves'][:root_struct[0]['children_left']]:
+        child_struct = root_struct.copy()
+        push_moves(child_struct, move.reshape(1, 3))
+
+        _, _, child_upper_bound = tt.get_tt_bounds(hash_table, child_struct[0]['hash'])
+        if child_upper_bound < best_upper_bound:
+            best_move = move.copy()
+            best_upper_bound = child_upper_bound
+
+    return tt.move_array_to_python_chess_move(best_move, flip_move)
+
+
+def get_previous_search_info(fen, hash_table, board_hash=None):
+    """
+    Looks up what previous searches stored in the TT about the board given by the FEN (e.g. from when the board was a
+    node in the search done to pick an earlier move of the game).  TT entries store the depth remaining below the
+    board, so nothing needs adjusting to use them for a search rooted at the board.
+
+    :param board_hash: The hash the board's TT entries were stored with (e.g. from a node of the previous search's
+     tree, or from get_board_hash), or None if it's the one given to the FEN's board when it's a search's root
+    :return: A tuple of the depth the board was searched to (0 if it has no entry), and the lower and upper bounds
+     found for it's value
+    """
+    if board_hash is None:
+        board_hash = get_board_hash(fen)
+
+    depth, lower_bound, upper_bound = tt.get_tt_bounds(hash_table, board_hash)
+    if depth == NO_TT_ENTRY_VALUE:
+        depth = 0
+
+    return depth, lower_bound, upper_bound
+
+
+def get_next_mtd_f_beta(lower_bound, upper_bound, cur_guess, guess_increment):
+    """
+    Picks the value the next zero-window search of an mtd(f) search should test, given the bounds found so far.
+    """
+    if lower_bound == LOSS_RESULT_SCORES[0]:
+        if upper_bound != WIN_RESULT_SCORES[0]:
+            return np.minimum(upper_bound - guess_increment, np.nextafter(upper_bound, MIN_FLOAT32_VAL))
+        return cur_guess
+    elif upper_bound == WIN_RESULT_SCORES[0]:
+        return np.maximum(lower_bound + guess_increment, np.nextafter(lower_bound, MAX_FLOAT32_VAL))
+    return np.maximum(lower_bound + (upper_bound - lower_bound) / 2, np.nextafter(lower_bound, MAX_FLOAT32_VAL))
+
+
+def get_concurrent_probe_betas(lower_bound, upper_bound, cur_guess, guess_increment, num_probes):
+    """
+    Picks the values to be tested by zero-window searches being run at the same time, spread out within the bounds
+    found so far in the same way get_next_mtd_f_beta picks a single value.
+
+    :return: A sorted array of the (unique) values to test, each greater than lower_bound and no more than upper_bound
+    """
+    if lower_bound == LOSS_RESULT_SCORES[0]:
+        if upper_bound != WIN_RESULT_SCORES[0]:
+            betas = upper_bound - guess_increment * np.arange(1, num_probes + 1)
+        else:
+            betas = cur_guess + guess_increment * (np.arange(num_probes) - (num_probes - 1) // 2)
+    elif upper_bound == WIN_RESULT_SCORES[0]:
+        betas = lower_bound + guess_increment * np.arange(1, num_probes + 1)
+    else:
+        betas = lower_bound + (upper_bound - lower_bound) * np.arange(1, num_probes + 1) / (num_probes + 1)
+
+    betas = np.minimum(
+        np.maximum(betas.astype(np.float32), np.nextafter(lower_bound, MAX_FLOAT32_VAL)),
+        upper_bound)
+
+    return np.unique(betas)
 
 
 def mtd_f(fen, depth, first_guess, open_node_holder, board_eval_fn, move_eval_fn, hash_table, previous_board_map,
-          guess_increment=.05, print_info=False):
+          guess_increment=.05, node_arena=None, parallel_backprop=False, parallel_move_gen=False, num_threads=None,
+          reuse_tree=False, tree_root=NO_NODE_INDEX, search_controller=None, num_concurrent_probes=1,
+          probe_strategy="bisection", score_history=None, probe_counts=None, pipelined=False, batch_dispatcher=None,
+          inference_scheduler=None, null_move_reduction=None, late_move_reductions=None, print_info=False):
     """
     Does an mtd(f) search modified to a binary search (this is done to address the granularity of the evaluation network).
+
+    :param node_arena: The NodeArena to build the search trees in (it's cleared before each search), or None if
+     one should be created
+    :param parallel_backprop: If the nodes of each level of backpropagation should be updated in parallel
+     (the results are identical to doing it serially)
+    :param parallel_move_gen: If the termination checks and move generation of each batch should be done in parallel
+    :param num_threads: The number of threads to be used by the parallel functions of the search, or None to use
+     Numba's default
+    :param reuse_tree: If the tree built by each zero-window search should be kept in the arena and searched again
+     by the next one (see reopen_tree), instead of a new tree being built from the FEN for each of them.  This can't
+     be used with the pipelined search, an InferenceScheduler, null move pruning, or late move reductions
+    :param tree_root: The root of a tree kept in node_arena from a previous search of the board (e.g. to a shallower
+     depth, or from picking an earlier move, see set_up_tree_root), or NO_NODE_INDEX if there isn't one.  The
+     tree's depths are shifted to the given depth (see set_tree_depth), and it's reused by every zero-window search
+    :param search_controller: The SearchController deciding when the search should stop, or None if it should run
+     until it's finished
+    :param num_concurrent_probes: The number of zero-window searches to be run at the same time, if more than 1,
+     the search is done by concurrent_probe_mtd_f.  Concurrent probes can't be used with a reused tree, the
+     "adaptive" probe strategy, a score history, the pipelined search, a BatchDispatcher, an InferenceScheduler,
+     null move pruning, or late move reductions
+    :param probe_strategy: How the values tested by the zero-window searches are picked, either "bisection" (the
+     original scheme, stepping guess_increment from the bound found until both bounds are known, then bisecting),
+     or "adaptive", which differs in that:
+        -The step is initially the change in value between the last two depths (in score_history) if that's larger
+         than guess_increment, and it doubles each time a search fails in the same direction
+        -The search starts with the bounds stored in the TT for the root if they're from a search at least as deep
+         (and don't already decide the value)
+    :param score_history: A list of the values found for the board at previous depths (in order), or None
+    :param probe_counts: A list to append the number of zero-window searches done to, or None
+    :param pipelined: If the zero-window searches should overlap the preparation of each batch with the previous
+     batch's evaluations (see pipelined_zero_window_negamax_search)
+    :param batch_dispatcher: The BatchDispatcher used to pick the size of each of the zero-window searches' batches,
+     or None
+    :param inference_scheduler: The InferenceScheduler used to accumulate each zero-window search's leaf
+     evaluations and move scoring across it's iterations, or None.  This can't be used by the pipelined search
+    :param null_move_reduction: The extra depth reduction given to null move children (see should_try_null_move),
+     or None if null move pruning shouldn't be used
+    :param late_move_reductions: The LateMoveReductions used to search late moves to a reduced depth, or None.  This
+     can't be used by the pipelined search
+    :return: A tuple of the value found (or the best estimate of it if the search was stopped), the move chosen (or
+     None if the search was stopped before any of it's zero-window searches found one), and the hash table
+
+    NOTES:
+    1) When the tree is reused, the subtrees of terminated nodes are only released when room needs to be made in the
+    arena, so those kept are reopened by the next zero-window search unless their bounds in the TT decide it
     """
+    if reuse_tree and (pipelined or not inference_scheduler is None or not null_move_reduction is None
+                       or not late_move_reductions is None):
+        raise ValueError("The tree can't be reused by the pipelined search, or with an InferenceScheduler, null move pruning, or late move reductions!")
+
+    if tree_root != NO_NODE_INDEX and not reuse_tree:
+        raise ValueError("A tree root was given, but reuse_tree is False!")
+
+    if num_concurrent_probes > 1 and (reuse_tree or probe_strategy != "bisection" or not score_history is None
+                                      or pipelined or not batch_dispatcher is None or not inference_scheduler is None
+                                      or not null_move_reduction is None or not late_move_reductions is None):
+        raise ValueError("Concurrent probes can't be used with a reused tree, the adaptive probe strategy, a score history, the pipelined search, a BatchDispatcher, an InferenceScheduler, null move pruning, or late move reductions!")
+
+    if node_arena is None:
+        node_arena = NodeArena(DEFAULT_NODE_ARENA_CAPACITY)
+
+    if num_concurrent_probes > 1:
+        return concurrent_probe_mtd_f(
+            fen,
+            depth,
+            first_guess,
+            open_node_holder,
+            board_eval_fn,
+            move_eval_fn,
+            hash_table,
+            previous_board_map,
+            num_probes=num_concurrent_probes,
+            guess_increment=guess_increment,
+            node_arena=node_arena,
+            parallel_backprop=parallel_backprop,
+            parallel_move_gen=parallel_move_gen,
+            num_threads=num_threads,
+            search_controller=search_controller,
+            probe_counts=probe_counts,
+            print_info=print_info)
+
+    if tree_root != NO_NODE_INDEX:
+        set_tree_depth(node_arena, tree_root, depth)
+
     cur_guess = first_guess
 
+    found_move = False
+
     upper_bound = WIN_RESULT_SCORES[0]
     lower_bound = LOSS_RESULT_SCORES[0]
 
+    step = guess_increment
+    last_failed_high = None
+    if probe_strategy == "adaptive":
+        if not score_history is None and len(score_history) >= 2:
+            # The step is kept as a float32 so that the separators are just below values the search can return
+            step = np.float32(np.maximum(guess_increment, np.abs(score_history[-1] - score_history[-2])))
+
+        tt_depth, tt_lower_bound, tt_upper_bound = get_previous_search_info(fen, hash_table)
+        if tt_depth >= depth and tt_lower_bound < tt_upper_bound:
+            if tt_lower_bound != MIN_FLOAT32_VAL:
+                lower_bound = np.maximum(lower_bound, tt_lower_bound)
+            if tt_upper_bound != MAX_FLOAT32_VAL:
+                upper_bound = np.minimum(upper_bound, tt_upper_bound)
+    elif probe_strategy != "bisection":
+        raise ValueError("The probe strategy '%s' is not recognized!" % probe_strategy)
+
+    num_probes = 0
+
     if print_info:
         counter = 0
 
     while lower_bound < upper_bound:
+        if not search_controller is None and search_controller.should_stop():
+            break
 
-        if lower_bound == LOSS_RESULT_SCORES[0]:
-            if upper_bound != WIN_RESULT_SCORES[0]:
-                beta = np.minimum(upper_bound - guess_increment, np.nextafter(upper_bound, MIN_FLOAT32_VAL))
-            else:
-                beta = cur_guess
-        elif upper_bound == WIN_RESULT_SCORES[0]:
-            beta = np.maximum(lower_bound + guess_increment, np.nextafter(lower_bound, MAX_FLOAT32_VAL))
-        else:
-            beta = np.maximum(lower_bound + (upper_bound - lower_bound) / 2, np.nextafter(lower_bound, MAX_FLOAT32_VAL))
+        beta = get_next_mtd_f_beta(lower_bound, upper_bound, cur_guess, step)
 
         seperator_to_use = np.nextafter(beta, MIN_FLOAT32_VAL)
 
-        # This would ideally share the same tree, but updated for the new separation value
-        cur_root_node = set_up_root_node_from_fen(move_eval_fn, hash_table, previous_board_map, fen, depth, seperator_to_use)
+        open_nodes = None
+        if tree_root == NO_NODE_INDEX:
+            node_arena.clear()
+            cur_root_node = set_up_root_node_from_fen(
+                move_eval_fn, hash_table, previous_board_map, fen, node_arena, depth, seperator_to_use)
 
-        if cur_root_node.struct['terminated']:
-            cur_guess = cur_root_node.struct['best_value']
+            # A root terminated when it was set up never had it's moves generated, so there's no tree to keep
+            if reuse_tree and not node_arena.structs[cur_root_node]['terminated']:
+                tree_root = cur_root_node
+        else:
+            cur_root_node = tree_root
+            reopened_nodes, reopened_scores, decided_parents, decided_values, decided_moves = reopen_tree(
+                node_arena, tree_root, seperator_to_use, hash_table)
+
+            backpropagate_values(
+                node_arena, decided_parents, decided_values, decided_moves, hash_table, parallel_backprop)
+
+            still_open_mask = np.logical_not(node_arena.dead[reopened_nodes])
+            open_nodes = (reopened_nodes[still_open_mask], reopened_scores[still_open_mask])
+
+        if node_arena.structs[cur_root_node]['terminated']:
+            cur_guess = node_arena.structs[cur_root_node]['best_value']
         else:
             cur_guess = zero_window_negamax_search(
                 cur_root_node,
+                node_arena,
                 open_node_holder,
                 board_eval_fn,
                 move_eval_fn,
                 hash_table=hash_table,
-                previous_board_map=previous_board_map)
+                previous_board_map=previous_board_map,
+                parallel_backprop=parallel_backprop,
+                parallel_move_gen=parallel_move_gen,
+                num_threads=num_threads,
+                search_controller=search_controller,
+                pipelined=pipelined,
+                batch_dispatcher=batch_dispatcher,
+                inference_scheduler=inference_scheduler,
+                null_move_reduction=null_move_reduction,
+                late_move_reductions=late_move_reductions,
+                open_nodes=open_nodes)
+
+            if cur_guess is None:
+                cur_guess = lower_bound if lower_bound != LOSS_RESULT_SCORES[0] else upper_bound
+                break
+
+        num_probes += 1
 
         if cur_guess < beta:
             upper_bound = cur_guess
         else:
+            # The root only stores a move in the TT when it fails high
             lower_bound = cur_guess
+            found_move = True
+
+        if probe_strategy == "adaptive":
+            if last_failed_high == (cur_guess >= beta):
+                step *= 2
+            last_failed_high = cur_guess >= beta
 
         if print_info:
             counter += 1
             print("Finished iteration %d with lower and upper bounds (%f,%f) after search returned %f" % (counter, lower_bound, upper_bound, cur_guess))
 
-    tt_move = tt.choose_move(hash_table, cur_root_node, fen.split()[1]=='b')
+    if not probe_counts is None:
+        probe_counts.append(num_probes)
+
+    if lower_bound < upper_bound and not found_move:
+        return cur_guess, None, hash_table
+
+    tt_move = tt.choose_move(hash_table, node_arena.structs[cur_root_node], fen.split()[1]=='b')
+
+    return cur_guess, tt_move, hash_table
+
+
+def concurrent_probe_mtd_f(fen, depth, first_guess, open_node_holder, board_eval_fn, move_eval_fn, hash_table,
+                           previous_board_map, num_probes=3, guess_increment=.05, node_arena=None,
+                           parallel_backprop=False, parallel_move_gen=False, num_threads=None, search_controller=None,
+                           probe_counts=None, print_info=False):
+    """
+    Does an mtd(f) search which runs several zero-window searches at once, each testing a different value within the
+    bounds found so far (see get_concurrent_probe_betas).  Their nodes share the same arena, open node list, TT, and
+    batches.  The bounds are narrowed by whichever searches finish first, searches testing values which are no
+    longer within the bounds are cancelled (by marking their trees dead), and new ones are started in their place.
+
+    The parameters and return values are the same as mtd_f's.  The root node is always reused.
+    """
+    if node_arena is None:
+        node_arena = NodeArena(DEFAULT_NODE_ARENA_CAPACITY)
+
+    if not num_threads is None:
+        nb.set_num_threads(num_threads)
+
+    node_arena.clear()
+    open_node_holder.clear_list()
+
+    cur_guess = first_guess
+    upper_bound = WIN_RESULT_SCORES[0]
+    lower_bound = LOSS_RESULT_SCORES[0]
+
+    root_template = None
+    root_for_move = None
+    found_move = False
+
+    # The root of each running zero-window search, mapped to the value it's testing
+    probes = {}
+    num_started = 0
+    roots_to_insert = []
+
+    to_insert = np.empty(0, dtype=np.int32)
+    to_insert_scores = np.empty(0, dtype=np.float32)
+
+    if print_info:
+        counter = 0
+
+    while True:
+        # Narrow the bounds from the zero-window searches which finished (the roots won't have been released since
+        # the arena is only compacted right before an iteration)
+        for root in [root for root in probes if node_arena.structs[root]['terminated']]:
+            beta = probes.pop(root)
+            cur_guess = node_arena.structs[root]['best_value']
+            if cur_guess < beta:
+                upper_bound = np.minimum(upper_bound, cur_guess)
+            else:
+                # The root only stores a move in the TT when it fails high
+                lower_bound = np.maximum(lower_bound, cur_guess)
+                found_move = True
+
+            if print_info:
+                counter += 1
+                print("Finished zero-window search %d (testing %f) with lower and upper bounds (%f,%f) after search returned %f" % (counter, beta, lower_bound, upper_bound, cur_guess))
+
+        for root, beta in list(probes.items()):
+            if beta <= lower_bound or beta > upper_bound:
+                mark_subtree_dead(node_arena, root)
+                del probes[root]
+
+        if lower_bound >= upper_bound:
+            break
+
+        if not search_controller is None and search_controller.should_stop():
+            break
+
+        for beta in get_concurrent_probe_betas(lower_bound, upper_bound, cur_guess, guess_increment, num_probes):
+            if len(probes) >= num_probes:
+                break
+            if beta in probes.values():
+                continue
+
+            separator = np.nextafter(beta, MIN_FLOAT32_VAL)
+            if root_template is None:
+                root = set_up_root_node_from_fen(
+                    move_eval_fn, hash_table, previous_board_map, fen, node_arena, depth, separator)
+
+                root_struct = node_arena.structs[root]
+                if not root_struct['terminated'] and root_struct['children_left'] != NEXT_MOVE_IS_FROM_TT_VAL:
+                    root_template = node_arena.structs[root:root + 1].copy()
+            else:
+                root = set_up_root_node_from_template(root_template, separator, hash_table, node_arena)
+
+            if root_for_move is None:
+                root_for_move = node_arena.structs[root:root + 1].copy()
+
+            probes[root] = beta
+            num_started += 1
+            if not node_arena.structs[root]['terminated']:
+                roots_to_insert.append(root)
+
+        # Roots which terminated as they were set up are recorded before doing another iteration
+        if np.any([node_arena.structs[root]['terminated'] for root in probes]):
+            continue
+
+        # Adding roots can grow the arena, which replaces it's mask of dead nodes
+        open_node_holder.set_dead_node_mask(node_arena.dead)
+
+        to_insert = np.concatenate((to_insert, np.array(roots_to_insert, dtype=np.int32)))
+        to_insert_scores = np.concatenate((
+            to_insert_scores,
+            np.full(len(roots_to_insert), TT_MOVE_SCORE_VALUE, dtype=np.float32)))
+        roots_to_insert = []
+
+        next_batch = open_node_holder.insert_nodes_and_get_next_batch(to_insert, to_insert_scores)
+
+        # Each node in the batch creates at most one new node
+        if not node_arena.has_room_for(len(next_batch)):
+            make_room_in_arena(node_arena, open_node_holder, len(next_batch))
+
+        to_insert, to_insert_scores = do_iteration(
+            next_batch,
+            node_arena,
+            hash_table,
+            previous_board_map,
+            board_eval_fn,
+            move_eval_fn,
+            parallel_backprop,
+            parallel_move_gen)
+
+        if not search_controller is None:
+            search_controller.add_nodes(len(next_batch))
+
+    open_node_holder.clear_list()
+
+    if not probe_counts is None:
+        probe_counts.append(num_started)
+
+    if lower_bound >= upper_bound:
+        cur_guess = lower_bound
+    else:
+        cur_guess = lower_bound if lower_bound != LOSS_RESULT_SCORES[0] else upper_bound
+        if not found_move:
+            return cur_guess, None, hash_table
+
+    tt_move = tt.choose_move(hash_table, root_for_move[0], fen.split()[1]=='b')
 
     return cur_guess, tt_move, hash_table
 
 
 def iterative_deepening_mtd_f(fen, depths_to_search, open_node_holder, board_eval_fn, move_eval_fn, hash_table,
-                              previous_board_map, first_guess=0, guess_increments=None, print_info=False):
+                              previous_board_map, first_guess=0, guess_increments=None, node_arena=None,
+                              parallel_backprop=False, parallel_move_gen=False, num_threads=None,
+                              reuse_tree=False, tree_root=NO_NODE_INDEX, search_controller=None, num_concurrent_probes=1,
+                              probe_strategy="bisection", probe_counts=None, pipelined=False, batch_dispatcher=None,
+                              inference_scheduler=None, null_move_reduction=None, late_move_reductions=None,
+                              print_info=False):
+    """
+    :param search_controller: The SearchController deciding when the search should stop, or None if every depth
+     should be searched.  It's given to every depth (including the first), and when the search is stopped, the move
+     from the last completed depth (or a deeper zero-window search which found one) is returned.  If none of them
+     found a move, one is chosen by choose_move_from_stopped_search
+    :param reuse_tree: If the tree built by each zero-window search should be reused by the next one, including
+     those of the following depths (see mtd_f)
+    :param tree_root: The root of a tree kept in node_arena from a previous search of the board (see mtd_f), or
+     NO_NODE_INDEX if a new one should be set up
+    :param probe_strategy: The strategy used to pick the values tested by each depth's zero-window searches
+     (see mtd_f)
+    :param probe_counts: A list to append the number of zero-window searches done for each depth to, or None
+    :param pipelined: If batch preparation should be overlapped with evaluation (see mtd_f)
+    :param batch_dispatcher: The BatchDispatcher used to pick the size of each batch (see mtd_f), or None
+    :param inference_scheduler: The InferenceScheduler used to accumulate the ANN work (see mtd_f), or None
+    :param null_move_reduction: The extra depth reduction of null move children (see mtd_f), or None
+    :param late_move_reductions: The LateMoveReductions used to search late moves to a reduced depth (see mtd_f),
+     or None
+    """
     if guess_increments is None:
         guess_increments = [.05]*len(depths_to_search)
 
+    if node_arena is None:
+        node_arena = NodeArena(DEFAULT_NODE_ARENA_CAPACITY)
+
     if print_info:
         start_time = time.time()
 
 
+    if probe_counts is None:
+        probe_counts = []
+
+    if reuse_tree and tree_root == NO_NODE_INDEX:
+        tree_root = set_up_tree_root(move_eval_fn, hash_table, previous_board_map, fen, node_arena)
+
+    tt_move = None
+    score_history = []
     for depth, increment in zip(depths_to_search, guess_increments):
+        # The first depth is always started, since there's no move to return without it
+        if not search_controller is None and not tt_move is None and not search_controller.should_start_new_depth():
+            break
+
         if print_info:
             print("Starting depth %d search, with first guess %f"%(depth, first_guess))
             started_search = time.time()
 
-        first_guess, tt_move, hash_table = mtd_f(
+        depth_guess, depth_move, hash_table = mtd_f(
             fen,
             depth,
             first_guess,
@@ -854,11 +2532,35 @@ def iterative_deepening_mtd_f(fen, depths_to_search, open_node_holder, board_eva
             hash_table=hash_table,
             previous_board_map=previous_board_map,
             guess_increment=increment,
+            node_arena=node_arena,
+            parallel_backprop=parallel_backprop,
+            parallel_move_gen=parallel_move_gen,
+            num_threads=num_threads,
+            reuse_tree=reuse_tree,
+            tree_root=tree_root,
+            search_controller=search_controller,
+            num_concurrent_probes=num_concurrent_probes,
+            probe_strategy=probe_strategy,
+            score_history=score_history if num_concurrent_probes == 1 else None,
+            probe_counts=probe_counts,
+            pipelined=pipelined,
+            batch_dispatcher=batch_dispatcher,
+            inference_scheduler=inference_scheduler,
+            null_move_reduction=null_move_reduction,
+            late_move_reductions=late_move_reductions,
             print_info=print_info)
 
+        if not depth_move is None:
+            tt_move = depth_move
+
+        if not search_controller is None and search_controller.stopped:
+            break
+
+        first_guess = depth_guess
+        score_history.append(depth_guess)
 
         if print_info:
-            print("Completed depth %d in time %f with value %f\n"%(depth, time.time() - started_search, first_guess))
+            print("Completed depth %d in time %f with value %f after %d zero-window searches\n"%(depth, time.time() - started_search, first_guess, probe_counts[-1]))
 
 
     if print_info:
@@ -866,5 +2568,178 @@ def iterative_deepening_mtd_f(fen, depths_to_search, open_node_holder, board_eva
         print("The number of nodes inserted into the node list (including repeats) was %d, and %d were retrieved.\n" % (open_node_holder.total_in, open_node_holder.total_out))
         open_node_holder.reset_logs()
 
+    if tt_move is None and not search_controller is None and search_controller.stopped:
+        tt_move = choose_move_from_stopped_search(fen, hash_table, previous_board_map, move_eval_fn)
 
     return first_guess, tt_move, hash_table
+
+
+
+class MultiRootSearchState(object):
+    """
+    The state of the iterative deepening mtd(f) search of one of the roots searched by multi_root_search, so that it
+    can be advanced one zero-window search at a time.
+    """
+
+    def __init__(self, fen, depths_to_search, first_guess, guess_increment):
+        self.fen = fen
+        self.depths_to_search = list(depths_to_search)
+        self.guess_increment = guess_increment
+        self.cur_guess = first_guess
+
+        self.root_template = None
+        self.root_node = NO_NODE_INDEX
+        self.move = None
+
+        self.start_depth()
+
+    def start_depth(self):
+        self.depth = self.depths_to_search.pop(0)
+        self.lower_bound = LOSS_RESULT_SCORES[0]
+        self.upper_bound = WIN_RESULT_SCORES[0]
+        self.beta = None
+
+    @property
+    def is_finished(self):
+        return self.lower_bound >= self.upper_bound and len(self.depths_to_search) == 0
+
+    def next_separator(self):
+        self.beta = get_next_mtd_f_beta(self.lower_bound, self.upper_bound, self.cur_guess, self.guess_increment)
+        return np.nextafter(self.beta, MIN_FLOAT32_VAL)
+
+    def record_result(self, value, hash_table, root_struct):
+        """
+        Updates the search from the value found by it's latest zero-window search, moving on to the next depth if the
+        current one is finished.
+        """
+        self.cur_guess = value
+        if value < self.beta:
+            self.upper_bound = value
+        else:
+            self.lower_bound = value
+
+        if self.lower_bound >= self.upper_bound:
+            self.move = tt.choose_move(hash_table, root_struct, self.fen.split()[1] == 'b')
+            if len(self.depths_to_search) != 0:
+                self.start_depth()
+
+
+def set_up_multi_root_search_root(search, move_eval_fn, hash_table, previous_board_map, node_arena):
+    """
+    Adds the root for the next zero-window search of one of multi_root_search's searches to the arena.
+
+    :return: The index of the root node
+    """
+    separator = search.next_separator()
+    if search.root_template is None:
+        root_node = set_up_root_node_from_fen(
+            move_eval_fn, hash_table, previous_board_map, search.fen, node_arena, search.depth, separator)
+
+        root_struct = node_arena.structs[root_node]
+        if not root_struct['terminated'] and root_struct['children_left'] != NEXT_MOVE_IS_FROM_TT_VAL:
+            search.root_template = node_arena.structs[root_node:root_node + 1].copy()
+    else:
+        search.root_template[0]['depth'] = search.depth
+        root_node = set_up_root_node_from_template(search.root_template, separator, hash_table, node_arena)
+
+    search.root_node = root_node
+    return root_node
+
+
+def multi_root_search(fens, depths_to_search, open_node_holder, board_eval_fn, move_eval_fn, hash_table,
+                      first_guesses=None, guess_increment=.05, node_arena=None, parallel_backprop=False,
+                      parallel_move_gen=False, num_threads=None):
+    """
+    Does an iterative deepening mtd(f) search of each of the given boards at the same time.  The zero-window searches
+    of every board share the same open node list, arena, TT, and batches, so each iteration makes one call to each of
+    the evaluation functions for all of the boards, and the batches stay full even when a single search couldn't
+    fill them.
+
+    This is a generator which yields the results of each board's search as soon as it's finished, as a tuple of the
+    index of the board's FEN, the value found, and the move chosen.
+
+    :param first_guesses: An iterable of the first guess for each board's search, or None if 0 should be used
+    :param guess_increment: The guess increment used by every board's mtd(f) searches (see mtd_f)
+
+    NOTES:
+    1) Repetitions of boards made before the given boards aren't considered, since they're given as FENs
+    """
+    if first_guesses is None:
+        first_guesses = np.zeros(len(fens))
+
+    if node_arena is None:
+        node_arena = NodeArena(DEFAULT_NODE_ARENA_CAPACITY)
+    else:
+        node_arena.clear()
+
+    if not num_threads is None:
+        nb.set_num_threads(num_threads)
+
+    previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+
+    searches = [MultiRootSearchState(fen, depths_to_search, guess, guess_increment)
+                for fen, guess in zip(fens, first_guesses)]
+
+    # The roots of the zero-window searches which have been started, but not yet put in the open node list
+    roots_to_insert = []
+    for search in searches:
+        root = set_up_multi_root_search_root(search, move_eval_fn, hash_table, previous_board_map, node_arena)
+        if not node_arena.structs[root]['terminated']:
+            roots_to_insert.append(root)
+
+    open_node_holder.clear_list()
+
+    active_searches = list(range(len(searches)))
+    to_insert = np.empty(0, dtype=np.int32)
+    to_insert_scores = np.empty(0, dtype=np.float32)
+    while True:
+        # Record the result of each zero-window search who's root has terminated, starting the search's next one,
+        # or yielding it's results if it's finished.  The arena isn't compacted while doing this, since the
+        # terminated roots must not be released until their values are recorded (adding roots will only grow it)
+        still_active = []
+        for search_index in active_searches:
+            search = searches[search_index]
+            while node_arena.structs[search.root_node]['terminated']:
+                search.record_result(
+                    node_arena.structs[search.root_node]['best_value'],
+                    hash_table,
+                    node_arena.structs[search.root_node])
+
+                if search.is_finished:
+                    yield search_index, search.cur_guess, search.move
+                    break
+
+                root = set_up_multi_root_search_root(search, move_eval_fn, hash_table, previous_board_map, node_arena)
+                if not node_arena.structs[root]['terminated']:
+                    roots_to_insert.append(root)
+            else:
+                still_active.append(search_index)
+
+        active_searches = still_active
+        if len(active_searches) == 0:
+            break
+
+        # Adding roots can grow the arena, which replaces it's mask of dead nodes
+        open_node_holder.set_dead_node_mask(node_arena.dead)
+
+        to_insert = np.concatenate((to_insert, np.array(roots_to_insert, dtype=np.int32)))
+        to_insert_scores = np.concatenate((
+            to_insert_scores,
+            np.full(len(roots_to_insert), TT_MOVE_SCORE_VALUE, dtype=np.float32)))
+        roots_to_insert = []
+
+        next_batch = open_node_holder.insert_nodes_and_get_next_batch(to_insert, to_insert_scores)
+
+        # Each node in the batch creates at most one new node
+        if not node_arena.has_room_for(len(next_batch)):
+            make_room_in_arena(node_arena, open_node_holder, len(next_batch))
+
+        to_insert, to_insert_scores = do_iteration(
+            next_batch,
+            node_arena,
+            hash_table,
+            previous_board_map,
+            board_eval_fn,
+            move_eval_fn,
+            parallel_backprop,
+            parallel_move_gen)
@@ -0,0 +1,193 @@
+from .numba_board import *
+from .numba_board import _slider_blockers, _attackers_mask
+from .numba_negamax_zero_window import start_board_evaluations, run_in_thread_with_future
+
+
+# The values used to compare the pieces in a capture, indexed by piece type
+CAPTURE_PIECE_VALUES = np.array([0, 1, 3, 3, 5, 9, 100], dtype=np.int32)
+
+
+@njit
+def is_non_losing_capture(board_struct, from_square, to_square):
+    """
+    Checks if the given capture can't lose material in the exchange on it's square, as a cheap approximation of a
+    static exchange evaluation.  This is the case when the captured piece is worth at least as much as the capturing
+    piece, or when the opponent doesn't attack the square.
+    """
+    victim_value = CAPTURE_PIECE_VALUES[piece_type_at(board_struct, to_square)]
+    attacker_value = CAPTURE_PIECE_VALUES[piece_type_at(board_struct, from_square)]
+    if victim_value >= attacker_value:
+        return True
+
+    occupied_after = board_struct['occupied'] & ~BB_SQUARES[from_square]
+    return not _attackers_mask(board_struct, 1 ^ board_struct['turn'], to_square, occupied_after)
+
+
+@njit
+def set_up_capture_array(board_struct):
+    """
+    Sets the given board's unexplored moves to it's legal non-losing captures (see is_non_losing_capture, and only
+    the evasions which capture if it's in check), ordered by MVV-LVA (most valuable victim first, then least
+    valuable attacker).  The MVV-LVA score of each capture is stored in the matching element of the board's
+    unexplored_move_scores.
+
+    NOTES:
+    1) En passant captures aren't included
+    """
+    board_struct['children_left'] = 0
+    board_struct['unexplored_moves'][:] = 255
+
+    king = msb(board_struct['kings'] & board_struct['occupied_co'][board_struct['turn']])
+    opponent_occupied = board_struct['occupied_co'][1 ^ board_struct['turn']]
+
+    blockers = _slider_blockers(board_struct, king)
+    checkers = _attackers_mask(board_struct, 1 ^ board_struct['turn'], king, board_struct['occupied'])
+
+    if checkers:
+        set_evasions(board_struct, king, checkers, BB_ALL, opponent_occupied)
+    else:
+        set_pseudo_legal_moves(board_struct, BB_ALL, opponent_occupied)
+
+    num_captures = 0
+    for j in range(board_struct['children_left']):
+        from_square = board_struct['unexplored_moves'][j, 0]
+        to_square = board_struct['unexplored_moves'][j, 1]
+        if (BB_SQUARES[to_square] & opponent_occupied and
+                is_safe(board_struct, king, blockers, from_square, to_square) and
+                is_non_losing_capture(board_struct, from_square, to_square)):
+            board_struct['unexplored_moves'][num_captures] = board_struct['unexplored_moves'][j]
+            board_struct['unexplored_move_scores'][num_captures] = (
+                8 * piece_type_at(board_struct, to_square) - piece_type_at(board_struct, from_square) +
+                board_struct['unexplored_moves'][j, 2])
+            num_captures += 1
+
+    board_struct['unexplored_moves'][num_captures:board_struct['children_left']] = 255
+    board_struct['children_left'] = num_captures
+
+    order = np.argsort(-board_struct['unexplored_move_scores'][:num_captures])
+    board_struct['unexplored_moves'][:num_captures] = board_struct['unexplored_moves'][:num_captures][order]
+    board_struct['unexplored_move_scores'][:num_captures] = board_struct['unexplored_move_scores'][:num_captures][order]
+
+
+@njit
+def set_up_capture_arrays(structs):
+    for j in range(len(structs)):
+        set_up_capture_array(structs[j])
+
+
+@njit
+def get_capture_children_info(structs):
+    """
+    :return: A tuple of the index of each capture's board, the capture's index in it's board's ordering, the
+     captures (as moves), and their MVV-LVA scores
+    """
+    num_captures = np.sum(structs['children_left'])
+
+    parents = np.empty(num_captures, dtype=np.int32)
+    ranks = np.empty(num_captures, dtype=np.int32)
+    moves = np.empty((num_captures, 3), dtype=np.uint8)
+    scores = np.empty(num_captures, dtype=np.float32)
+
+    cur_index = 0
+    for j in range(len(structs)):
+        for i in range(structs[j]['children_left']):
+            parents[cur_index] = j
+            ranks[cur_index] = i
+            moves[cur_index] = structs[j]['unexplored_moves'][i]
+            scores[cur_index] = structs[j]['unexplored_move_scores'][i]
+            cur_index += 1
+
+    return parents, ranks, moves, scores
+
+
+class QuiescenceEvaluator(object):
+    """
+    Evaluates depth zero boards with a capture-only quiescence search (instead of evaluating them directly), so that
+    boards in the middle of an exchange aren't given the value of a position which is about to change.  It can be
+    given to the search in place of the board_eval_fn.
+
+    The quiescence search is done in batches, one for each ply (up to max_ply).  Every board of a ply is evaluated
+    at once (giving it's stand-pat value), then the non-losing captures of those boards are made (see
+    set_up_capture_array), and they become the next ply's boards.  The value of each board is the larger of it's
+    stand-pat value and the negated values of it's captures.
+
+    Each batch of leaves can have at most max_nodes_per_leaf times as many boards searched (beyond the leaves
+    themselves).  When a ply has more captures than what's left of that, they're picked by their place in their
+    board's MVV-LVA ordering (so every board's best capture is searched before any board's second), with ties broken
+    by MVV-LVA score.
+
+    NOTES:
+    1) No cutoffs are made from the boards' separators (e.g. when a stand-pat value fails high), since the values
+    returned are stored in the TT as the exact values of the leaves.  The node cap is what bounds the work instead
+    2) A board with no captures is given it's stand-pat value, even if it's in check (and may have no legal moves)
+    3) num_leaves and num_nodes count the leaves evaluated and the capture boards searched for them
+    """
+
+    def __init__(self, board_eval_fn, max_nodes_per_leaf=8, max_ply=6):
+        """
+        :param board_eval_fn: The function (or InferenceExecutor) which evaluates the boards of each ply
+        :param max_nodes_per_leaf: The average number of capture boards which can be searched for each leaf
+        :param max_ply: The largest number of captures made from a leaf
+        """
+        self.board_eval_fn = board_eval_fn
+        self.max_nodes_per_leaf = max_nodes_per_leaf
+        self.max_ply = max_ply
+
+        self.num_leaves = 0
+        self.num_nodes = 0
+
+    def evaluate_ply(self, structs):
+        return start_board_evaluations(structs, np.ones(len(structs), dtype=np.bool_), self.board_eval_fn).result()
+
+    def search(self, leaves):
+        """
+        :param leaves: The struct array of boards to be evaluated (their move information is overwritten)
+        :return: The array of the boards' values
+        """
+        nodes_left = self.max_nodes_per_leaf * len(leaves)
+
+        level_values = []
+        level_parents = []
+
+        structs = leaves
+        while True:
+            level_values.append(np.asarray(self.evaluate_ply(structs), dtype=np.float32))
+
+            if nodes_left <= 0 or len(level_parents) == self.max_ply:
+                break
+
+            set_up_capture_arrays(structs)
+            parents, ranks, moves, scores = get_capture_children_info(structs)
+
+            if len(parents) == 0:
+                break
+
+            if len(parents) > nodes_left:
+                to_keep = np.lexsort((-scores, ranks))[:nodes_left]
+                parents = parents[to_keep]
+                moves = moves[to_keep]
+
+            nodes_left -= len(parents)
+            self.num_nodes += len(parents)
+
+            children = structs[parents]
+            push_moves(children, moves)
+
+            level_parents.append(parents)
+            structs = children
+
+        for j in range(len(level_parents) - 1, -1, -1):
+            np.maximum.at(level_values[j], level_parents[j], - level_values[j + 1])
+
+        self.num_leaves += len(leaves)
+
+        return level_values[0]
+
+    def submit_board_evaluations(self, struct_array, to_score_mask):
+        """
+        Starts the quiescence search of the boards in the given struct array which are marked in the mask.
+
+        :return: A Future for the array of the boards' values
+        """
+        leaves = struct_array[to_score_mask]
+        return run_in_thread_with_future(lambda: self.search(leaves))
@@ -0,0 +1,298 @@
+import threading
+import time
+
+from . import *
+
+
+
+def allocate_move_time(remaining_time, increment=0, moves_to_go=None, default_moves_to_go=30, max_fraction=.5,
+                       move_overhead=.05):
+    """
+    Decides how much time to spend searching for a move, from the time left on the clock.
+
+    :param remaining_time: The number of seconds left on the engine's clock
+    :param increment: The number of seconds added to the clock after each move
+    :param moves_to_go: The number of moves to be made before the next time control, or None if the remaining
+     time is for the rest of the game
+    :param default_moves_to_go: The number of moves the remaining time is split between when moves_to_go is None
+    :param max_fraction: The largest fraction of the remaining time which can be given to one move
+    :param move_overhead: The number of seconds reserved for things other than the search (like communication)
+    :return: The number of seconds to be used for the search
+    """
+    if moves_to_go is None:
+        moves_to_go = default_moves_to_go
+
+    allocated_time = remaining_time / max(moves_to_go, 1) + increment
+    allocated_time = min(allocated_time, max_fraction * remaining_time)
+
+    return max(allocated_time - move_overhead, 0)
+
+
+
+class SearchController(object):
+    """
+    Decides when a search should be stopped, from a wall-clock time limit, a limit on the number of nodes processed,
+    and requests to stop made from outside of the search (e.g. from another thread).
+
+    NOTES:
+    1) The search checks this between batches, so it can run past it's limits by up to the time it takes to process
+    one batch
+    """
+
+    def __init__(self, time_limit=None, node_limit=None, new_depth_time_fraction=.5):
+        """
+        :param time_limit: The number of seconds a search can take, or None if it's time isn't limited
+        :param node_limit: The number of nodes a search can process (including repeats), or None if it isn't limited
+        :param new_depth_time_fraction: The fraction of the time limit after which no new iterative deepening
+         depths are started (since they're unlikely to finish)
+        """
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.new_depth_time_fraction = new_depth_time_fraction
+
+        self.start()
+
+    def start(self):
+        """
+        Resets the controller for a new search, starting it's clock.
+        """
+        self.start_time = time.time()
+        self.nodes_searched = 0
+        self.stop_requested = False
+        self.stopped = False
+
+    def request_stop(self):
+        """
+        Asks the search to stop as soon as it can.  This can safely be called from another thread.
+        """
+        self.stop_requested = True
+
+    @property
+    def elapsed_time(self):
+        return time.time() - self.start_time
+
+    def add_nodes(self, num_nodes):
+        self.nodes_searched += num_nodes
+
+    def should_stop(self):
+        """
+        :return: True if the search should stop, False if not.  Once this returns True it will continue to do so
+         until the controller is started again
+        """
+        if not self.stopped:
+            self.stopped = (self.stop_requested or
+                            (not self.time_limit is None and self.elapsed_time >= self.time_limit) or
+                            (not self.node_limit is None and self.nodes_searched >= self.node_limit))
+        return self.stopped
+
+    def should_start_new_depth(self):
+        if self.should_stop():
+            return False
+
+        return self.time_limit is None or self.elapsed_time < self.new_depth_time_fraction * self.time_limit
+
+
+
+class BatchDispatcher(object):
+    """
+    Picks the size of each batch given to the search, from a model of the time an inference takes as a fixed
+    overhead (e.g. launching the ANNs) plus a cost for each board given to it.  The model is fit (by least squares)
+    to the most recent inferences timed, each from when it was submitted to when it's Future was done (see
+    time_inference).
+
+    While the ANNs are running, the batch size picked is the smallest one for which the fixed overhead is at most
+    max_overhead_fraction of the time spent on the boards.  Since larger batches make the best-first order less exact
+    (more nodes are expanded before the results of the others are known), this avoids growing the batches past the
+    point where it stops paying off.  When the ANNs are idle, there's nothing to be gained by holding nodes back, so
+    all of the nodes available are taken (up to max_batch_size).  When the nodes left in the open list are only a bit
+    more than the size picked (e.g. near the end of a zero-window search), all of them are taken, instead of leaving a
+    small batch which would pay the full overhead.
+
+    NOTES:
+    1) The Futures are timed by callbacks, which can be run by the threads running the inference, so the data the
+    model is fit to is only changed or read while holding the dispatcher's lock
+    """
+
+    def __init__(self, max_batch_size, min_batch_size=1, max_overhead_fraction=.1, window_size=200,
+                 leftover_fraction=.5):
+        """
+        :param max_batch_size: The largest batch size which can be picked, and the size used until the model
+         can be fit
+        :param min_batch_size: The smallest batch size which can be picked
+        :param max_overhead_fraction: The largest fraction of the time spent on the boards which the fixed overhead
+         can be
+        :param window_size: The number of most recent inferences the model is fit to
+        :param leftover_fraction: All of the open nodes are taken if the number which would be left is less than
+         this fraction of the batch size picked
+        """
+        self.max_batch_size = max_batch_size
+        self.min_batch_size = min_batch_size
+        self.max_overhead_fraction = max_overhead_fraction
+        self.leftover_fraction = leftover_fraction
+
+        self.batch_sizes = np.zeros(window_size, dtype=np.float64)
+        self.inference_times = np.zeros(window_size, dtype=np.float64)
+        self.num_recorded = 0
+
+        self.num_running = 0
+        self.lock = threading.Lock()
+
+    def record(self, batch_size, inference_time):
+        """
+        Adds the time taken by an inference of the given number of boards (in seconds) to the data the model is fit
+        to.
+        """
+        with self.lock:
+            j = self.num_recorded % len(self.batch_sizes)
+            self.batch_sizes[j] = batch_size
+            self.inference_times[j] = inference_time
+            self.num_recorded += 1
+
+    def time_inference(self, future, batch_size, submit_time):
+        """
+        Records the time from when an inference was submitted to when it's Future is done, and counts it as running
+        until then.
+
+        :param future: The inference's Future
+        :param batch_size: The number of boards given to the inference
+        :param submit_time: The value of time.perf_counter() when the inference was submitted
+        """
+        with self.lock:
+            self.num_running += 1
+
+        def finish_timing(_):
+            self.record(batch_size, time.perf_counter() - submit_time)
+            with self.lock:
+                self.num_running -= 1
+
+        future.add_done_callback(finish_timing)
+
+    def is_inference_idle(self):
+        return self.num_running == 0
+
+    def cost_model(self):
+        """
+        :return: A tuple of the fixed cost of an inference and the cost of each board (in seconds), or None if there
+         isn't enough data to fit them (at least two different batch sizes are needed)
+        """
+        with self.lock:
+            num_samples = min(self.num_recorded, len(self.batch_sizes))
+            batch_sizes = self.batch_sizes[:num_samples].copy()
+            inference_times = self.inference_times[:num_samples].copy()
+
+        if num_samples < 2 or np.all(batch_sizes == batch_sizes[0]):
+            return None
+
+        per_board_cost, fixed_cost = np.polyfit(batch_sizes, inference_times, 1)
+        return max(fixed_cost, 0), per_board_cost
+
+    def next_batch_size(self, num_available):
+        """
+        :param num_available: The number of nodes which could be put into the next batch
+        :return: The largest number of nodes the next batch should have
+        """
+        model = self.cost_model()
+        if model is None or model[1] <= 0 or self.is_inference_idle():
+            batch_size = self.max_batch_size
+        else:
+            batch_size = int(np.ceil(model[0] / (self.max_overhead_fraction * model[1])))
+            batch_size = min(max(batch_size, self.min_batch_size), self.max_batch_size)
+
+        if num_available - batch_size < self.leftover_fraction * batch_size:
+            batch_size = min(max(batch_size, num_available), self.max_batch_size)
+
+        return batch_size
+
+
+
+class InferenceScheduler(object):
+    """
+    Holds the work for the ANNs which the search has put off, so that the evaluations of depth zero leaves and the
+    scoring of new nodes' moves are each accumulated across iterations, and each ANN is run once it's own queue
+    reaches an efficient batch size (instead of both being run once for every batch expanded).
+
+    The leaves are stored as the structs of the boards to be evaluated along with the indices of their parents, and
+    the nodes to have their moves scored are stored as their indices in the node arena (they're in the arena, but not
+    the open node list, until their moves are scored).
+
+    NOTES:
+    1) A node with a leaf waiting to be evaluated still counts that leaf in it's children_left, so it can't
+    terminate without it unless it fails high from another child
+    2) Work for nodes which die before it's run is dropped (see drop_dead_nodes), this must be done before the
+    arena's dead nodes are released
+    """
+
+    def __init__(self, eval_batch_size=1000, move_scoring_batch_size=1000):
+        """
+        :param eval_batch_size: The number of leaves which are accumulated before they're evaluated
+        :param move_scoring_batch_size: The number of nodes which are accumulated before their moves are scored
+        """
+        self.eval_batch_size = eval_batch_size
+        self.move_scoring_batch_size = move_scoring_batch_size
+
+        self.clear()
+
+    def clear(self):
+        self.leaf_structs = []
+        self.leaf_parents = []
+        self.nodes_to_score = []
+
+        self.num_leaves = 0
+        self.num_nodes_to_score = 0
+
+    def is_empty(self):
+        return self.num_leaves == 0 and self.num_nodes_to_score == 0
+
+    def add_leaves(self, structs, parents):
+        if len(structs) != 0:
+            self.leaf_structs.append(structs)
+            self.leaf_parents.append(parents)
+            self.num_leaves += len(structs)
+
+    def add_nodes_to_score(self, nodes):
+        if len(nodes) != 0:
+            self.nodes_to_score.append(nodes)
+            self.num_nodes_to_score += len(nodes)
+
+    def evals_ready(self, force=False):
+        return self.num_leaves >= self.eval_batch_size or (force and self.num_leaves != 0)
+
+    def move_scoring_ready(self, force=False):
+        return self.num_nodes_to_score >= self.move_scoring_batch_size or (force and self.num_nodes_to_score != 0)
+
+    def drop_dead_nodes(self, dead_node_mask):
+        """
+        Removes the leaves who's parents are dead, and the dead nodes waiting to be scored.
+        """
+        if self.num_leaves != 0:
+            structs, parents = self.take_leaves()
+            alive_mask = np.logical_not(dead_node_mask[parents])
+            self.add_leaves(structs[alive_mask], parents[alive_mask])
+
+        if self.num_nodes_to_score != 0:
+            nodes = self.take_nodes_to_score()
+            self.add_nodes_to_score(nodes[np.logical_not(dead_node_mask[nodes])])
+
+    def take_leaves(self):
+        """
+        :return: A tuple of the struct array of the leaves to be evaluated, and the array of their parents' indices
+         (the scheduler no longer holds them)
+        """
+        to_return = np.concatenate(self.leaf_structs), np.concatenate(self.leaf_parents)
+
+        self.leaf_structs = []
+        self.leaf_parents = []
+        self.num_leaves = 0
+
+        return to_return
+
+    def take_nodes_to_score(self):
+        """
+        :return: The array of indices of the nodes who's moves are to be scored (the scheduler no longer holds them)
+        """
+        to_return = np.concatenate(self.nodes_to_score)
+
+        self.nodes_to_score = []
+        self.num_nodes_to_score = 0
+
+        return to_return
@@ -32,15 +32,21 @@ def clear_hash_table(table):
     return table
 
 
-def choose_move(hash_table, node, flip_move=False):
+def choose_move(hash_table, board_struct, flip_move=False):
     """
-    Chooses the desired move to be made from the given node.  This is done by use of the given hash table.
+    Chooses the desired move to be made from the given board struct.  This is done by use of the given hash table.
 
     :return: A python-chess Move object representing the desired move to be made
     """
-    root_tt_entry = hash_table[np.uint64(node.struct['hash']) & TT_HASH_MASK]
-    move_array = root_tt_entry['stored_move']
+    root_tt_entry = hash_table[np.uint64(board_struct['hash']) & TT_HASH_MASK]
+    return move_array_to_python_chess_move(root_tt_entry['stored_move'], flip_move)
 
+
+def move_array_to_python_chess_move(move_array, flip_move=False):
+    """
+    Converts a move stored as an array of it's from square, to square, and promotion to a python-chess Move.  If
+    flip_move is True, the squares are mirrored (in place) first.
+    """
     if flip_move:
         move_array[:-1] = square_mirror(move_array[:-1])
 
@@ -50,7 +56,21 @@ def choose_move(hash_table, node, flip_move=False):
         None if move_array[2]==0 else move_array[2].view(np.int8))
 
 
-@nb.njit
+@njit
+def get_tt_bounds(hash_table, board_hash):
+    """
+    Gets the information stored in the hash table about the board with the given hash.
+
+    :return: A tuple of the depth the board was searched to (or NO_TT_ENTRY_VALUE if it has no entry), and the lower
+     and upper bounds found for it's value
+    """
+    node_entry = hash_table[board_hash & TT_HASH_MASK]
+    if node_entry['depth'] != NO_TT_ENTRY_VALUE and node_entry['entry_hash'] == board_hash:
+        return node_entry['depth'], node_entry['lower_bound'], node_entry['upper_bound']
+    return NO_TT_ENTRY_VALUE, MIN_FLOAT32_VAL, MAX_FLOAT32_VAL
+
+
+@njit
 def set_tt_node(hash_entry, board_hash, depth, overwrite_hash=True, overwrite_bounds=False,
                 upper_bound=MAX_FLOAT32_VAL, lower_bound=MIN_FLOAT32_VAL):
     """
@@ -67,7 +87,7 @@ def set_tt_node(hash_entry, board_hash, depth, overwrite_hash=True, overwrite_bo
         hash_entry['lower_bound'] = lower_bound
 
 
-@nb.njit
+@njit
 def set_tt_move(hash_entry, following_move):
     """
     Write the given move in the given hash table, at the given index.
@@ -75,7 +95,7 @@ def set_tt_move(hash_entry, following_move):
     hash_entry['stored_move'][:] = following_move
 
 
-@nb.njit
+@njit
 def wipe_tt_move(hash_entry):
     """
     Writes over the move in the given hash_table at the given index.  It sets all the move values to NO_TT_MOVE_VALUE.
@@ -83,11 +103,22 @@ def wipe_tt_move(hash_entry):
     hash_entry['stored_move'][:] = NO_TT_MOVE_VALUE
 
 
-@nb.njit
+@njit
+def update_tt_move(hash_entry, following_move):
+    """
+    Writes the given move to an entry already holding the same board, unless it's NO_TT_MOVE_VALUE (e.g. for a board
+    cut off by it's null move child, which has no best move), in which case the move already stored is kept.
+    """
+    if following_move[0] != NO_TT_MOVE_VALUE:
+        set_tt_move(hash_entry, following_move)
+
+
+@njit
 def add_board_and_move_to_tt(board_struct, following_move, hash_table):
     """
     Adds the information about a current board and the move which was made previously, to the
-    transposition table.
+    transposition table.  A move of NO_TT_MOVE_VALUE doesn't replace a move already stored for the board (see
+    update_tt_move).
 
     NOTES:
     1) While this currently does work, it represents one of the most crucial components of the negamax search,
@@ -100,7 +131,7 @@ def add_board_and_move_to_tt(board_struct, following_move, hash_table):
                 if board_struct['best_value'] >= board_struct['separator']:
                     if board_struct['best_value'] > node_entry['lower_bound']:
                         node_entry['lower_bound'] = board_struct['best_value']
-                        set_tt_move(node_entry, following_move)
+                        update_tt_move(node_entry, following_move)
 
                 elif board_struct['best_value'] < node_entry['upper_bound']:
                     node_entry['upper_bound'] = board_struct['best_value']
@@ -108,7 +139,7 @@ def add_board_and_move_to_tt(board_struct, following_move, hash_table):
             elif node_entry['depth'] < board_struct['depth']:
                 # Overwrite the data currently stored in the hash table
                 if board_struct['best_value'] >= board_struct['separator']:
-                    set_tt_move(node_entry, following_move)
+                    update_tt_move(node_entry, following_move)
                     set_tt_node(node_entry, board_struct['hash'], board_struct['depth'],
                                 lower_bound=board_struct['best_value'], overwrite_hash=False, overwrite_bounds=True)
                 else:
@@ -135,7 +166,17 @@ def add_board_and_move_to_tt(board_struct, following_move, hash_table):
 
 
 
-@nb.njit
+@njit
+def add_boards_and_moves_to_tt(structs, node_indices, moves, hash_table):
+    """
+    Adds the boards at the given indices of the struct array, and the move associated with each of them, to the
+    transposition table.
+    """
+    for j in range(len(node_indices)):
+        add_board_and_move_to_tt(structs[node_indices[j]], moves[j], hash_table)
+
+
+@njit
 def add_evaluated_boards_to_tt(struct_array, was_evaluated_mask, eval_results, hash_table):
     num_done = 0
     for j in range(len(struct_array)):
@@ -5,6 +5,9 @@ import chess.pgn
 import chess.uci
 import os
 import tempfile
+import time
+
+from concurrent.futures import Future
 
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
@@ -15,17 +18,32 @@ from batch_first.anns.ann_creation_helper import parse_into_ann_input_inference
 from batch_first.anns.database_creator import get_data_from_pgns, create_board_eval_board_from_game_fn, \
     combine_pickles_and_create_tfrecords, serializer_creator
 
+import batch_first
+
+from batch_first import set_kernels_release_gil
+
 from batch_first.classes_and_structs import *
 
 from batch_first.numba_board import  perft_test, is_legal_move, numpy_node_info_dtype, push_moves, set_up_move_array, \
     popcount, has_insufficient_material, has_legal_move, piece_type_at, scan_reversed
 
 from batch_first.numba_negamax_zero_window import set_up_root_node_for_struct, struct_array_to_ann_inputs, \
-    zero_window_negamax_search
+    zero_window_negamax_search, iterative_deepening_mtd_f, mtd_f, multi_root_search, set_up_tree_root, \
+    find_grandchild, get_board_hash, get_move_array, set_up_root_node_from_fen, create_child_structs, set_up_late_move_reductions, \
+    do_iteration, serial_update_level_nodes
+
+from batch_first.transposition_table import get_empty_hash_table, clear_hash_table, add_board_and_move_to_tt
+
+from batch_first.global_open_priority_nodes import PriorityBins, DAryHeapNodeList, BinBoundaryUpdater, \
+    OpenNodeListTelemetry
+
+from batch_first.search_control import SearchController, BatchDispatcher, InferenceScheduler
 
-from batch_first.transposition_table import get_empty_hash_table
+from batch_first.inference_executor import InferenceExecutor
 
-from batch_first.global_open_priority_nodes import PriorityBins
+from batch_first.quiescence_search import QuiescenceEvaluator, is_non_losing_capture
+
+from batch_first.engine import calibrate_max_batch_size, find_throughput_knee
 
 
 
@@ -497,7 +515,164 @@ def zero_window_search_tester(expected_val_fn, calculated_evaluator, hash_table_
 
 
 
+def generate_open_node_list_stream(num_iterations, new_nodes_per_iteration, seed=0):
+    """
+    Generates a deterministic stream of (new node ids, score generating function) pairs used to compare
+    GlobalNodeList implementations.  The scores are drawn from a mixture of normal distributions to loosely
+    resemble move scores.
+    """
+    rng = np.random.RandomState(seed)
+    score_fn = lambda n: np.where(
+        rng.rand(n) < .8, rng.normal(0, .15, n), rng.normal(0, .6, n)).astype(np.float32)
+
+    first_new_id = 0
+    for _ in range(num_iterations):
+        new_ids = np.arange(first_new_id, first_new_id + new_nodes_per_iteration, dtype=np.int32)
+        first_new_id += new_nodes_per_iteration
+        yield new_ids, score_fn
+
+
+def run_open_node_list_stream(node_list, max_batch_size, num_iterations, new_nodes_per_iteration, reinsert_fraction=.5,
+                              seed=0):
+    """
+    Feeds a GlobalNodeList the stream of nodes created by generate_open_node_list_stream.  Each iteration a fraction of
+    the previous batch is reinserted (like parents with children left) along with the new nodes.
+
+    :return: A tuple of the list of batches (as arrays of node ids), and the total time spent in the list's
+     insert_nodes_and_get_next_batch method
+    """
+    batches = []
+    time_spent = 0
+    prev_batch = np.array([], dtype=np.int32)
+    for new_ids, score_fn in generate_open_node_list_stream(num_iterations, new_nodes_per_iteration, seed):
+        to_insert = np.r_[prev_batch[:int(len(prev_batch) * reinsert_fraction)], new_ids].astype(np.int32)
+        scores = score_fn(len(to_insert))
+
+        start_time = time.time()
+        next_batch = node_list.insert_nodes_and_get_next_batch(to_insert, scores)
+        time_spent += time.time() - start_time
+
+        prev_batch = next_batch.copy()
+        batches.append(prev_batch)
+
+    return batches, time_spent
+
+
+def open_node_list_tester(bins=None, max_batch_size=500, num_nodes=20000, dead_fraction=.1, seed=0):
+    """
+    Checks that the PriorityBins and DAryHeapNodeList classes return every node given to them exactly once, other than
+    the nodes marked in the dead node mask (which should never be returned), and that the DAryHeapNodeList returns
+    them in priority order.  Then checks that a list holding only dead nodes is empty, and that the telemetry's
+    occupancy histogram of PriorityBins with fewer bins than histogram buckets counts each stored node once.  Lastly
+    checks that the bin boundaries computed by a BinBoundaryUpdater are close to the percentiles of the scores it was
+    given, and follow them when their distribution shifts.
+
+    :return: True if all the checks passed, False if not
+    """
+    if bins is None:
+        bins = np.linspace(0, 1, 1000)
+
+    rng = np.random.RandomState(seed)
+    nodes = rng.permutation(num_nodes).astype(np.int32)
+    scores = rng.normal(0, .3, num_nodes).astype(np.float32)
+    dead_node_mask = rng.rand(num_nodes) < dead_fraction
+
+    node_priorities = np.empty(num_nodes, dtype=np.float32)
+    node_priorities[nodes] = np.abs(scores)
+
+    node_lists = {
+        "PriorityBins": PriorityBins(bins, max_batch_size, dead_node_mask=dead_node_mask),
+        "DAryHeapNodeList": DAryHeapNodeList(max_batch_size, dead_node_mask=dead_node_mask)}
+
+    for name, node_list in node_lists.items():
+        batches = [node_list.insert_nodes_and_get_next_batch(nodes, scores.copy()).copy()]
+        while not node_list.is_empty():
+            batches.append(
+                node_list.insert_nodes_and_get_next_batch(
+                    np.array([], dtype=np.int32),
+                    np.array([], dtype=np.float32)).copy())
+
+        returned = np.concatenate(batches)
+        if not np.array_equal(np.sort(returned), np.sort(nodes[np.logical_not(dead_node_mask[nodes])])):
+            print("%s did not return each of the nodes which aren't dead exactly once"%name)
+            return False
+
+        if name == "DAryHeapNodeList" and np.any(np.diff(node_priorities[returned]) > 0):
+            print("DAryHeapNodeList did not return the nodes in priority order")
+            return False
+
+    telemetry = OpenNodeListTelemetry(num_histogram_buckets=64)
+    node_lists = {
+        "PriorityBins": PriorityBins(np.linspace(0, 1, 10), 1, telemetry=telemetry),
+        "DAryHeapNodeList": DAryHeapNodeList(1)}
+
+    for name, node_list in node_lists.items():
+        stored_dead_node_mask = np.zeros(num_nodes, dtype=np.bool_)
+        node_list.set_dead_node_mask(stored_dead_node_mask)
+        node_list.insert_nodes_and_get_next_batch(nodes, scores.copy())
+
+        if node_list.is_empty():
+            print("%s was empty while holding nodes which aren't dead" % name)
+            return False
+
+        stored_dead_node_mask[:] = True
+        if not node_list.is_empty():
+            print("%s wasn't empty while only holding dead nodes" % name)
+            return False
+
+    occupancy = telemetry.to_arrays()["occupancy"][-1]
+    if np.sum(occupancy) != num_nodes - 1 or np.any(occupancy[11:] != 0):
+        print("The telemetry's occupancy histogram counted %d nodes, when %d were stored" % (
+            np.sum(occupancy), num_nodes - 1))
+        return False
+
+    bin_updater = BinBoundaryUpdater(100, rebalance_interval=1)
+    for shift in [0, 2]:
+        for _ in range(50):
+            shifted_scores = rng.normal(shift, .3, 10000).astype(np.float32)
+            new_boundaries = bin_updater.update(shifted_scores)
+
+        if len(bin_updater.sketch) > len(bin_updater.sketch.samples):
+            print("The BinBoundaryUpdater's sketch held more scores than it's capacity")
+            return False
+
+        bins, zero_shift = new_boundaries
+        expected_bins = np.percentile(np.abs(shifted_scores - shift), bin_updater.percentiles)
+        if abs(zero_shift - shift) > .05 or np.max(np.abs(bins - expected_bins)) > .05:
+            print("The BinBoundaryUpdater's boundaries differed from the percentiles of the scores it was given")
+            return False
+
+    return True
+
+
+def open_node_list_benchmark(bins=None, max_batch_size=5000, num_iterations=200, new_nodes_per_iteration=4000,
+                             print_info=True):
+    """
+    Times the insertion and retrieval of nodes for the PriorityBins and DAryHeapNodeList classes on the same
+    synthetic stream of nodes.
+
+    :return: A dictionary mapping the name of each class to the time spent in it's insert_nodes_and_get_next_batch
+     method
+    """
+    if bins is None:
+        bins = np.percentile(np.abs(np.random.RandomState(0).normal(0, .3, 100000)), np.arange(0, 100, .02))
+
+    node_lists = {
+        "PriorityBins": lambda: PriorityBins(bins, max_batch_size),
+        "DAryHeapNodeList": lambda: DAryHeapNodeList(max_batch_size)}
+
+    times = {}
+    for name, creator in node_lists.items():
+        # The first run is done to have the Numba functions compiled prior to the timed run
+        run_open_node_list_stream(creator(), max_batch_size, 2, new_nodes_per_iteration)
+
+        times[name] = run_open_node_list_stream(
+            creator(), max_batch_size, num_iterations, new_nodes_per_iteration)[1]
+
+        if print_info:
+            print("%s spent %f seconds inserting and retrieving nodes over %d iterations"%(name, times[name], num_iterations))
 
+    return times
 
 
 
@@ -545,12 +720,39 @@ def weighted_piece_sum_creator(piece_values=None):
     return bf_piece_sum_eval, simple_board_piece_sum
 
 
-def create_negamax_function(eval_fn):
+def create_negamax_function(eval_fn, quiescence=False, quiescence_max_ply=6):
     """
     :param eval_fn: The evaluation function used must account for how the board data (in batch first) is given as if
     it were white's turn (for the sake of the ANNS), and must match that behavior
     (see 'dummy_eval_for_bf' and 'dummy_eval_for_simple_search')
+    :param quiescence: If the depth zero boards should be given the value of a quiescence search over their
+    non-losing captures (with stand-pat), as done by a QuiescenceEvaluator with no node cap, instead of their
+    evaluation
+    :param quiescence_max_ply: The largest number of captures made by the quiescence search
     """
+    def quiescence_value(board, ply=0, alpha=MIN_FLOAT32_VAL, beta=MAX_FLOAT32_VAL):
+        """
+        Gets the value of the given board (which must have it's legal moves set up) for the player to move.  It's
+        exact when given the full window.
+        """
+        best_val = (1 if board['turn'] else -1) * eval_fn(board)
+
+        if ply == quiescence_max_ply:
+            return best_val
+
+        for j in range(board['children_left']):
+            alpha = max(alpha, best_val)
+            if alpha >= beta:
+                break
+
+            from_square, to_square = board['unexplored_moves'][j, :2]
+            if (BB_SQUARES[to_square] & board['occupied_co'][1 ^ board['turn']] and
+                    is_non_losing_capture(board, from_square, to_square)):
+                child = simple_struct_copy_push(board, board['unexplored_moves'][j])
+                set_up_move_array(child)
+                best_val = max(best_val, - quiescence_value(child, ply + 1, -beta, -alpha))
+        return best_val
+
     def get_eval_score(board, depth):
         if board["halfmove_clock"] >= 50 or has_insufficient_material(board):
             return TIE_RESULT_SCORE
@@ -563,6 +765,8 @@ def create_negamax_function(eval_fn):
             return LOSS_RESULT_SCORES[depth] if board['turn'] else WIN_RESULT_SCORES[depth]
 
         if depth == 0:
+            if quiescence:
+                return (1 if board['turn'] else -1) * quiescence_value(board)
             return eval_fn(board)
 
         return None
@@ -600,8 +804,13 @@ def create_negamax_function(eval_fn):
     return search_helper
 
 
-def negamax_zero_window_search_creator(eval_fn, move_predictor, max_batch_size=5000):
+def negamax_zero_window_search_creator(eval_fn, move_predictor, max_batch_size=5000, parallel_backprop=False,
+                                       parallel_move_gen=False, num_threads=None, pipelined=False,
+                                       batch_dispatcher=None, inference_scheduler=None, null_move_reduction=None,
+                                       late_move_reductions=None, node_arena=None):
     dummy_previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+    if node_arena is None:
+        node_arena = NodeArena(DEFAULT_NODE_ARENA_CAPACITY)
 
     def zero_window_search(board, depth, separator, hash_table):
         priority_bins = PriorityBins(
@@ -610,34 +819,1021 @@ def negamax_zero_window_search_creator(eval_fn, move_predictor, max_batch_size=5
 
         separator_to_use = np.nextafter(separator, MIN_FLOAT32_VAL)
 
+        node_arena.clear()
         root_node = set_up_root_node_for_struct(
             move_predictor,
             hash_table,
             dummy_previous_board_map,
-            create_node_info_from_python_chess_board(board, depth, separator_to_use))
+            create_node_info_from_python_chess_board(board, depth, separator_to_use),
+            node_arena)
 
-        if root_node.struct['terminated']:
-            return root_node.struct['best_value']
+        if node_arena.structs[root_node]['terminated']:
+            return node_arena.structs[root_node]['best_value']
 
         to_return = zero_window_negamax_search(
             root_node,
+            node_arena,
             priority_bins,
             eval_fn,
             move_predictor,
             hash_table=hash_table,
-            previous_board_map=dummy_previous_board_map)
+            previous_board_map=dummy_previous_board_map,
+            parallel_backprop=parallel_backprop,
+            parallel_move_gen=parallel_move_gen,
+            num_threads=num_threads,
+            pipelined=pipelined,
+            batch_dispatcher=batch_dispatcher,
+            inference_scheduler=inference_scheduler,
+            null_move_reduction=null_move_reduction,
+            late_move_reductions=late_move_reductions)
         return to_return
 
     return zero_window_search
 
 
+def get_arena_tree_state(node_arena):
+    """
+    :return: A tuple of the arrays (and counts) which make up the state of the tree stored in the given NodeArena
+    """
+    num_allocated = node_arena.num_allocated
+    return (num_allocated,
+            node_arena.num_free,
+            node_arena.structs[:num_allocated].tobytes(),
+            node_arena.parents[:num_allocated].tobytes(),
+            node_arena.first_child[:num_allocated].tobytes(),
+            node_arena.next_sibling[:num_allocated].tobytes(),
+            node_arena.dead[:num_allocated].tobytes(),
+            node_arena.free_indices[:node_arena.num_free].tobytes())
+
+
+def parallel_search_tester(eval_fn, move_predictor, fens=None, depths=[1, 2, 3], separators=[-500, 0, 500],
+                           parallel_backprop=True, parallel_move_gen=True, num_threads=None, **search_kwargs):
+    """
+    Checks that zero-window searches using the parallel versions of the search's functions return exactly the same
+    values, and leave the transposition table and the tree in exactly the same state (every node's struct and links,
+    which nodes are dead, and the free list), as the same searches done serially.  The searches deeper than 1 must
+    terminate nodes below the root, so that marking subtrees dead is compared.
+
+    :param search_kwargs: Additional keyword arguments given to both the serial and parallel searches (e.g.
+     null_move_reduction or late_move_reductions)
+    :return: True if the serial and parallel searches always matched, False if not
+    """
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    serial_arena = NodeArena(DEFAULT_NODE_ARENA_CAPACITY)
+    parallel_arena = NodeArena(DEFAULT_NODE_ARENA_CAPACITY)
+
+    serial_search = negamax_zero_window_search_creator(
+        eval_fn, move_predictor, node_arena=serial_arena, **search_kwargs)
+    parallel_search = negamax_zero_window_search_creator(
+        eval_fn,
+        move_predictor,
+        parallel_backprop=parallel_backprop,
+        parallel_move_gen=parallel_move_gen,
+        num_threads=num_threads,
+        node_arena=parallel_arena,
+        **search_kwargs)
+
+    for fen in fens:
+        board = chess.Board(fen)
+        serial_hash_table = get_empty_hash_table()
+        parallel_hash_table = get_empty_hash_table()
+        for depth in depths:
+            for separator in separators:
+                serial_value = serial_search(board, depth, separator, serial_hash_table)
+                parallel_value = parallel_search(board, depth, separator, parallel_hash_table)
+
+                if serial_value != parallel_value or not np.array_equal(serial_hash_table, parallel_hash_table):
+                    print("%s\nSerial and parallel searches differed at depth %d with separator %f (%f vs %f)" % (
+                        fen, depth, separator, serial_value, parallel_value))
+                    return False
+
+                if get_arena_tree_state(serial_arena) != get_arena_tree_state(parallel_arena):
+                    print("%s\nSerial and parallel searches left different trees at depth %d with separator %f" % (
+                        fen, depth, separator))
+                    return False
+
+                num_terminated = np.sum(serial_arena.structs[:serial_arena.num_allocated]['terminated'])
+                if depth > 1 and serial_arena.num_allocated > 1 and num_terminated < 2:
+                    print("%s\nThe search at depth %d with separator %f terminated no nodes below the root" % (
+                        fen, depth, separator))
+                    return False
+    return True
+
+
+def mtd_f_tester(expected_val_fn, eval_fn, move_predictor, fens=None, max_depth=3, guess_increment=50,
+                 max_batch_size=5000, **mtd_f_kwargs):
+    """
+    Checks that mtd(f) searches find the same value as a full minimax search.
+
+    :param expected_val_fn: A function which calculates and returns the full minimax value of a board.  It must accept
+     2 parameters, a Python-Chess board, and the desired search depth.
+    :param mtd_f_kwargs: Additional keyword arguments to give mtd_f (e.g. reuse_tree)
+    :return: True if all tests were passed, False if not
+    """
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    dummy_previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+
+    for fen in fens:
+        hash_table = get_empty_hash_table()
+        for depth in range(1, max_depth + 1):
+            minimax_value = expected_val_fn(chess.Board(fen), depth)
+
+            calculated_value, _, _ = mtd_f(
+                fen,
+                depth,
+                0,
+                PriorityBins(np.linspace(-4000, 4000, 1000), max_batch_size),
+                eval_fn,
+                move_predictor,
+                hash_table,
+                dummy_previous_board_map,
+                guess_increment=guess_increment,
+                **mtd_f_kwargs)
+
+            if calculated_value != minimax_value:
+                print("%s\nThe actual minimax value at depth %d is %f, but mtd(f) resulted in %f" % (
+                    fen, depth, minimax_value, calculated_value))
+                return False
+    return True
+
+
+def tree_reuse_tester(eval_fn, move_predictor, fens=None, max_depth=3, guess_increment=50, max_batch_size=5000):
+    """
+    Checks that mtd(f) searches reusing a tree kept in the arena find the same value as searches which don't (given a
+    copy of the same TT), both for the board the tree was built for (as it's searched to each depth), and for the
+    board after the move found and a reply to it (with the tree rerooted at that board, without changing which of the
+    kept nodes are dead).  Each board is tested with both white and black to move (by also testing it's mirror), and
+    the tree must be reused for every one of them.
+
+    :return: True if all tests were passed, False if not
+
+    NOTES:
+    1) The values aren't compared to a full minimax search since the TT kept from the previous move's search has
+    deeper entries than the depths being searched, and the boards reached can have mates which
+    create_negamax_function's searches don't score
+    """
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    dummy_previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+
+    def search(board, depth, hash_table, **kwargs):
+        return mtd_f(
+            board.fen(),
+            depth,
+            0,
+            PriorityBins(np.linspace(-4000, 4000, 1000), max_batch_size),
+            eval_fn,
+            move_predictor,
+            hash_table,
+            dummy_previous_board_map,
+            guess_increment=guess_increment,
+            **kwargs)[:2]
+
+    for board in itertools.chain.from_iterable((chess.Board(fen), chess.Board(fen).mirror()) for fen in fens):
+        hash_table = get_empty_hash_table()
+        node_arena = NodeArena(DEFAULT_NODE_ARENA_CAPACITY)
+
+        tree_root = set_up_tree_root(move_predictor, hash_table, dummy_previous_board_map, board.fen(), node_arena)
+
+        # The moves of the tree's nodes are mirrored when it was set up for a board with black to move
+        tree_fen = board.fen()
+        tree_is_mirrored = board.turn == chess.BLACK
+        moves_made = []
+        for _ in range(2):
+            for depth in range(1, max_depth + 1):
+                expected_value, _ = search(board, depth, hash_table.copy())
+                calculated_value, move = search(
+                    board, depth, hash_table, node_arena=node_arena, reuse_tree=True, tree_root=tree_root)
+
+                if calculated_value != expected_value:
+                    print("%s\nThe value found at depth %d is %f, but reusing the tree resulted in %f" % (
+                        board.fen(), depth, expected_value, calculated_value))
+                    return False
+
+            previous_fen = board.fen()
+            board.push(move)
+            moves_made.append(move)
+            if board.is_game_over():
+                break
+
+            # The reply picked is the first with it's board still in the tree
+            for reply in board.legal_moves:
+                grandchild = find_grandchild(node_arena, tree_root, get_move_array([move, reply], tree_is_mirrored))
+                if grandchild != NO_NODE_INDEX:
+                    board.push(reply)
+                    moves_made.append(reply)
+                    break
+            else:
+                print("%s\nNone of the boards after the move %s and a reply to it were found in the tree" % (
+                    previous_fen, move))
+                return False
+
+            # The engine finds a board's TT entries with this when it's not kept in the tree
+            if node_arena.structs[grandchild]['hash'] != get_board_hash(
+                    tree_fen, get_move_array(moves_made, tree_is_mirrored)):
+                print("%s\nThe hash of the board after %s doesn't match the one in the tree" % (
+                    tree_fen, " ".join(str(made) for made in moves_made)))
+                return False
+
+            if board.is_game_over():
+                break
+
+            subtree = [grandchild]
+            for subtree_node in subtree:
+                child = node_arena.first_child[subtree_node]
+                while child != NO_NODE_INDEX:
+                    subtree.append(child)
+                    child = node_arena.next_sibling[child]
+            subtree_dead = node_arena.dead[subtree].copy()
+
+            num_kept = reroot_node_arena(node_arena, grandchild)
+            if num_kept == 0 or num_kept != node_arena.num_in_use or num_kept != len(subtree):
+                print("%s\nRerooting the tree kept %d nodes, but %d are in use and %d were in the subtree" % (
+                    board.fen(), num_kept, node_arena.num_in_use, len(subtree)))
+                return False
+
+            if not np.array_equal(node_arena.dead[subtree], subtree_dead):
+                print("%s\nRerooting the tree changed which of the kept nodes are dead" % board.fen())
+                return False
+
+            tree_root = grandchild
+    return True
+
+
+def search_controller_tester(eval_fn, move_predictor, fens=None, depths_to_search=[1, 2, 3, 4, 5], node_limit=500,
+                             max_batch_size=100, time_limit=.01):
+    """
+    Checks that iterative deepening searches given a SearchController stop when asked to (or when out of nodes or
+    time, even during their first depth), and still return a legal move.
+
+    :param time_limit: The time limit of the searches which are only given the deepest depth to search (as the engine
+     does when the shallower depths were searched for the previous move), it must run out during their first
+     zero-window search
+
+    :return: True if all tests were passed, False if not
+    """
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    dummy_previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+
+    for fen in fens:
+        board = chess.Board(fen)
+        for stop_immediately in [True, False]:
+            controller = SearchController(node_limit=node_limit)
+            if stop_immediately:
+                controller.request_stop()
+
+            _, move, _ = iterative_deepening_mtd_f(
+                fen,
+                depths_to_search,
+                PriorityBins(np.linspace(-4000, 4000, 1000), max_batch_size),
+                eval_fn,
+                move_predictor,
+                get_empty_hash_table(),
+                dummy_previous_board_map,
+                guess_increments=[50] * len(depths_to_search),
+                search_controller=controller)
+
+            if move is None or not move in board.legal_moves:
+                print("%s\nThe search returned %s after being stopped, which isn't a legal move" % (fen, move))
+                return False
+
+            if not stop_immediately and not controller.stopped:
+                print("%s\nThe search finished without reaching it's node limit of %d" % (fen, node_limit))
+                return False
+
+        controller = SearchController(time_limit=time_limit)
+        probe_counts = []
+        _, move, _ = iterative_deepening_mtd_f(
+            fen,
+            depths_to_search[-1:],
+            PriorityBins(np.linspace(-4000, 4000, 1000), max_batch_size),
+            eval_fn,
+            move_predictor,
+            get_empty_hash_table(),
+            dummy_previous_board_map,
+            guess_increments=[50],
+            search_controller=controller,
+            probe_counts=probe_counts)
+
+        if not controller.stopped or probe_counts != [0]:
+            print("%s\nThe search's time limit didn't stop it during it's first zero-window search" % fen)
+            return False
+
+        if move is None or not move in board.legal_moves:
+            print("%s\nThe search returned %s after running out of time, which isn't a legal move" % (fen, move))
+            return False
+    return True
+
+
+def multi_root_search_tester(expected_val_fn, eval_fn, move_predictor, fens=None, depths_to_search=[1, 2, 3],
+                             guess_increment=50, max_batch_size=5000):
+    """
+    Checks that searching many boards at once with multi_root_search finds the same value for each of them as a
+    full minimax search, and gives a legal move for each of them exactly once.
+
+    :return: True if all tests were passed, False if not
+    """
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    results_found = np.zeros(len(fens), dtype=np.bool_)
+    for fen_index, value, move in multi_root_search(
+            fens,
+            depths_to_search,
+            PriorityBins(np.linspace(-4000, 4000, 1000), max_batch_size),
+            eval_fn,
+            move_predictor,
+            get_empty_hash_table(),
+            guess_increment=guess_increment):
+
+        board = chess.Board(fens[fen_index])
+        minimax_value = expected_val_fn(board, depths_to_search[-1])
+
+        if results_found[fen_index]:
+            print("%s\nThe board's results were given more than once" % fens[fen_index])
+            return False
+
+        if value != minimax_value or move is None or not move in board.legal_moves:
+            print("%s\nThe actual minimax value is %f, but the multi-root search resulted in %f (with move %s)" % (
+                fens[fen_index], minimax_value, value, move))
+            return False
+
+        results_found[fen_index] = True
+
+    if not np.all(results_found):
+        print("The multi-root search didn't give results for every board")
+        return False
+    return True
+
+
+def inference_executor_tester(expected_val_fn, eval_fn, move_predictor, max_batch_size=5000):
+    """
+    Runs the zero-window search test with the networks run by an InferenceExecutor (with input buffers smaller than
+    the batches, so that they must grow), and checks that the timings of it's requests were recorded.
+
+    :return: True if all tests were passed, False if not
+    """
+    executor = InferenceExecutor(eval_fn, move_predictor, max_batch_size=10, record_timings=True)
+
+    search_passed = zero_window_search_tester(
+        expected_val_fn=expected_val_fn,
+        calculated_evaluator=negamax_zero_window_search_creator(executor, executor, max_batch_size=max_batch_size),
+        hash_table_creator=get_empty_hash_table)
+
+    executor.shutdown()
+
+    if not search_passed:
+        return False
+
+    if len(executor.timings) == 0 or not {"eval", "move"} <= set(timing[0] for timing in executor.timings):
+        print("The InferenceExecutor didn't record the timings of both kinds of requests")
+        return False
+
+    if np.any([queue_time < 0 or compute_time < 0 for _, _, queue_time, compute_time in executor.timings]):
+        print("The InferenceExecutor recorded a negative queue or compute time")
+        return False
+
+    return True
+
+
+def batch_dispatcher_tester(expected_val_fn, eval_fn, move_predictor, fixed_cost=.01, per_node_cost=1e-5):
+    """
+    Checks that a BatchDispatcher fits it's cost model to inference times computed from a known fixed and per board
+    cost, picks batch sizes from it as intended while an inference is running, takes every available node when none
+    are, and times an inference's Future from it's submission until it's done.  Then runs the zero-window search test
+    with batch sizes picked by a BatchDispatcher.
+
+    :return: True if all tests were passed, False if not
+    """
+    dispatcher = BatchDispatcher(5000, max_overhead_fraction=.5)
+
+    if dispatcher.next_batch_size(10000) != 5000:
+        print("The BatchDispatcher didn't use the largest batch size before it could fit it's model")
+        return False
+
+    for batch_size in range(100, 1100, 100):
+        dispatcher.record(batch_size, fixed_cost + per_node_cost * batch_size)
+
+    if not np.allclose(dispatcher.cost_model(), (fixed_cost, per_node_cost)):
+        print("The BatchDispatcher fit the cost model %s, when it should be %s" % (
+            dispatcher.cost_model(), (fixed_cost, per_node_cost)))
+        return False
+
+    if dispatcher.next_batch_size(10000) != 5000:
+        print("The BatchDispatcher held back available nodes while no inference was running")
+        return False
+
+    running_inference = Future()
+    submit_time = time.perf_counter()
+    dispatcher.time_inference(running_inference, 100, submit_time)
+
+    expected_batch_size = int(np.ceil(fixed_cost / (.5 * per_node_cost)))
+    if dispatcher.next_batch_size(10 * expected_batch_size) != expected_batch_size:
+        print("The BatchDispatcher picked a batch size of %d, when it should be %d" % (
+            dispatcher.next_batch_size(10 * expected_batch_size), expected_batch_size))
+        return False
+
+    if dispatcher.next_batch_size(expected_batch_size + 1) != expected_batch_size + 1:
+        print("The BatchDispatcher left a small batch behind instead of taking all of the available nodes")
+        return False
+
+    time.sleep(.05)
+    running_inference.set_result(None)
+    timed_duration = time.perf_counter() - submit_time
+
+    num_recorded = min(dispatcher.num_recorded, len(dispatcher.batch_sizes))
+    last_recorded = (dispatcher.num_recorded - 1) % len(dispatcher.batch_sizes)
+    if not dispatcher.is_inference_idle() or num_recorded != 11 or \
+            dispatcher.batch_sizes[last_recorded] != 100 or \
+            not .05 <= dispatcher.inference_times[last_recorded] <= timed_duration:
+        print("The BatchDispatcher didn't time an inference from it's submission until it's Future was done")
+        return False
+
+    return zero_window_search_tester(
+        expected_val_fn=expected_val_fn,
+        calculated_evaluator=negamax_zero_window_search_creator(
+            eval_fn, move_predictor, batch_dispatcher=BatchDispatcher(5000, min_batch_size=10)),
+        hash_table_creator=get_empty_hash_table)
+
+
+def inference_scheduler_tester(expected_val_fn, eval_fn, move_predictor, max_batch_size=100,
+                               scheduled_batch_sizes=(400, 400)):
+    """
+    Runs the zero-window search test with the leaf evaluations and move scoring accumulated across iterations by an
+    InferenceScheduler, then checks that (for the same tests) it ran the board evaluations fewer times than the
+    search without one.
+
+    :return: True if all tests were passed, False if not
+    """
+    def run_counted_test(inference_scheduler):
+        num_eval_calls = [0]
+
+        def counted_eval_fn(*args):
+            num_eval_calls[0] += 1
+            return eval_fn(*args)
+
+        np.random.seed(0)
+        passed = zero_window_search_tester(
+            expected_val_fn=expected_val_fn,
+            calculated_evaluator=negamax_zero_window_search_creator(
+                counted_eval_fn,
+                move_predictor,
+                max_batch_size=max_batch_size,
+                inference_scheduler=inference_scheduler),
+            hash_table_creator=get_empty_hash_table)
+
+        return passed, num_eval_calls[0]
+
+    scheduler = InferenceScheduler(*scheduled_batch_sizes)
+
+    passed, scheduled_eval_calls = run_counted_test(scheduler)
+    if not passed:
+        return False
+
+    if not scheduler.is_empty():
+        print("The InferenceScheduler still had work after the searches finished")
+        return False
+
+    _, unscheduled_eval_calls = run_counted_test(None)
+    if scheduled_eval_calls >= unscheduled_eval_calls:
+        print("The board evaluations were run %d times with the InferenceScheduler, and %d times without it" % (
+            scheduled_eval_calls, unscheduled_eval_calls))
+        return False
+
+    return True
+
+
+def quiescence_search_tester(eval_fn, simple_eval_fn, move_predictor, max_depth=2, max_ply=3, capped_nodes_per_leaf=2):
+    """
+    Runs the zero-window search test with the depth zero leaves given the values of a capture-only quiescence search
+    (compared to a negamax search with a full quiescence search at it's leaves), then checks that a
+    QuiescenceEvaluator with a small node cap doesn't search more boards than it allows.
+
+    :return: True if all tests were passed, False if not
+    """
+    if not zero_window_search_tester(
+            expected_val_fn=create_negamax_function(simple_eval_fn, quiescence=True, quiescence_max_ply=max_ply),
+            calculated_evaluator=negamax_zero_window_search_creator(
+                QuiescenceEvaluator(eval_fn, max_nodes_per_leaf=10 ** 6, max_ply=max_ply),
+                move_predictor),
+            hash_table_creator=get_empty_hash_table,
+            max_depth=max_depth,
+            runs_per_depth=1):
+        return False
+
+    capped_evaluator = QuiescenceEvaluator(eval_fn, max_nodes_per_leaf=capped_nodes_per_leaf)
+
+    zero_window_search = negamax_zero_window_search_creator(capped_evaluator, move_predictor)
+    for fen in DEFAULT_TESTING_FENS:
+        zero_window_search(chess.Board(fen), max_depth, 0, get_empty_hash_table())
+
+    if capped_evaluator.num_nodes > capped_nodes_per_leaf * capped_evaluator.num_leaves:
+        print("The quiescence search looked at %d boards for %d leaves, with a cap of %d boards per leaf" % (
+            capped_evaluator.num_nodes, capped_evaluator.num_leaves, capped_nodes_per_leaf))
+        return False
+
+    return True
+
+
+def null_move_pruning_tester(expected_val_fn, eval_fn, move_predictor, fens=None, null_move_reduction=1, max_depth=4,
+                              guess_increment=50):
+    """
+    Checks that pushing a null move gives the same Zobrist hash as python-chess does, that nodes are cut off by their
+    null move children on a position where they must be (without storing a move in the TT for them), that mtd(f)
+    searches using null move pruning still find the minimax value when they're too shallow for it to be tried, that
+    searching with it gives the same results when backpropagating in parallel, and that the deeper searches (where
+    it's tried) return legal moves, with and without an InferenceScheduler.
+
+    :return: True if all tests were passed, False if not
+    """
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    for fen in fens:
+        board = chess.Board(fen)
+        struct = create_node_info_from_python_chess_board(board)
+        push_moves(struct, NULL_MOVE.reshape(1, 3))
+
+        board.push(chess.Move.null())
+        if struct[0]['hash'] != zobrist_hash(board) or struct[0]['turn'] != board.turn:
+            print("%s\nPushing a null move resulted in the hash %d, but it should be %d" % (
+                fen, struct[0]['hash'], zobrist_hash(board)))
+            return False
+
+    # The root's children have so much more material than their opponent that their null move children fail high,
+    # cutting them off before any of their own moves are expanded
+    lopsided_board = chess.Board("rnbqkbnr/pppppppp/8/8/8/8/8/4K3 w kq - 0 1")
+    hash_table = get_empty_hash_table()
+    negamax_zero_window_search_creator(eval_fn, move_predictor, null_move_reduction=null_move_reduction)(
+        lopsided_board, null_move_reduction + 2, 0, hash_table)
+
+    for move in lopsided_board.legal_moves:
+        lopsided_board.push(move)
+        child_hash = np.uint64(zobrist_hash(lopsided_board))
+        lopsided_board.pop()
+
+        child_entry = hash_table[child_hash & TT_HASH_MASK]
+        if child_entry['entry_hash'] != child_hash or child_entry['lower_bound'] == MIN_FLOAT32_VAL:
+            print("The child of the root made by %s wasn't cut off by it's null move child" % move)
+            return False
+
+        if child_entry['stored_move'][0] != NO_TT_MOVE_VALUE:
+            print("A move was stored in the TT for the child made by %s, which was cut off by it's null move child" % move)
+            return False
+
+    # A null move cut (which has no move to store) raises a board's lower bound without erasing the move already
+    # stored for it, whether it's at the same depth as the stored entry or deeper
+    board = chess.Board(fens[0])
+    stored_move = get_move_array([next(iter(board.legal_moves))])[0]
+    for extra_depth in [0, 1]:
+        hash_table = get_empty_hash_table()
+        board_struct = create_node_info_from_python_chess_board(board, null_move_reduction + 1, 0)
+        for value, move in [(100, stored_move), (200, np.full(3, NO_TT_MOVE_VALUE, dtype=np.uint8))]:
+            board_struct[0]['best_value'] = value
+            add_board_and_move_to_tt(board_struct[0], move, hash_table)
+            board_struct[0]['depth'] += extra_depth
+
+        board_entry = hash_table[np.uint64(board_struct[0]['hash']) & TT_HASH_MASK]
+        if board_entry['lower_bound'] != 200 or not np.array_equal(board_entry['stored_move'], stored_move):
+            print("%s\nA null move cut left the TT entry with the lower bound %f and the move %s" % (
+                fens[0], board_entry['lower_bound'], board_entry['stored_move']))
+            return False
+
+    # Null moves are only tried by nodes with a depth greater than the reduction, which aren't children of the root
+    # until it's depth is at least 2 more than the reduction
+    if not mtd_f_tester(expected_val_fn, eval_fn, move_predictor, fens=fens, max_depth=null_move_reduction + 1,
+                        guess_increment=guess_increment, null_move_reduction=null_move_reduction):
+        return False
+
+    if not parallel_search_tester(eval_fn, move_predictor, fens=fens, depths=[null_move_reduction + 2],
+                                  parallel_move_gen=False, null_move_reduction=null_move_reduction):
+        return False
+
+    dummy_previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+
+    for fen in fens:
+        board = chess.Board(fen)
+        for inference_scheduler in [None, InferenceScheduler(300, 300)]:
+            _, move, _ = iterative_deepening_mtd_f(
+                fen,
+                np.arange(1, max_depth + 1),
+                PriorityBins(np.linspace(-4000, 4000, 1000), 1000),
+                eval_fn,
+                move_predictor,
+                get_empty_hash_table(),
+                dummy_previous_board_map,
+                guess_increments=[guess_increment] * max_depth,
+                inference_scheduler=inference_scheduler,
+                null_move_reduction=null_move_reduction)
+
+            if move is None or not move in board.legal_moves:
+                print("%s\nThe search using null move pruning returned %s, which isn't a legal move" % (fen, move))
+                return False
+    return True
+
+
+def late_move_reductions_tester(expected_val_fn, eval_fn, move_predictor, fens=None, late_move_reductions=None,
+                                max_depth=4, guess_increment=50):
+    """
+    Checks that a reduced child which fails high is searched again to the full depth (with it's parent put back into
+    the open node list), that mtd(f) searches using late move reductions still find the minimax value when they're
+    too shallow for any moves to be reduced, that searching with them gives the same results when backpropagating in
+    parallel, that the deeper searches (where they are, and some are searched again) return legal moves, with and
+    without an InferenceScheduler, and that the flag marking reduced moves is never stored in the TT.
+
+    :param late_move_reductions: The LateMoveReductions to test, or None to use ones which reduce every move after
+     the first (so that reduced moves are frequently searched again)
+    :return: True if all tests were passed, False if not
+    """
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    if late_move_reductions is None:
+        late_move_reductions = LateMoveReductions(reduction=1, min_depth=2, full_depth_moves=1,
+                                                  full_depth_moves_per_depth=0, score_margin=0.)
+
+    dummy_previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+
+    # The root's separator is below any value it's children could give it, so it's last move (which is reduced to
+    # depth zero) fails high.  The root's other children are still being searched, so it can't terminate
+    restore_test_reductions = LateMoveReductions(reduction=1, min_depth=2, full_depth_moves=1,
+                                                 full_depth_moves_per_depth=0, score_margin=0.)
+    node_arena = NodeArena(DEFAULT_NODE_ARENA_CAPACITY)
+    root = np.array([set_up_root_node_from_fen(
+        move_predictor,
+        get_empty_hash_table(),
+        dummy_previous_board_map,
+        fens[0],
+        node_arena,
+        depth=2,
+        separator=np.nextafter(MIN_FLOAT32_VAL, 0))], dtype=np.int32)
+
+    set_up_late_move_reductions(
+        node_arena.structs, root, np.ones(1, dtype=np.bool_), np.zeros(1, dtype=np.float32), restore_test_reductions)
+
+    while np.any(node_arena.structs[root[0]]['unexplored_move_scores'] != MIN_FLOAT32_VAL):
+        create_child_structs(node_arena, root, 0, restore_test_reductions.reduction)
+
+    reduced_move = node_arena.structs[root[0]]['unexplored_moves'][node_arena.structs[root[0]]['next_move_index']].copy()
+    if reduced_move[2] < REDUCED_MOVE_FLAG:
+        print("%s\nThe root's last move wasn't reduced" % fens[0])
+        return False
+
+    # A reduced child failing high for a node which already terminated is neither used as the node's value nor
+    # searched again
+    unterminated_root_struct = node_arena.structs[root[0]].copy()
+    node_arena.structs[root[0]]['terminated'] = True
+    node_arena.structs[root[0]]['best_value'] = 0
+    best_entries, just_terminated, reopened = serial_update_level_nodes(
+        node_arena,
+        root,
+        np.zeros(1, dtype=np.int64),
+        np.array([0, 1], dtype=np.int64),
+        np.array([np.finfo(np.float32).max], dtype=np.float32),
+        np.array([reduced_move]),
+        np.zeros(1, dtype=np.bool_))
+
+    terminated_root_struct = node_arena.structs[root[0]]
+    if best_entries[0] != -1 or just_terminated[0] or reopened[0] or terminated_root_struct['best_value'] != 0 or \
+            terminated_root_struct['next_move_index'] != unterminated_root_struct['next_move_index']:
+        print("%s\nA reduced child which failed high for a terminated node was used or searched again" % fens[0])
+        return False
+
+    node_arena.structs[root[0]] = unterminated_root_struct
+
+    hash_table = get_empty_hash_table()
+    to_insert, to_insert_scores = do_iteration(
+        root, node_arena, hash_table, dummy_previous_board_map, eval_fn, move_predictor,
+        late_move_reductions=restore_test_reductions)
+
+    root_struct = node_arena.structs[root[0]]
+    if not np.any(np.logical_and(to_insert == root[0], to_insert_scores == TT_MOVE_SCORE_VALUE)):
+        print("%s\nThe root wasn't put back into the open node list after it's reduced child failed high" % fens[0])
+        return False
+
+    reduced_move[2] -= REDUCED_MOVE_FLAG
+    if root_struct['terminated'] or root_struct['next_move_index'] == NO_MORE_MOVES_VALUE or \
+            not np.array_equal(root_struct['unexplored_moves'][root_struct['next_move_index']], reduced_move):
+        print("%s\nThe move of the reduced child which failed high wasn't set up to be searched again" % fens[0])
+        return False
+
+    to_insert, _ = do_iteration(
+        root, node_arena, hash_table, dummy_previous_board_map, eval_fn, move_predictor,
+        late_move_reductions=restore_test_reductions)
+
+    new_children = to_insert[to_insert != root[0]]
+    if len(new_children) != 1 or node_arena.structs[new_children[0]]['depth'] != 1 or \
+            not np.array_equal(node_arena.structs[new_children[0]]['prev_move'], reduced_move):
+        print("%s\nThe move of the reduced child which failed high wasn't searched again to the full depth" % fens[0])
+        return False
+
+    if not mtd_f_tester(expected_val_fn, eval_fn, move_predictor, fens=fens,
+                        max_depth=late_move_reductions.min_depth - 1, guess_increment=guess_increment,
+                        late_move_reductions=late_move_reductions):
+        return False
+
+    if not parallel_search_tester(eval_fn, move_predictor, fens=fens, depths=[late_move_reductions.min_depth + 1],
+                                  parallel_move_gen=False, late_move_reductions=late_move_reductions):
+        return False
+
+    for fen in fens:
+        board = chess.Board(fen)
+        for inference_scheduler in [None, InferenceScheduler(300, 300)]:
+            hash_table = get_empty_hash_table()
+            _, move, _ = iterative_deepening_mtd_f(
+                fen,
+                np.arange(1, max_depth + 1),
+                PriorityBins(np.linspace(-4000, 4000, 1000), 1000),
+                eval_fn,
+                move_predictor,
+                hash_table,
+                dummy_previous_board_map,
+                guess_increments=[guess_increment] * max_depth,
+                inference_scheduler=inference_scheduler,
+                late_move_reductions=late_move_reductions)
+
+            if move is None or not move in board.legal_moves:
+                print("%s\nThe search using late move reductions returned %s, which isn't a legal move" % (fen, move))
+                return False
+
+            stored_moves = hash_table['stored_move'][hash_table['stored_move'][:, 0] != NO_TT_MOVE_VALUE]
+            if np.any(stored_moves[:, 2] >= REDUCED_MOVE_FLAG):
+                print("%s\nA move flagged as reduced was stored in the TT" % fen)
+                return False
+    return True
+
+
+def batch_size_calibration_tester(eval_fn, move_predictor, fixed_cost=.002, per_board_cost=1e-6):
+    """
+    Checks that the knee of a throughput curve computed from a known fixed and per board cost is found, then that a
+    calibration can be run with the given functions and saved to (and loaded from) a file.
+
+    :return: True if all tests were passed, False if not
+    """
+    batch_sizes = 2 ** np.arange(4, 15)
+    throughputs = batch_sizes / (fixed_cost + per_board_cost * batch_sizes)
+
+    expected_knee = np.min(batch_sizes[throughputs >= .9 * throughputs[-1]])
+    if find_throughput_knee(batch_sizes, throughputs, .9) != expected_knee:
+        print("The knee of the throughput curve was found at %d, when it should be %d" % (
+            find_throughput_knee(batch_sizes, throughputs, .9), expected_knee))
+        return False
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filename = os.path.join(temp_dir, "calibration.npz")
+
+        picked_size, tested_sizes, tested_throughputs = calibrate_max_batch_size(
+            eval_fn,
+            move_predictor,
+            struct_array=np.concatenate([create_node_info_from_fen(fen, 0, 0) for fen in DEFAULT_TESTING_FENS]),
+            batch_sizes=[16, 64, 256],
+            runs_per_size=1,
+            output_filename=filename)
+
+        if not picked_size in tested_sizes or not np.all(tested_throughputs > 0):
+            print("The calibration picked a batch size of %d from the throughputs %s" % (picked_size, tested_throughputs))
+            return False
+
+        if np.load(filename)['max_batch_size'] != picked_size:
+            print("The calibrated batch size wasn't saved correctly")
+            return False
+
+    return True
+
+
 def pseudo_random_move_eval(*args):
     """
     NOTES:
     1) This function uses np.linspace instead of randomly generated values to maintain the deterministic behavior of the
     tree search (only helpful when tracking down a bug).
+    2) At least one score is given for each move, since the sum of the move filters can be smaller than the number
+    of moves
+    """
+    return lambda x: np.linspace(0, 1, max(np.sum(x[1]), len(x[1])))
+
+
+def open_node_list_search_benchmark(node_list_creators=None, fens=None, max_depth=3, max_batch_size=1000,
+                                    print_info=True):
+    """
+    Compares GlobalNodeList implementations by doing the same iterative deepening MTD(f) searches with each of them,
+    on a fixed set of positions.  It uses the piece sum evaluation and pseudo-random move scoring from the zero-window
+    search test, so the search is deterministic for a given list.  The number of nodes retrieved from the list measures
+    the search's efficiency (how well it's order avoids work), and the time measures it's overall cost.
+
+
+    :param node_list_creators: A dictionary mapping names to functions which take no arguments and return a
+     GlobalNodeList created with save_info=True.  If None is given, PriorityBins and DAryHeapNodeList are compared
+    :param fens: An iterable of strings, each a FEN representation of a board.  If None is given, DEFAULT_TESTING_FENS
+     will be used
+    :param max_depth: The depth each search will iteratively deepen to
+    :param max_batch_size: The maximum batch size given to the lists created by default
+    :return: A dictionary mapping each name to a tuple of the nodes retrieved from the list, and the time taken
+    """
+    if node_list_creators is None:
+        node_list_creators = {
+            "PriorityBins": lambda: PriorityBins(
+                None, max_batch_size, save_info=True, bin_updater=BinBoundaryUpdater(1000)),
+            "DAryHeapNodeList": lambda: DAryHeapNodeList(
+                max_batch_size, save_info=True, bin_updater=BinBoundaryUpdater(1000))}
+
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    bf_eval_fn = weighted_piece_sum_creator()[0]
+    dummy_previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+    hash_table = get_empty_hash_table()
+
+    def run_searches(node_list, fens_to_search, depth):
+        for fen in fens_to_search:
+            clear_hash_table(hash_table)
+            iterative_deepening_mtd_f(
+                fen,
+                np.arange(1, depth + 1),
+                node_list,
+                bf_eval_fn,
+                pseudo_random_move_eval,
+                hash_table=hash_table,
+                previous_board_map=dummy_previous_board_map)
+
+    results = {}
+    for name, creator in node_list_creators.items():
+        node_list = creator()
+
+        # This is done to have the Numba functions compiled prior to the timed searches
+        run_searches(node_list, fens[:1], 1)
+        node_list.reset_logs()
+
+        start_time = time.time()
+        run_searches(node_list, fens, max_depth)
+        results[name] = (node_list.total_out, time.time() - start_time)
+
+        if print_info:
+            print("%s retrieved %d nodes in %f seconds (%f nodes per second)"%(
+                name, results[name][0], results[name][1], results[name][0] / results[name][1]))
+
+    return results
+
+
+def selective_search_benchmark(search_settings=None, fens=None, max_depth=4, max_batch_size=1000, print_info=True):
+    """
+    Compares the iterative deepening MTD(f) searches done with different selective search settings (e.g. null move
+    pruning or late move reductions) on a fixed set of positions, using the same evaluation and move scoring as
+    open_node_list_search_benchmark.  The number of nodes retrieved from the open node list measures the work saved,
+    and the number of moves which differ from the first setting's shows what it changed.
+
+    :param search_settings: A dictionary mapping names to dictionaries of keyword arguments to give
+     iterative_deepening_mtd_f.  If None is given, searches without any selectivity, with null move pruning, and
+     with late move reductions are compared
+    :return: A dictionary mapping each name to a tuple of the nodes retrieved from the list, the time taken, and
+     the list of moves chosen (one for each FEN)
     """
-    return lambda x: np.linspace(0, 1, np.sum(x[1]))
+    if search_settings is None:
+        search_settings = {
+            "Full width": {},
+            "Null move pruning": {"null_move_reduction": 1},
+            "Late move reductions": {"late_move_reductions": LateMoveReductions()}}
+
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    bf_eval_fn = weighted_piece_sum_creator()[0]
+    dummy_previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+    hash_table = get_empty_hash_table()
+
+    def run_searches(node_list, fens_to_search, depth, settings):
+        moves = []
+        for fen in fens_to_search:
+            clear_hash_table(hash_table)
+            moves.append(iterative_deepening_mtd_f(
+                fen,
+                np.arange(1, depth + 1),
+                node_list,
+                bf_eval_fn,
+                pseudo_random_move_eval,
+                hash_table=hash_table,
+                previous_board_map=dummy_previous_board_map,
+                **settings)[1])
+        return moves
+
+    results = {}
+    first_moves = None
+    for name, settings in search_settings.items():
+        node_list = PriorityBins(None, max_batch_size, save_info=True, bin_updater=BinBoundaryUpdater(1000))
+
+        # This is done to have the Numba functions compiled prior to the timed searches
+        run_searches(node_list, fens[:1], 1, settings)
+        node_list.reset_logs()
+
+        start_time = time.time()
+        moves = run_searches(node_list, fens, max_depth, settings)
+        results[name] = (node_list.total_out, time.time() - start_time, moves)
+
+        if first_moves is None:
+            first_moves = moves
+
+        if print_info:
+            print("%s retrieved %d nodes in %f seconds, and picked %d different moves"%(
+                name, results[name][0], results[name][1],
+                sum(move != first_move for move, first_move in zip(moves, first_moves))))
+
+    return results
+
+
+def inference_overlap_benchmark(fens=None, max_depth=3, max_batch_size=1000, fixed_latency=.002,
+                                per_board_latency=2e-6, release_gil_settings=(True, False), print_info=True):
+    """
+    Measures how much of the time spent on inference is overlapped with the search's CPU work, with the Numba kernels
+    releasing the GIL and with them holding it (see set_kernels_release_gil).  Inference is simulated by sleeping for
+    a fixed latency plus a per-board latency before the piece sum evaluation and pseudo-random move scoring (a sleep
+    releases the GIL, as waiting on a GPU does).
+
+    The searches are first timed without the latency, giving the CPU time, then with it.  The overlap is the fraction
+    of the smaller of the CPU time and the inference time which didn't add to the time taken, so it's 0 if the two
+    phases are run one after the other, and 1 if the smaller one is completely hidden by the larger.
+
+    NOTES:
+    1) Releasing the GIL can only increase the overlap when there's a core free to run the search while another
+    thread builds the ANN inputs, so the number of CPUs available is printed with the results
+
+
+    :param fens: An iterable of strings, each a FEN representation of a board.  If None is given, DEFAULT_TESTING_FENS
+     will be used
+    :param max_depth: The depth each search will iteratively deepen to
+    :param fixed_latency: The number of seconds each simulated inference takes, regardless of it's batch size
+    :param per_board_latency: The number of seconds added to each simulated inference for every board given to it
+    :param release_gil_settings: The values of set_kernels_release_gil to measure the overlap with.  The original
+     setting is restored afterwards
+    :return: A dictionary mapping each value in release_gil_settings to a tuple of the CPU time, the inference time,
+     the time taken with the simulated inference, and the overlap
+    """
+    if fens is None:
+        fens = DEFAULT_TESTING_FENS
+
+    bf_eval_fn = weighted_piece_sum_creator()[0]
+    dummy_previous_board_map = np.zeros([2, 1], dtype=np.uint64)
+    hash_table = get_empty_hash_table()
+
+    inference_time = [0]
+    def simulate_latency(num_boards):
+        latency = fixed_latency + per_board_latency * num_boards
+        inference_time[0] += latency
+        time.sleep(latency)
+
+    def slow_eval_fn(*args):
+        simulate_latency(len(args[1]))
+        return bf_eval_fn(*args)
+
+    def slow_move_eval_fn(*args):
+        simulate_latency(len(args[1]))
+        return pseudo_random_move_eval(*args)
+
+    def time_searches(eval_fn, move_eval_fn, fens_to_search, depth):
+        start_time = time.time()
+        for fen in fens_to_search:
+            clear_hash_table(hash_table)
+            iterative_deepening_mtd_f(
+                fen,
+                np.arange(1, depth + 1),
+                PriorityBins(np.linspace(-4000, 4000, 1000), max_batch_size),
+                eval_fn,
+                move_eval_fn,
+                hash_table=hash_table,
+                previous_board_map=dummy_previous_board_map)
+        return time.time() - start_time
+
+    if print_info:
+        print("CPUs available: %d, Numba threads: %d" % (os.cpu_count(), nb.config.NUMBA_NUM_THREADS))
+
+    original_setting = batch_first.KERNELS_RELEASE_GIL
+
+    results = {}
+    for release_gil in release_gil_settings:
+        set_kernels_release_gil(release_gil)
+
+        # This is done to have the Numba functions compiled prior to the timed searches
+        time_searches(bf_eval_fn, pseudo_random_move_eval, fens[:1], 1)
+
+        inference_time[0] = 0
+        cpu_time = time_searches(bf_eval_fn, pseudo_random_move_eval, fens, max_depth)
+        total_time = time_searches(slow_eval_fn, slow_move_eval_fn, fens, max_depth)
+
+        overlap = (cpu_time + inference_time[0] - total_time) / min(cpu_time, inference_time[0])
+        results[release_gil] = (cpu_time, inference_time[0], total_time, overlap)
+
+        if print_info:
+            print("Releasing the GIL: %s, CPU time: %f, inference time: %f, time with inference: %f, overlap: %f" % (
+                release_gil, cpu_time, inference_time[0], total_time, overlap))
+
+    set_kernels_release_gil(original_setting)
+
+    return results
 
 
 def cur_hash_getter(fen_to_start,move_lists,max_possible_moves):
@@ -662,6 +1858,7 @@ def cur_boards_to_input_list_fn(boards):
     return struct_array_to_ann_inputs(
         struct_array,
         np.array([], dtype=numpy_node_info_dtype),
+        np.array([], dtype=np.int32),
         np.ones(len(struct_array), dtype=np.bool_),
         np.array([], dtype=np.bool_),
         len(struct_array))
@@ -739,7 +1936,7 @@ def full_test(existing_high_level_uci_filename):
 
     print("Starting tests (this will likely take 1-3 minutes).\n")
 
-    test_results = np.zeros(7, dtype=np.bool_)
+    test_results = np.zeros(23, dtype=np.bool_)
 
 
     test_results[0] = full_perft_tester(
@@ -783,6 +1980,107 @@ def full_test(existing_high_level_uci_filename):
 
     print("Zero-window search test:                                      %s" % result_str[test_results[6]])
 
+    test_results[7] = open_node_list_tester()
+
+    print("Open node list test:                                          %s" % result_str[test_results[7]])
+
+    test_results[8] = parallel_search_tester(bf_eval_fn, pseudo_random_move_eval)
+
+    print("Parallel search test:                                         %s" % result_str[test_results[8]])
+
+    test_results[9] = mtd_f_tester(
+        create_negamax_function(simple_eval_fn),
+        bf_eval_fn,
+        pseudo_random_move_eval,
+        reuse_tree=True)
+
+    print("MTD(f) search test (reusing the tree):                        %s" % result_str[test_results[9]])
+
+    test_results[10] = search_controller_tester(bf_eval_fn, pseudo_random_move_eval)
+
+    print("Search controller test:                                       %s" % result_str[test_results[10]])
+
+    test_results[11] = multi_root_search_tester(
+        create_negamax_function(simple_eval_fn),
+        bf_eval_fn,
+        pseudo_random_move_eval)
+
+    print("Multi-root search test:                                       %s" % result_str[test_results[11]])
+
+    test_results[12] = mtd_f_tester(
+        create_negamax_function(simple_eval_fn),
+        bf_eval_fn,
+        pseudo_random_move_eval,
+        probe_strategy="adaptive",
+        score_history=[0, 300])
+
+    print("MTD(f) search test (adaptive zero-window search values):      %s" % result_str[test_results[12]])
+
+    test_results[13] = zero_window_search_tester(
+        expected_val_fn=create_negamax_function(simple_eval_fn),
+        calculated_evaluator=negamax_zero_window_search_creator(
+            bf_eval_fn, pseudo_random_move_eval, max_batch_size=250, pipelined=True),
+        hash_table_creator=get_empty_hash_table)
+
+    print("Pipelined zero-window search test:                            %s" % result_str[test_results[13]])
+
+    test_results[14] = inference_executor_tester(
+        create_negamax_function(simple_eval_fn),
+        bf_eval_fn,
+        pseudo_random_move_eval)
+
+    print("Inference executor test:                                      %s" % result_str[test_results[14]])
+
+    test_results[15] = batch_dispatcher_tester(
+        create_negamax_function(simple_eval_fn),
+        bf_eval_fn,
+        pseudo_random_move_eval)
+
+    print("Latency-aware batch dispatcher test:                          %s" % result_str[test_results[15]])
+
+    test_results[16] = batch_size_calibration_tester(bf_eval_fn, pseudo_random_move_eval)
+
+    print("Max batch size calibration test:                              %s" % result_str[test_results[16]])
+
+    test_results[17] = inference_scheduler_tester(
+        create_negamax_function(simple_eval_fn),
+        bf_eval_fn,
+        pseudo_random_move_eval)
+
+    print("Scheduled (accumulated) inference test:                       %s" % result_str[test_results[17]])
+
+    test_results[18] = quiescence_search_tester(bf_eval_fn, simple_eval_fn, pseudo_random_move_eval)
+
+    print("Quiescence search test:                                       %s" % result_str[test_results[18]])
+
+    test_results[19] = null_move_pruning_tester(
+        create_negamax_function(simple_eval_fn),
+        bf_eval_fn,
+        pseudo_random_move_eval)
+
+    print("Null move pruning test:                                       %s" % result_str[test_results[19]])
+
+    test_results[20] = late_move_reductions_tester(
+        create_negamax_function(simple_eval_fn),
+        bf_eval_fn,
+        pseudo_random_move_eval)
+
+    print("Late move reductions test:                                    %s" % result_str[test_results[20]])
+
+    test_results[21] = tree_reuse_tester(
+        bf_eval_fn,
+        pseudo_random_move_eval)
+
+    print("Tree reuse test:                                              %s" % result_str[test_results[21]])
+
+    test_results[22] = mtd_f_tester(
+        create_negamax_function(simple_eval_fn),
+        bf_eval_fn,
+        pseudo_random_move_eval,
+        num_concurrent_probes=3)
+
+    print("MTD(f) search test (concurrent zero-window searches):         %s" % result_str[test_results[22]])
+
 
     if all(test_results):
         print("\nAll tests were passed!")
@@ -152,7 +152,6 @@ if __name__ == "__main__":
         search_depth,
         BOARD_PREDICTOR,
         MOVE_PREDICTOR,
-        bin_database_file="deeper_network_1.npy",
         max_batch_size=MAX_SEARCH_BATCH_SIZE,
         saved_zero_shift_file="no_dilations_inception_1.npy",
     )